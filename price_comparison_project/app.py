@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session, Response, send_file
 from flask_login import login_user, logout_user, login_required, current_user
 import pymysql
 import os
@@ -11,10 +11,18 @@ import logging
 import pandas as pd
 import numpy as np
 from werkzeug.security import generate_password_hash, check_password_hash
-import concurrent.futures
 import time
 from functools import lru_cache
-from cache import cached
+from urllib.parse import urlsplit, parse_qs
+from cache import (cached, cache_stats, key_folding_report, last_cache_status, memory_cache,
+                   single_flight, start_sweeper, use_backend, use_serializer, use_write_locks,
+                   CachedFailure)
+from cache_backends import SQLiteBackend
+from search_engine import SearchEngine
+from worker_pools import WorkerPool
+from cache_warmer import CacheWarmer
+from pipeline import SearchPipeline
+from deadline import Deadline, DeadlineExceeded
 from sqlalchemy import func, select, distinct, text
 
 # Use pymysql as MySQL driver
@@ -31,13 +39,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Import scrapers
-from scrapers.amazon_scraper import ImprovedAmazonScraper
-from scrapers.flipkart_scraper import ImprovedFlipkartScraper
-from scrapers.alibaba_scraper import AlibabaProductScraper
-from scrapers.chroma_scraper import ChromaProductScraper
-# from scrapers.myntra_scraper import MyntraProductScraper
-# from scrapers.ajio_scraper import AjioProductScraper
+# Import scrapers; each module registers its platform with the scraper registry
+import scrapers.amazon_scraper
+import scrapers.flipkart_scraper
+import scrapers.alibaba_scraper
+import scrapers.chroma_scraper
+from scrapers.registry import registry, parse_platform_map
+from scrapers.errors import ScrapeError, CircuitOpenError
+from scrapers.circuit_breaker import circuit_breakers
+from scrapers.http_client import http_client
+from scrapers.transport import Transport, FixtureStore, parse_latency
+from scrapers.rate_limit import rate_limiter
+from scrapers.debug_capture import debug_capture
+from scrapers.parse_pool import parse_pool
+# import scrapers.myntra_scraper
+# import scrapers.ajio_scraper
 
 # Import models
 from models.price_forecasting import PriceForecaster
@@ -53,6 +69,122 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SQLALCHEMY_POOL_RECYCLE'] = 280
 app.config['SQLALCHEMY_POOL_TIMEOUT'] = 20
 
+# Time budget for a whole search, shared by every scraper call it makes
+app.config['SEARCH_TIMEOUT'] = float(os.environ.get('SEARCH_TIMEOUT', 20))
+# Tighter budget for each platform's review fetch, within the search budget
+app.config['REVIEW_TIMEOUT'] = float(os.environ.get('REVIEW_TIMEOUT', 8))
+# Streamed searches are cut off after this many seconds
+app.config['SEARCH_STREAM_TIMEOUT'] = int(os.environ.get('SEARCH_STREAM_TIMEOUT', 30))
+# App-scoped worker pools; queue limits make overload fail fast instead of piling up
+app.config['PIPELINE_POOL_SIZE'] = int(os.environ.get('PIPELINE_POOL_SIZE', 8))
+app.config['SCRAPE_POOL_SIZE'] = int(os.environ.get('SCRAPE_POOL_SIZE', 16))
+app.config['SCRAPE_POOL_MAX_QUEUE'] = int(os.environ.get('SCRAPE_POOL_MAX_QUEUE', 64))
+app.config['REVIEW_POOL_SIZE'] = int(os.environ.get('REVIEW_POOL_SIZE', 8))
+app.config['REVIEW_POOL_MAX_QUEUE'] = int(os.environ.get('REVIEW_POOL_MAX_QUEUE', 32))
+# Platforms this deployment searches and shows, comma-separated; empty enables every
+# registered scraper
+app.config['ENABLED_PLATFORMS'] = [
+    name for name in os.environ.get('ENABLED_PLATFORMS', '').split(',') if name.strip()
+]
+# Maximum concurrent scrapes (or review fetches) against any one platform, unless the
+# platform's scraper declares its own limit
+app.config['PLATFORM_CONCURRENCY'] = int(os.environ.get('PLATFORM_CONCURRENCY', 4))
+# Per-platform overrides of what each scraper declares, as name:value pairs, e.g.
+# PLATFORM_RATE_LIMITS="amazon:0.5,flipkart:1" (requests per second per storefront),
+# PLATFORM_CONCURRENCY_LIMITS="alibaba:2", PLATFORM_TIMEOUTS="croma:5" (seconds per request)
+app.config['PLATFORM_RATE_LIMITS'] = parse_platform_map(os.environ.get('PLATFORM_RATE_LIMITS'))
+app.config['PLATFORM_CONCURRENCY_LIMITS'] = parse_platform_map(os.environ.get('PLATFORM_CONCURRENCY_LIMITS'), int)
+app.config['PLATFORM_TIMEOUTS'] = parse_platform_map(os.environ.get('PLATFORM_TIMEOUTS'))
+# Processes extracting products and reviews from scraped pages, so parsing runs on every
+# core instead of queueing on the GIL; 0 parses on the scraping thread
+app.config['PARSE_POOL_SIZE'] = int(os.environ.get('PARSE_POOL_SIZE', 0))
+# Keep-alive connections the scrapers keep open per host, and how many hosts keep their pools
+app.config['HTTP_POOL_MAXSIZE'] = int(os.environ.get('HTTP_POOL_MAXSIZE', 16))
+app.config['HTTP_POOL_CONNECTIONS'] = int(os.environ.get('HTTP_POOL_CONNECTIONS', 10))
+# Wait for a free connection rather than opening a throwaway one when a host's pool is busy
+app.config['HTTP_POOL_BLOCK'] = os.environ.get('HTTP_POOL_BLOCK', 'false').lower() == 'true'
+# How scrapers reach the storefronts: 'live', 'record' (live, saving every response to the
+# fixture store) or 'replay' (only from the fixture store, never touching the network)
+app.config['SCRAPE_TRANSPORT'] = os.environ.get('SCRAPE_TRANSPORT', 'live')
+app.config['SCRAPE_FIXTURE_DIR'] = os.environ.get(
+    'SCRAPE_FIXTURE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'fixtures')
+)
+# Simulated network time per replayed request: seconds, or 'recorded' for the recorded time
+app.config['SCRAPE_REPLAY_LATENCY'] = parse_latency(os.environ.get('SCRAPE_REPLAY_LATENCY'))
+# Requests a storefront with a rate limit may get in a burst after an idle period;
+# a request is only delayed when it would exceed the platform's rate
+app.config['SCRAPE_RATE_BURST'] = int(os.environ.get('SCRAPE_RATE_BURST', 3))
+# Keep raw scraper responses for debugging: every page that failed to parse, and/or a
+# sampled fraction of all pages, in a ring buffer of the newest DEBUG_CAPTURE_MAX pages
+app.config['DEBUG_CAPTURE_ON_FAILURE'] = os.environ.get('DEBUG_CAPTURE_ON_FAILURE', 'false').lower() == 'true'
+app.config['DEBUG_CAPTURE_SAMPLE_RATE'] = float(os.environ.get('DEBUG_CAPTURE_SAMPLE_RATE', 0.0))
+app.config['DEBUG_CAPTURE_MAX'] = int(os.environ.get('DEBUG_CAPTURE_MAX', 50))
+app.config['DEBUG_CAPTURE_DIR'] = os.environ.get(
+    'DEBUG_CAPTURE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'debug_captures')
+)
+# Users allowed to read the debug captures (any logged-in user when the app runs in debug mode)
+app.config['DEBUG_CAPTURE_USERS'] = [name.strip() for name in
+                                     os.environ.get('DEBUG_CAPTURE_USERS', 'admin').split(',') if name.strip()]
+# Shared directory for cross-process cache locks; unset coalesces within this process only
+app.config['CACHE_LOCK_DIR'] = os.environ.get('CACHE_LOCK_DIR')
+# Where cached results live: 'file' (one file per entry under data/cache) or 'sqlite'
+# (a single WAL-mode database shared by every worker on the node)
+app.config['CACHE_BACKEND'] = os.environ.get('CACHE_BACKEND', 'file')
+app.config['CACHE_SQLITE_PATH'] = os.environ.get(
+    'CACHE_SQLITE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cache.sqlite3')
+)
+# Take advisory per-shard locks so a slow writer never replaces a newer cache entry and the
+# sweeper never deletes one that was just rewritten (writes are atomic either way)
+app.config['CACHE_WRITE_LOCKS'] = os.environ.get('CACHE_WRITE_LOCKS', 'false').lower() == 'true'
+# On-disk format for new cache entries: json, zlib, or msgpack/msgpack-zlib when msgpack is
+# installed. Entries in other formats are still read; `python cache.py migrate` converts them.
+app.config['CACHE_FORMAT'] = os.environ.get('CACHE_FORMAT', 'zlib')
+# Entries kept in the in-process LRU tier in front of the file cache (0 disables it)
+app.config['CACHE_MEMORY_ENTRIES'] = int(os.environ.get('CACHE_MEMORY_ENTRIES', 512))
+# Disk limits for data/cache, enforced by a periodic sweep (interval 0 disables the
+# background sweep; `python cache.py sweep` runs one by hand)
+app.config['CACHE_MAX_ENTRIES'] = int(os.environ.get('CACHE_MAX_ENTRIES', 5000))
+app.config['CACHE_MAX_BYTES'] = int(os.environ.get('CACHE_MAX_BYTES', 200 * 1024 * 1024))
+app.config['CACHE_SWEEP_INTERVAL'] = int(os.environ.get('CACHE_SWEEP_INTERVAL', 900))
+# For this long after a product search expires, serve it stale and re-scrape in the background
+app.config['PRODUCT_CACHE_STALE_SECONDS'] = int(os.environ.get('PRODUCT_CACHE_STALE_SECONDS', 6 * 3600))
+# Searches that found nothing are retried sooner than real results
+app.config['EMPTY_RESULT_TTL'] = int(os.environ.get('EMPTY_RESULT_TTL', 300))
+# A failed scrape (blocked, non-200, network error) is not retried for this long,
+# doubling on every consecutive failure up to the maximum
+app.config['SCRAPE_FAILURE_TTL'] = int(os.environ.get('SCRAPE_FAILURE_TTL', 60))
+app.config['SCRAPE_FAILURE_MAX_TTL'] = int(os.environ.get('SCRAPE_FAILURE_MAX_TTL', 1800))
+# Stop sending requests to a platform that is failing or very slow, serving fallbacks at
+# once: the circuit opens when, over the last CIRCUIT_WINDOW seconds and at least
+# CIRCUIT_MIN_CALLS requests, the share that failed or ran slow reaches its threshold
+app.config['CIRCUIT_BREAKER_ENABLED'] = os.environ.get('CIRCUIT_BREAKER_ENABLED', 'true').lower() == 'true'
+app.config['CIRCUIT_WINDOW'] = int(os.environ.get('CIRCUIT_WINDOW', 60))
+app.config['CIRCUIT_MIN_CALLS'] = int(os.environ.get('CIRCUIT_MIN_CALLS', 5))
+app.config['CIRCUIT_FAILURE_RATE'] = float(os.environ.get('CIRCUIT_FAILURE_RATE', 0.5))
+app.config['CIRCUIT_SLOW_CALL_SECONDS'] = float(os.environ.get('CIRCUIT_SLOW_CALL_SECONDS', 8))
+app.config['CIRCUIT_SLOW_CALL_RATE'] = float(os.environ.get('CIRCUIT_SLOW_CALL_RATE', 0.8))
+# How long an open circuit waits before letting a single probe request through
+app.config['CIRCUIT_OPEN_SECONDS'] = int(os.environ.get('CIRCUIT_OPEN_SECONDS', 30))
+# Review summaries change slowly, so they are cached per product far longer than searches
+app.config['REVIEW_CACHE_TTL'] = int(os.environ.get('REVIEW_CACHE_TTL', 12 * 3600))
+app.config['REVIEW_CACHE_STALE_SECONDS'] = int(os.environ.get('REVIEW_CACHE_STALE_SECONDS', 24 * 3600))
+# Re-scrape the week's most searched queries before their cache entries expire (0 disables)
+app.config['CACHE_WARM_INTERVAL'] = int(os.environ.get('CACHE_WARM_INTERVAL', 600))
+app.config['CACHE_WARM_TOP_N'] = int(os.environ.get('CACHE_WARM_TOP_N', 20))
+# Scrapes the warmer may run at once, kept small so it never crowds out live searches
+app.config['CACHE_WARM_CONCURRENCY'] = int(os.environ.get('CACHE_WARM_CONCURRENCY', 2))
+# Lock file electing one warmer among the workers sharing this node's cache
+app.config['CACHE_WARM_LOCK'] = os.environ.get(
+    'CACHE_WARM_LOCK',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cache_warmer.lock')
+)
+
+# Fork the parse workers before anything below starts a thread
+parse_pool.configure(app.config['PARSE_POOL_SIZE'])
+
 # Import extensions
 from extensions import db, migrate, login_manager
 
@@ -72,11 +204,83 @@ def load_user(user_id):
         logger.error(f"Error loading user: {str(e)}")
         return None
 
-# Initialize scrapers with retry mechanisms
-amazon_scraper = ImprovedAmazonScraper()
-flipkart_scraper = ImprovedFlipkartScraper()
-alibaba_scraper = AlibabaProductScraper()
-chroma_scraper = ChromaProductScraper()
+# Create a scraper for each platform this deployment enables
+registry.configure(enabled=app.config['ENABLED_PLATFORMS'],
+                   rate_limits=app.config['PLATFORM_RATE_LIMITS'],
+                   concurrency=app.config['PLATFORM_CONCURRENCY_LIMITS'],
+                   timeouts=app.config['PLATFORM_TIMEOUTS'])
+
+# Platforms searched by /search and the streamed search
+SEARCH_PLATFORMS = registry.names()
+# The platform quick searches use, and the fallback pick for the most reliable one
+DEFAULT_PLATFORM = SEARCH_PLATFORMS[0] if SEARCH_PLATFORMS else None
+
+def with_alpha(color, alpha):
+    """A declared 'rgba(r, g, b, a)' chart color with its opacity replaced"""
+    channels = color[color.index('(') + 1:color.rindex(')')].split(',')[:3]
+    return f"rgba({', '.join(channel.strip() for channel in channels)}, {alpha})"
+
+@app.context_processor
+def inject_platforms():
+    """The enabled platforms and their chart colors, for the results legend and chart"""
+    return {'platform_legend': [
+        {'name': platform['name'], 'display_name': platform['display_name'],
+         'border': with_alpha(platform['color'], 1), 'background': with_alpha(platform['color'], 0.2)}
+        for platform in registry.describe() if platform['enabled']
+    ]}
+
+# Worker pools shared by every request. Scrapes and review fetches get their
+# own pools so slow review pages cannot starve product searches, and each
+# platform is capped so one slow site cannot take every worker.
+platform_limits = {scraper.name: scraper.concurrency or app.config['PLATFORM_CONCURRENCY']
+                   for scraper in registry.scrapers()}
+pipeline_pool = WorkerPool('pipeline', app.config['PIPELINE_POOL_SIZE'])
+scrape_pool = WorkerPool('scrape', app.config['SCRAPE_POOL_SIZE'],
+                         max_queue=app.config['SCRAPE_POOL_MAX_QUEUE'],
+                         platform_limits=platform_limits)
+review_pool = WorkerPool('review', app.config['REVIEW_POOL_SIZE'],
+                         max_queue=app.config['REVIEW_POOL_MAX_QUEUE'],
+                         platform_limits=platform_limits)
+
+# Shared engine that fans each search out to all platforms concurrently
+search_engine = SearchEngine(executor=pipeline_pool)
+
+# Connection pools shared by every scraper
+http_client.configure(pool_connections=app.config['HTTP_POOL_CONNECTIONS'],
+                      pool_maxsize=app.config['HTTP_POOL_MAXSIZE'],
+                      pool_block=app.config['HTTP_POOL_BLOCK'])
+if app.config['SCRAPE_TRANSPORT'] != 'live':
+    http_client.use_transport(Transport(app.config['SCRAPE_TRANSPORT'],
+                                        FixtureStore(app.config['SCRAPE_FIXTURE_DIR']),
+                                        latency=app.config['SCRAPE_REPLAY_LATENCY']))
+# Replayed requests never reach the storefronts, so they are not rate limited
+for scraper in registry.scrapers():
+    if scraper.host and app.config['SCRAPE_TRANSPORT'] != 'replay':
+        rate_limiter.configure(scraper.rate_limit, app.config['SCRAPE_RATE_BURST'], host=scraper.host)
+circuit_breakers.configure(enabled=app.config['CIRCUIT_BREAKER_ENABLED'],
+                           window=app.config['CIRCUIT_WINDOW'],
+                           min_calls=app.config['CIRCUIT_MIN_CALLS'],
+                           failure_rate=app.config['CIRCUIT_FAILURE_RATE'],
+                           slow_call_seconds=app.config['CIRCUIT_SLOW_CALL_SECONDS'],
+                           slow_call_rate=app.config['CIRCUIT_SLOW_CALL_RATE'],
+                           open_seconds=app.config['CIRCUIT_OPEN_SECONDS'])
+debug_capture.configure(directory=app.config['DEBUG_CAPTURE_DIR'],
+                        max_captures=app.config['DEBUG_CAPTURE_MAX'],
+                        sample_rate=app.config['DEBUG_CAPTURE_SAMPLE_RATE'],
+                        on_failure=app.config['DEBUG_CAPTURE_ON_FAILURE'])
+
+# Let worker processes wait on each other's scrapes of the same query
+if app.config['CACHE_LOCK_DIR']:
+    single_flight.use_file_locks(app.config['CACHE_LOCK_DIR'])
+memory_cache.resize(app.config['CACHE_MEMORY_ENTRIES'])
+if app.config['CACHE_BACKEND'] == 'sqlite':
+    use_backend(SQLiteBackend(app.config['CACHE_SQLITE_PATH']))
+use_write_locks(app.config['CACHE_WRITE_LOCKS'])
+use_serializer(app.config['CACHE_FORMAT'])
+if app.config['CACHE_SWEEP_INTERVAL'] > 0:
+    start_sweeper(app.config['CACHE_SWEEP_INTERVAL'],
+                  max_entries=app.config['CACHE_MAX_ENTRIES'],
+                  max_bytes=app.config['CACHE_MAX_BYTES'])
 
 # Initialize models
 forecaster = PriceForecaster()
@@ -184,6 +388,26 @@ def process_search_query(query):
         "original_query": query
     }
 
+def canonical_query(query):
+    """
+    Normalize a search query for cache keys.
+    
+    Case, spacing and punctuation are dropped and specs are spelled one way
+    ("128 GB" -> "128gb", "15 Pro" -> "15pro", '6.1"' -> "6.1inch"). The
+    words and their order are kept, so "iPhone 15" and "IPHONE  15" share a
+    key but "iPhone 14" does not. The type, brand and specs found by
+    process_search_query lead the key so the folding report reads well.
+    """
+    text = query.lower()
+    text = re.sub(r'(\d)\s*(?:"|inches\b)', r'\1inch', text)
+    text = re.sub(r'(\d+)\s*(gb|tb|inch|pro|air|max|ultra|plus|mini|lite)\b', r'\1\2', text)
+    text = re.sub(r'[^\w\s.+]|(?<!\d)\.|\.(?!\d)', ' ', text)
+    words = ' '.join(text.split())
+    
+    query_info = process_search_query(words)
+    specs = ','.join(sorted(set(spec.lower().replace(' ', '') for spec in query_info['model_specs'])))
+    return f"{query_info['product_type'] or '-'}|{query_info['brand'] or '-'}|{specs}|{words}"
+
 def filter_results(products, query_info):
     """Filter search results to exclude accessories and focus on main product with improved accuracy"""
     filtered_products = []
@@ -326,29 +550,6 @@ def calculate_relevance_score(product, query_info):
     
     return score
 
-def timeout_scraper(func, args=(), kwargs={}, timeout_duration=10, default=None):
-    """Run a function with a timeout"""
-    import signal
-    
-    class TimeoutError(Exception):
-        pass
-    
-    def handler(signum, frame):
-        raise TimeoutError()
-    
-    # Set the timeout handler
-    signal.signal(signal.SIGALRM, handler)
-    signal.alarm(timeout_duration)
-    
-    try:
-        result = func(*args, **kwargs)
-    except TimeoutError:
-        result = default
-    finally:
-        signal.alarm(0)
-    
-    return result
-
 def get_dummy_products(query, platform):
     """Generate dummy products if scraping fails with improved realism"""
     logger.info(f"Using dummy data for {platform}")
@@ -482,23 +683,486 @@ def save_search_history(query, user_id=None):
         db.session.rollback()
         logger.error(f"Error saving search history: {str(e)}")
 
-@cached(expiry=3600)  # Cache for 1 hour
-def get_cached_products(query, platform):
-    """Cache product results to avoid repeated scraping for the same query"""
-    try:
-        if platform == 'amazon':
-            return amazon_scraper.search_product(query)
-        elif platform == 'flipkart':
-            amazon_products = get_cached_products(query, 'amazon')
-            return flipkart_scraper.search_product(query, amazon_products)
-        elif platform == 'alibaba':
-            return alibaba_scraper.search_product(query)
-        elif platform == 'croma':
-            return chroma_scraper.search_product(query)
+def trending_queries(limit=5, days=7):
+    """Most searched queries of the last `days` days, most popular first"""
+    since = datetime.utcnow() - timedelta(days=days)
+    popular_searches = db.session.query(
+        SearchHistory.query, 
+        func.count(SearchHistory.id).label('count')
+    ).filter(
+        SearchHistory.timestamp >= since
+    ).group_by(
+        SearchHistory.query
+    ).order_by(
+        text('count DESC')
+    ).limit(limit).all()
+    
+    return [search[0] for search in popular_searches]
+
+def product_cache_key(query, platform, deadline=None):
+    """Cache key for a platform search: queries that differ only cosmetically share an entry"""
+    return f"{canonical_query(query)}|{platform}"
+
+@cached(expiry=3600, ignore_kwargs=('deadline',),  # Cache for 1 hour
+        stale_while_revalidate=app.config['PRODUCT_CACHE_STALE_SECONDS'],
+        key_func=product_cache_key,
+        empty_ttl=app.config['EMPTY_RESULT_TTL'],
+        failure_ttl=app.config['SCRAPE_FAILURE_TTL'],
+        max_failure_ttl=app.config['SCRAPE_FAILURE_MAX_TTL'],
+        failure_exceptions=(ScrapeError,))
+def get_cached_products(query, platform, deadline=None):
+    """
+    Cache product results to avoid repeated scraping for the same query.
+    
+    Raises ScrapeError when the platform could not be scraped,
+    CachedFailure while a recent failure is still being backed off, or
+    CircuitOpenError while the platform's circuit breaker is open.
+    """
+    scraper = registry.get(platform)
+    if scraper is None:
         return []
+    try:
+        # Cached results are still served while the circuit is open; only scraping stops
+        circuit_breakers.check(platform)
+        # Fallback data is built by the search pipeline, never cached
+        return scraper.search_live(query, deadline=deadline)
+    except (DeadlineExceeded, ScrapeError, CircuitOpenError):
+        # Let these propagate: a cut-short or skipped scrape is never cached,
+        # and a failed one is cached as a failure rather than as an empty result
+        raise
     except Exception as e:
         logger.error(f"Error in get_cached_products for {platform}: {str(e)}")
-        return []
+        raise ScrapeError(platform, str(e)) from e
+
+def fetch_cached_products(query, platform, deadline=None):
+    """Get products along with whether they were a fresh, stale, missed or failed cache entry"""
+    try:
+        products = get_cached_products(query, platform, deadline=deadline)
+    except CircuitOpenError as e:
+        logger.info(f"Skipping search on {platform}: {str(e)}")
+        return [], 'circuit_open'
+    except (ScrapeError, CachedFailure) as e:
+        logger.warning(f"Search on {platform} failed: {str(e)}")
+        products = []
+    # Read on the same worker thread that made the lookup
+    return products, last_cache_status()
+
+def canonical_product_url(url):
+    """
+    Reduce a product URL to the part that identifies the product, so links
+    carrying different tracking parameters share one review cache entry.
+
+    Amazon URLs become /dp/<ASIN>; Flipkart keeps its path and the pid
+    parameter; other platforms keep only the path.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    path = parts.path.rstrip('/')
+
+    if 'amazon.' in host:
+        match = re.search(r'/(?:dp|gp/product|gp/aw/d)/([A-Z0-9]{10})', path, re.IGNORECASE)
+        if match:
+            return f"https://{host}/dp/{match.group(1).upper()}"
+    elif 'flipkart.' in host:
+        pid = parse_qs(parts.query).get('pid')
+        if pid:
+            return f"https://{host}{path}?pid={pid[0]}"
+
+    return f"https://{host}{path}"
+
+def review_cache_key(platform, url, deadline=None):
+    """Cache key for a product's reviews: one entry per canonical product URL"""
+    return f"{platform}|{canonical_product_url(url)}"
+
+@cached(expiry=app.config['REVIEW_CACHE_TTL'], ignore_kwargs=('deadline',),
+        stale_while_revalidate=app.config['REVIEW_CACHE_STALE_SECONDS'],
+        key_func=review_cache_key,
+        empty_ttl=app.config['EMPTY_RESULT_TTL'],
+        # Kept out of the per-process memory tier so invalidate_reviews() reaches every worker
+        memory=False)
+def get_cached_reviews(platform, url, deadline=None):
+    """
+    Cache scraped review summaries per product.
+
+    Returns an empty dict when the platform gave us no real reviews; the
+    scrapers' own placeholder data is never cached, so such products are
+    retried once the short empty-result lifetime is up.
+    """
+    scraper = registry.get(platform)
+    if scraper is None or not scraper.supports_reviews:
+        return {}
+    circuit_breakers.check(platform)
+    reviews = scraper.get_product_reviews(url, deadline=deadline)
+
+    if not reviews or not reviews.get('total_reviews'):
+        return {}
+    if reviews.get('is_real_data') is False or reviews.get('note') == 'Dummy data':
+        return {}
+    return reviews
+
+def invalidate_reviews(platform, url):
+    """Forget the cached reviews for a product so the next search scrapes them again"""
+    get_cached_reviews.invalidate(platform, url)
+
+def get_platform_reviews(platform, products, deadline=None):
+    """Get reviews for the top-ranked product of a platform"""
+    try:
+        if not products or len(products) == 0 or 'url' not in products[0]:
+            return get_dummy_reviews()
+        
+        # Give review scraping its own, tighter budget to prevent long delays
+        deadline = deadline or Deadline.unbounded()
+        review_deadline = deadline.child(app.config['REVIEW_TIMEOUT'])
+        
+        # Repeat queries are served from the cache without touching the platform
+        reviews = get_cached_reviews(platform, products[0]['url'], deadline=review_deadline)
+            
+        # If no reviews were found, use dummy data
+        if not reviews or 'total_reviews' not in reviews or reviews['total_reviews'] == 0:
+            reviews = get_dummy_reviews()
+            
+        return reviews
+    except CircuitOpenError as e:
+        logger.info(f"Skipping review fetch for {platform}: {str(e)}")
+        return get_dummy_reviews()
+    except DeadlineExceeded:
+        logger.warning(f"Review fetch for {platform} ran out of time, using dummy data")
+        return get_dummy_reviews()
+    except Exception as e:
+        logger.error(f"Error getting reviews for {platform}: {str(e)}")
+        return get_dummy_reviews()
+
+def find_best_deal(all_products):
+    """Find the lowest priced product across all platforms"""
+    lowest_price = float('inf')
+    best_platform = None
+    best_product = None
+    
+    for platform, products in all_products.items():
+        for product in products:
+            try:
+                # Skip products without a price
+                if 'price' not in product or not product['price']:
+                    continue
+                    
+                # Try to convert price to float
+                price_str = product['price']
+                # Remove any currency symbols and commas
+                price_str = re.sub(r'[^\d.]', '', price_str)
+                price = float(price_str)
+                
+                if price > 0 and price < lowest_price:
+                    lowest_price = price
+                    best_platform = platform
+                    best_product = product
+            except (ValueError, TypeError) as e:
+                logger.warning(f"Error parsing price for product: {product.get('name', 'Unknown')}: {str(e)}")
+                continue
+    
+    return {
+        'platform': best_platform,
+        'product': best_product,
+        'price': lowest_price if lowest_price != float('inf') else 'N/A'
+    }
+
+def save_best_price(best_deal):
+    """Save the best deal's price to the price history used for forecasting"""
+    best_product = best_deal['product']
+    best_platform = best_deal['platform']
+    lowest_price = best_deal['price']
+    if not best_product or not best_platform or lowest_price == 'N/A':
+        return False
+    
+    try:
+        # Check if this product already exists in the database
+        existing_product = db.session.query(PriceHistory).filter_by(
+            product_name=best_product['name'],
+            platform=best_platform
+        ).order_by(PriceHistory.timestamp.desc()).first()
+        
+        # Only add if price is different or product doesn't exist
+        if not existing_product or abs(existing_product.price - lowest_price) > 1:
+            price_history = PriceHistory(
+                product_name=best_product['name'],
+                platform=best_platform,
+                price=float(lowest_price),
+                url=best_product.get('url', '')
+            )
+            db.session.add(price_history)
+            db.session.commit()
+            logger.info(f"Saved price history for {best_product['name']}")
+            return True
+        else:
+            logger.info(f"Skipped saving duplicate price for {best_product['name']}")
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error saving price history: {str(e)}")
+    return False
+
+def analyze_platform_reliability(platform_reviews):
+    """Work out the most reliable platform and the sentiment bar widths for each platform"""
+    # Calculate platform reliability scores
+    try:
+        # Recalculate reliability scores to ensure they're correct
+        for platform, reviews in platform_reviews.items():
+            reviews['reliability_score'] = calculate_reliability_score(
+                reviews['positive'], 
+                reviews['neutral'], 
+                reviews['negative']
+            )
+        
+        # Find most reliable platform
+        most_reliable_platform = max(platform_reviews.items(), key=lambda x: x[1]['reliability_score'])[0]
+        reliability_score = platform_reviews[most_reliable_platform]['reliability_score']
+        
+        reliability_results = {
+            'most_reliable_platform': most_reliable_platform,
+            'reliability_score': reliability_score,
+            'platform_scores': platform_reviews
+        }
+    except Exception as e:
+        logger.error(f"Error analyzing platform reliability: {str(e)}")
+        # Generate dummy reliability results
+        reliability_results = {
+            'most_reliable_platform': DEFAULT_PLATFORM,
+            'reliability_score': 85,
+            'platform_scores': platform_reviews
+        }
+    
+    # Calculate progress bar widths for platform reliability
+    if 'platform_scores' in reliability_results:
+        for platform, scores in reliability_results['platform_scores'].items():
+            total = scores['total_reviews'] if scores['total_reviews'] > 0 else 1
+            scores['positive_width'] = round((scores['positive'] / total) * 100, 1)
+            scores['neutral_width'] = round((scores['neutral'] / total) * 100, 1)
+            scores['negative_width'] = round((scores['negative'] / total) * 100, 1)
+    
+    return reliability_results
+
+def get_price_history_data(best_product, best_platform, platforms):
+    """Build the price history, chart data and trends for the best deal"""
+    try:
+        if best_product and best_platform:
+            # Get historical price data from database
+            product_name = best_product['name']
+            
+            # Query the database for price history
+            price_history_records = db.session.query(PriceHistory).filter_by(
+                product_name=product_name,
+                platform=best_platform
+            ).order_by(PriceHistory.timestamp).all()
+            
+            combined_history = []
+            
+            # Convert database records to dictionary format
+            for record in price_history_records:
+                combined_history.append({
+                    'product': record.product_name,
+                    'price': str(record.price),
+                    'timestamp': record.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+                    'platform': best_platform.title(),
+                    'url': record.url
+                })
+            
+            # Add to response
+            if combined_history:
+                # Prepare chart data
+                chart_labels = [item.get('timestamp', '').split(' ')[0] for item in combined_history]
+                chart_data = {}
+                
+                # Initialize all platforms with null data
+                for platform in platforms:
+                    chart_data[platform] = [None] * len(chart_labels)
+                
+                # Add data for the best platform
+                for i, item in enumerate(combined_history):
+                    platform = best_platform
+                    try:
+                        chart_data[platform][i] = float(item['price'])
+                    except (ValueError, IndexError):
+                        pass
+                
+                # Add chart data to response
+                chart_data['labels'] = chart_labels
+                
+                # Calculate trends
+                trends = {}
+                if len(combined_history) >= 2:
+                    prices = [float(item['price']) for item in combined_history]
+                    first_price = prices[0]
+                    last_price = prices[-1]
+                    
+                    # Overall trend
+                    if first_price > 0:
+                        overall_change = ((last_price - first_price) / first_price) * 100
+                        trends['overall'] = round(overall_change, 1)
+                    else:
+                        trends['overall'] = None
+                    
+                    # Last week trend (if we have enough data)
+                    if len(prices) >= 7:
+                        week_ago_price = prices[-7] if len(prices) >= 7 else prices[0]
+                        if week_ago_price > 0:
+                            week_change = ((last_price - week_ago_price) / week_ago_price) * 100
+                            trends['last_week'] = round(week_change, 1)
+                        else:
+                            trends['last_week'] = None
+                    else:
+                        trends['last_week'] = None
+                    
+                    # Last month trend
+                    if len(prices) >= 30:
+                        month_ago_price = prices[-30] if len(prices) >= 30 else prices[0]
+                        if month_ago_price > 0:
+                            month_change = ((last_price - month_ago_price) / month_ago_price) * 100
+                            trends['last_month'] = round(month_change, 1)
+                        else:
+                            trends['last_month'] = None
+                    else:
+                        trends['last_month'] = None
+                    
+                    # Lowest and highest ever
+                    trends['lowest_ever'] = min(prices)
+                    trends['highest_ever'] = max(prices)
+                else:
+                    trends = {
+                        'overall': None,
+                        'last_week': None,
+                        'last_month': None,
+                        'lowest_ever': float(combined_history[0]['price']) if combined_history else None,
+                        'highest_ever': float(combined_history[0]['price']) if combined_history else None
+                    }
+                
+                return {
+                    'history': combined_history,
+                    'chart_data': chart_data,
+                    'trends': trends
+                }
+    except Exception as e:
+        logger.error(f"Error preparing price history: {str(e)}")
+        logger.error(traceback.format_exc())
+    
+    return None
+
+def rank_products(products, query_info):
+    """Score products for relevance to the query, best match first"""
+    # Calculate relevance score for each product
+    for product in products:
+        product['relevance_score'] = calculate_relevance_score(product, query_info)
+    
+    # Sort by relevance score (highest first)
+    return sorted(products, key=lambda x: x.get('relevance_score', 0), reverse=True)
+
+def build_search_pipeline(query, query_info, platforms, deadline=None):
+    """
+    Build the stage graph for a search.
+    
+    Per platform: fetch -> filter -> score -> reviews. The best deal waits
+    for every platform's scored products, the price history save waits for
+    the best deal, and the trends stage reads the history once it is saved.
+    Live scrapes all run side by side; only the fallback path of a platform
+    with `fallback_from` (Flipkart) waits for that platform's products. The
+    deadline is passed to every scraper call, and stages doing I/O are
+    abandoned once it expires.
+    """
+    pipeline = SearchPipeline(deadline=deadline)
+    
+    def add_platform_stages(platform):
+        async def fetch(ctx):
+            # Try to get from cache first
+            products, cache_status = await ctx.run(fetch_cached_products, query, platform, deadline)
+            pipeline.annotations.setdefault('cache_status', {})[platform] = cache_status
+            if products:
+                return products
+            scraper = registry.get(platform)
+            if scraper is not None:
+                reference = None
+                if scraper.fallback_from in platforms:
+                    reference = await ctx.wait_for(f'fetch:{scraper.fallback_from}')
+                fallback = scraper.fallback_products(query, reference)
+                if fallback:
+                    return fallback
+            return get_dummy_products(query, platform)
+        
+        def filter_stage(results):
+            # Filter products to exclude accessories
+            return filter_results(results[f'fetch:{platform}'], query_info)
+        
+        def score(results):
+            return rank_products(results[f'filter:{platform}'], query_info)
+        
+        def reviews(results):
+            return get_platform_reviews(platform, results[f'score:{platform}'], deadline)
+        
+        dummy_products = lambda results: get_dummy_products(query, platform)
+        pipeline.add_stage(f'fetch:{platform}', fetch, fallback=dummy_products, bounded=True,
+                           executor=scrape_pool, platform=platform)
+        pipeline.add_stage(f'filter:{platform}', filter_stage,
+                           requires=[f'fetch:{platform}'], fallback=dummy_products)
+        pipeline.add_stage(f'score:{platform}', score,
+                           requires=[f'filter:{platform}'], fallback=dummy_products)
+        pipeline.add_stage(f'reviews:{platform}', reviews,
+                           requires=[f'score:{platform}'], fallback=lambda results: get_dummy_reviews(),
+                           bounded=True, executor=review_pool, platform=platform)
+    
+    for platform in platforms:
+        add_platform_stages(platform)
+    
+    def best_deal(results):
+        return find_best_deal({platform: results[f'score:{platform}'] for platform in platforms})
+    
+    def price_history(results):
+        # Runs on a worker thread, so it needs its own app context for the session
+        with app.app_context():
+            return save_best_price(results['best_deal'])
+    
+    def trends(results):
+        best_deal = results['best_deal']
+        with app.app_context():
+            return get_price_history_data(best_deal['product'], best_deal['platform'], platforms)
+    
+    pipeline.add_stage('best_deal', best_deal,
+                       requires=[f'score:{platform}' for platform in platforms])
+    pipeline.add_stage('price_history', price_history, requires=['best_deal'], bounded=True)
+    # Reads the history after the new price point has been saved
+    pipeline.add_stage('trends', trends, requires=['best_deal', 'price_history'], bounded=True)
+    
+    return pipeline
+
+def warm_popular_queries():
+    """Queries the cache warmer keeps fresh"""
+    # Runs on the warmer's thread, so it needs its own app context for the session
+    with app.app_context():
+        return trending_queries(limit=app.config['CACHE_WARM_TOP_N'])
+
+def warm_search_cache(query, platform):
+    """
+    Refresh a platform's cached products for a query, and the cached
+    reviews of the product a search would show reviews for, if either
+    expires before the warmer's next run.
+    """
+    # Twice the interval, so an entry never lapses between two runs
+    refresh_within = 2 * app.config['CACHE_WARM_INTERVAL']
+    try:
+        refreshed = get_cached_products.prefetch(query, platform, refresh_within=refresh_within)
+    except CircuitOpenError:
+        # Leave a platform that is down alone; its cached entries stay as they are
+        return False
+    
+    products, _ = fetch_cached_products(query, platform)
+    query_info = process_search_query(query)
+    ranked = rank_products(filter_results(products, query_info), query_info)
+    if ranked and 'url' in ranked[0]:
+        refreshed = get_cached_reviews.prefetch(platform, ranked[0]['url'], refresh_within=refresh_within) or refreshed
+    return refreshed
+
+warm_pool = WorkerPool('warm', max(app.config['CACHE_WARM_CONCURRENCY'], 1), platform_limits={
+    platform: 1 for platform in SEARCH_PLATFORMS
+})
+cache_warmer = CacheWarmer(warm_popular_queries, warm_search_cache, SEARCH_PLATFORMS, warm_pool,
+                           lock_path=app.config['CACHE_WARM_LOCK'])
+if app.config['CACHE_WARM_INTERVAL'] > 0:
+    cache_warmer.start(app.config['CACHE_WARM_INTERVAL'])
 
 # Authentication routes
 @app.route('/login', methods=['GET', 'POST'])
@@ -634,19 +1298,7 @@ def index():
     trending_searches = []
     try:
         # Get most popular searches in the last week
-        one_week_ago = datetime.utcnow() - timedelta(days=7)
-        popular_searches = db.session.query(
-            SearchHistory.query, 
-            func.count(SearchHistory.id).label('count')
-        ).filter(
-            SearchHistory.timestamp >= one_week_ago
-        ).group_by(
-            SearchHistory.query
-        ).order_by(
-            text('count DESC')
-        ).limit(5).all()
-        
-        trending_searches = [search[0] for search in popular_searches]
+        trending_searches = trending_queries(limit=5)
     except Exception as e:
         logger.error(f"Error fetching trending searches: {str(e)}")
     
@@ -659,19 +1311,7 @@ def guest_search():
     trending_searches = []
     try:
         # Get most popular searches in the last week
-        one_week_ago = datetime.utcnow() - timedelta(days=7)
-        popular_searches = db.session.query(
-            SearchHistory.query, 
-            func.count(SearchHistory.id).label('count')
-        ).filter(
-            SearchHistory.timestamp >= one_week_ago
-        ).group_by(
-            SearchHistory.query
-        ).order_by(
-            text('count DESC')
-        ).limit(5).all()
-        
-        trending_searches = [search[0] for search in popular_searches]
+        trending_searches = trending_queries(limit=5)
     except Exception as e:
         logger.error(f"Error fetching trending searches for guest: {str(e)}")
     
@@ -700,204 +1340,28 @@ def search():
     else:
         save_search_history(query)
     
-    # Get products from all platforms using parallel processing
-    all_products = {}
-    platform_reviews = {}
+    platforms = SEARCH_PLATFORMS
     
-    # Define platforms
-    platforms = ['amazon', 'flipkart', 'alibaba', 'croma']
+    # Run the search pipeline; independent stages run concurrently and
+    # everything shares one time budget
+    deadline = Deadline(app.config['SEARCH_TIMEOUT'])
+    pipeline = build_search_pipeline(query, query_info, platforms, deadline)
+    results = search_engine.run(pipeline)
     
-    # Function to scrape a single platform
-    def scrape_platform(platform):
-        try:
-            # Try to get from cache first
-            products = get_cached_products(query, platform)
-            if not products or len(products) == 0:
-                if platform == 'amazon':
-                    products = get_dummy_products(query, 'amazon')
-                elif platform == 'flipkart':
-                    amazon_products = all_products.get('amazon', [])
-                    products = flipkart_scraper.create_realistic_dummy_products(query, amazon_products)
-                else:
-                    products = get_dummy_products(query, platform)
-            
-            # Filter products to exclude accessories
-            filtered_products = filter_results(products, query_info)
-            
-            # Calculate relevance score for each product
-            for product in filtered_products:
-                product['relevance_score'] = calculate_relevance_score(product, query_info)
-            
-            # Sort by relevance score (highest first)
-            filtered_products = sorted(filtered_products, key=lambda x: x.get('relevance_score', 0), reverse=True)
-            
-            return platform, filtered_products, None
-        except Exception as e:
-            logger.error(f"Error scraping {platform}: {str(e)}")
-            logger.error(traceback.format_exc())
-            return platform, get_dummy_products(query, platform), e
+    all_products = {platform: results[f'score:{platform}'] for platform in platforms}
+    platform_reviews = {platform: results[f'reviews:{platform}'] for platform in platforms}
+    best_deal = results['best_deal'] or find_best_deal(all_products)
     
-    # First, get Amazon products (needed for Flipkart)
-    try:
-        amazon_result = scrape_platform('amazon')
-        all_products[amazon_result[0]] = amazon_result[1]
-    except Exception as e:
-        logger.error(f"Error in Amazon scraping: {str(e)}")
-        logger.error(traceback.format_exc())
-        all_products['amazon'] = get_dummy_products(query, 'amazon')
-    
-    # Then get other platforms in parallel with improved error handling
-    other_platforms = [p for p in platforms if p != 'amazon']
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_platform = {executor.submit(scrape_platform, platform): platform for platform in other_platforms}
-        for future in concurrent.futures.as_completed(future_to_platform):
-            platform = future_to_platform[future]
-            try:
-                platform, products, error = future.result()
-                all_products[platform] = products
-                if error:
-                    logger.warning(f"Used fallback for {platform} due to: {error}")
-            except Exception as e:
-                logger.error(f"Exception for {platform}: {str(e)}")
-                logger.error(traceback.format_exc())
-                all_products[platform] = get_dummy_products(query, platform)
-    
-    # Find the lowest price across all platforms
-    lowest_price = float('inf')
-    best_platform = None
-    best_product = None
-    
-    for platform, products in all_products.items():
-        for product in products:
-            try:
-                # Skip products without a price
-                if 'price' not in product or not product['price']:
-                    continue
-                    
-                # Try to convert price to float
-                price_str = product['price']
-                # Remove any currency symbols and commas
-                price_str = re.sub(r'[^\d.]', '', price_str)
-                price = float(price_str)
-                
-                if price > 0 and price < lowest_price:
-                    lowest_price = price
-                    best_platform = platform
-                    best_product = product
-            except (ValueError, TypeError) as e:
-                logger.warning(f"Error parsing price for product: {product.get('name', 'Unknown')}: {str(e)}")
-                continue
-    
-    # Save price data for forecasting (do this asynchronously)
-    if best_product and best_platform and lowest_price != float('inf'):
-        try:
-            # Check if this product already exists in the database
-            existing_product = db.session.query(PriceHistory).filter_by(
-                product_name=best_product['name'],
-                platform=best_platform
-            ).order_by(PriceHistory.timestamp.desc()).first()
-            
-            # Only add if price is different or product doesn't exist
-            if not existing_product or abs(existing_product.price - lowest_price) > 1:
-                price_history = PriceHistory(
-                    product_name=best_product['name'],
-                    platform=best_platform,
-                    price=float(lowest_price),
-                    url=best_product.get('url', '')
-                )
-                db.session.add(price_history)
-                db.session.commit()
-                logger.info(f"Saved price history for {best_product['name']}")
-            else:
-                logger.info(f"Skipped saving duplicate price for {best_product['name']}")
-        except Exception as e:
-            db.session.rollback()
-            logger.error(f"Error saving price history: {str(e)}")
-    
-    # Get reviews in parallel with improved error handling
-    def get_platform_reviews(platform):
-        try:
-            if platform not in all_products or not all_products[platform]:
-                return platform, get_dummy_reviews()
-            
-            products = all_products[platform]
-            if not products or len(products) == 0 or 'url' not in products[0]:
-                return platform, get_dummy_reviews()
-            
-            # Set a timeout for review scraping to prevent long delays
-            if platform == 'amazon':
-                reviews = timeout_scraper(amazon_scraper.get_product_reviews, args=(products[0]['url'],), timeout_duration=8, default=get_dummy_reviews())
-            elif platform == 'flipkart':
-                reviews = timeout_scraper(flipkart_scraper.get_product_reviews, args=(products[0]['url'],), timeout_duration=8, default=get_dummy_reviews())
-            elif platform == 'alibaba':
-                reviews = timeout_scraper(alibaba_scraper.get_product_reviews, args=(products[0]['url'],), timeout_duration=8, default=get_dummy_reviews())
-            elif platform == 'croma':
-                reviews = timeout_scraper(chroma_scraper.get_product_reviews, args=(products[0]['url'],), timeout_duration=8, default=get_dummy_reviews())
-            else:
-                reviews = get_dummy_reviews()
-                
-            # If no reviews were found, use dummy data
-            if not reviews or 'total_reviews' not in reviews or reviews['total_reviews'] == 0:
-                reviews = get_dummy_reviews()
-                
-            return platform, reviews
-        except Exception as e:
-            logger.error(f"Error getting reviews for {platform}: {str(e)}")
-            return platform, get_dummy_reviews()
-    
-    # Get reviews in parallel with improved error handling
-    with concurrent.futures.ThreadPoolExecutor(max_workers=6) as executor:
-        future_to_platform = {executor.submit(get_platform_reviews, platform): platform for platform in platforms}
-        for future in concurrent.futures.as_completed(future_to_platform):
-            platform = future_to_platform[future]
-            try:
-                platform, reviews = future.result()
-                platform_reviews[platform] = reviews
-            except Exception as e:
-                logger.error(f"Exception getting reviews for {platform}: {str(e)}")
-                platform_reviews[platform] = get_dummy_reviews()
-    
-    # Calculate platform reliability scores
-    try:
-        # Recalculate reliability scores to ensure they're correct
-        for platform, reviews in platform_reviews.items():
-            reviews['reliability_score'] = calculate_reliability_score(
-                reviews['positive'], 
-                reviews['neutral'], 
-                reviews['negative']
-            )
-        
-        # Find most reliable platform
-        most_reliable_platform = max(platform_reviews.items(), key=lambda x: x[1]['reliability_score'])[0]
-        reliability_score = platform_reviews[most_reliable_platform]['reliability_score']
-        
-        reliability_results = {
-            'most_reliable_platform': most_reliable_platform,
-            'reliability_score': reliability_score,
-            'platform_scores': platform_reviews
-        }
-    except Exception as e:
-        logger.error(f"Error analyzing platform reliability: {str(e)}")
-        # Generate dummy reliability results
-        reliability_results = {
-            'most_reliable_platform': 'amazon',
-            'reliability_score': 85,
-            'platform_scores': platform_reviews
-        }
-    
-    # Calculate progress bar widths for platform reliability
-    if 'platform_scores' in reliability_results:
-        for platform, scores in reliability_results['platform_scores'].items():
-            total = scores['total_reviews'] if scores['total_reviews'] > 0 else 1
-            scores['positive_width'] = round((scores['positive'] / total) * 100, 1)
-            scores['neutral_width'] = round((scores['neutral'] / total) * 100, 1)
-            scores['negative_width'] = round((scores['negative'] / total) * 100, 1)
+    reliability_results = analyze_platform_reliability(platform_reviews)
     
     # Prepare debug information
     debug_info = {
         'platform_calculations': {},
         'execution_time': round(time.time() - start_time, 2),
-        'query_info': query_info  # Add query info to debug data
+        'query_info': query_info,  # Add query info to debug data
+        'stage_timings': pipeline.timings,
+        # 'stale' platforms were served from an expired entry that is being refreshed
+        'cache_status': pipeline.annotations.get('cache_status', {})
     }
     for platform, reviews in platform_reviews.items():
         debug_info['platform_calculations'][platform] = {
@@ -912,124 +1376,17 @@ def search():
         'query': query,
         'query_info': query_info,  # Add query info to response
         'products': all_products,
-        'best_deal': {
-            'platform': best_platform,
-            'product': best_product,
-            'price': lowest_price if lowest_price != float('inf') else 'N/A'
-        },
+        'best_deal': best_deal,
         'platform_reliability': reliability_results,
         'search_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
         'execution_time': debug_info['execution_time'],
         'debug_info': debug_info
     }
     
-    # Simplify response for faster rendering
-    # Skip historical data and forecasting if response is already taking too long
-    if time.time() - start_time > 5:
-        logger.warning("Search taking too long, skipping historical data and forecasting")
-        return render_template('results.html', data=response)
-    
-    # Add historical price data and trends for the best product (if time permits)
-    try:
-        if best_product and best_platform:
-            # Get historical price data from database
-            product_name = best_product['name']
-            
-            # Query the database for price history
-            price_history_records = db.session.query(PriceHistory).filter_by(
-                product_name=product_name,
-                platform=best_platform
-            ).order_by(PriceHistory.timestamp).all()
-            
-            combined_history = []
-            
-            # Convert database records to dictionary format
-            for record in price_history_records:
-                combined_history.append({
-                    'product': record.product_name,
-                    'price': str(record.price),
-                    'timestamp': record.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                    'platform': best_platform.title(),
-                    'url': record.url
-                })
-            
-            # Add to response
-            if combined_history:
-                # Prepare chart data
-                chart_labels = [item.get('timestamp', '').split(' ')[0] for item in combined_history]
-                chart_data = {}
-                
-                # Initialize all platforms with null data
-                for platform in platforms:
-                    chart_data[platform] = [None] * len(chart_labels)
-                
-                # Add data for the best platform
-                for i, item in enumerate(combined_history):
-                    platform = best_platform
-                    try:
-                        chart_data[platform][i] = float(item['price'])
-                    except (ValueError, IndexError):
-                        pass
-                
-                # Add chart data to response
-                chart_data['labels'] = chart_labels
-                
-                # Calculate trends
-                trends = {}
-                if len(combined_history) >= 2:
-                    prices = [float(item['price']) for item in combined_history]
-                    first_price = prices[0]
-                    last_price = prices[-1]
-                    
-                    # Overall trend
-                    if first_price > 0:
-                        overall_change = ((last_price - first_price) / first_price) * 100
-                        trends['overall'] = round(overall_change, 1)
-                    else:
-                        trends['overall'] = None
-                    
-                    # Last week trend (if we have enough data)
-                    if len(prices) >= 7:
-                        week_ago_price = prices[-7] if len(prices) >= 7 else prices[0]
-                        if week_ago_price > 0:
-                            week_change = ((last_price - week_ago_price) / week_ago_price) * 100
-                            trends['last_week'] = round(week_change, 1)
-                        else:
-                            trends['last_week'] = None
-                    else:
-                        trends['last_week'] = None
-                    
-                    # Last month trend
-                    if len(prices) >= 30:
-                        month_ago_price = prices[-30] if len(prices) >= 30 else prices[0]
-                        if month_ago_price > 0:
-                            month_change = ((last_price - month_ago_price) / month_ago_price) * 100
-                            trends['last_month'] = round(month_change, 1)
-                        else:
-                            trends['last_month'] = None
-                    else:
-                        trends['last_month'] = None
-                    
-                    # Lowest and highest ever
-                    trends['lowest_ever'] = min(prices)
-                    trends['highest_ever'] = max(prices)
-                else:
-                    trends = {
-                        'overall': None,
-                        'last_week': None,
-                        'last_month': None,
-                        'lowest_ever': float(combined_history[0]['price']) if combined_history else None,
-                        'highest_ever': float(combined_history[0]['price']) if combined_history else None
-                    }
-                
-                response['price_history'] = {
-                    'history': combined_history,
-                    'chart_data': chart_data,
-                    'trends': trends
-                }
-    except Exception as e:
-        logger.error(f"Error preparing price history: {str(e)}")
-        logger.error(traceback.format_exc())
+    # Historical prices and trends are computed by the pipeline's trends stage
+    # while the review fetches are still running
+    if results['trends']:
+        response['price_history'] = results['trends']
     
     # Skip SVM analysis to save time
     response['svm_analysis'] = {
@@ -1040,23 +1397,203 @@ def search():
     logger.info(f"Search completed in {debug_info['execution_time']} seconds")
     return render_template('results.html', data=response)
 
+def format_sse(event, payload):
+    """Format a Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+@app.route('/search/live', methods=['GET', 'POST'])
+def search_live():
+    """
+    Render an empty results page that fills itself in from /search/stream.
+    
+    The search form POSTs here, and only that records the search history:
+    the stream is a GET, which browsers may prefetch or replay.
+    """
+    query = (request.form if request.method == 'POST' else request.args).get('query', '').strip()
+    if not query:
+        flash('Please enter a search query', 'error')
+        return redirect(url_for('index'))
+    
+    if request.method == 'POST':
+        if current_user.is_authenticated:
+            save_search_history(query, current_user.id)
+        else:
+            save_search_history(query)
+    
+    response = {
+        'query': query,
+        'query_info': process_search_query(query),
+        'products': {platform: [] for platform in SEARCH_PLATFORMS},
+        'best_deal': {'platform': None, 'product': None, 'price': 'N/A'},
+        'platform_reliability': {
+            'most_reliable_platform': '',
+            'reliability_score': 0,
+            'platform_scores': {}
+        },
+        'search_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'streaming': True,
+        'stream_url': url_for('search_stream', query=query)
+    }
+    return render_template('results.html', data=response)
+
+@app.route('/search/stream')
+def search_stream():
+    """
+    Stream search results as Server-Sent Events.
+    
+    Events: 'products' as each platform is ranked, 'reviews' as each
+    platform's reviews arrive, then 'best_deal', 'price_history' and a
+    final 'done'. Searches running past SEARCH_STREAM_TIMEOUT get a
+    'timeout' event and are closed.
+    """
+    query = request.args.get('query', '').strip()
+    if not query:
+        return jsonify({'error': 'No query provided'}), 400
+    
+    start_time = time.time()
+    query_info = process_search_query(query)
+    logger.info(f"Streaming search for: {query}")
+    
+    platforms = SEARCH_PLATFORMS
+    deadline = Deadline(app.config['SEARCH_TIMEOUT'])
+    pipeline = build_search_pipeline(query, query_info, platforms, deadline)
+    max_duration = app.config['SEARCH_STREAM_TIMEOUT']
+    
+    def generate():
+        platform_reviews = {}
+        for name, result in search_engine.stream(pipeline, max_duration=max_duration):
+            stage, _, platform = name.partition(':')
+            if stage == 'timeout':
+                logger.warning(f"Streamed search for {query} ran past {max_duration} seconds, closing")
+                yield format_sse('timeout', {'execution_time': round(time.time() - start_time, 2)})
+                return
+            elif stage == 'score':
+                yield format_sse('products', {'platform': platform, 'products': result})
+            elif stage == 'reviews':
+                platform_reviews[platform] = result
+                yield format_sse('reviews', {
+                    'platform': platform,
+                    'reliability': analyze_platform_reliability(platform_reviews)
+                })
+            elif stage == 'best_deal' and result:
+                yield format_sse('best_deal', result)
+            elif stage == 'trends' and result:
+                yield format_sse('price_history', result)
+        
+        execution_time = round(time.time() - start_time, 2)
+        logger.info(f"Streamed search completed in {execution_time} seconds")
+        yield format_sse('done', {
+            'execution_time': execution_time,
+            'stage_timings': pipeline.timings,
+            'cache_status': pipeline.annotations.get('cache_status', {})
+        })
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/metrics')
+def metrics():
+    """Runtime gauges for the shared worker pools and cache"""
+    return jsonify({
+        'pools': {pool.name: pool.stats() for pool in (pipeline_pool, scrape_pool, review_pool)},
+        'parse_pool': parse_pool.stats(),
+        'http': http_client.stats(),
+        'rate_limits': rate_limiter.stats(),
+        'cache': cache_stats(),
+        'cache_warmer': cache_warmer.stats(),
+        'circuit_breakers': circuit_breakers.stats(),
+        # Distinct raw queries that share each canonical cache key; the queries
+        # themselves are other users' searches, so only admins see them
+        'cache_key_folding': key_folding_report(
+            limit=10, variants=current_user.is_authenticated and can_read_debug_captures()
+        )
+    })
+
+@app.route('/platforms')
+def list_platforms():
+    """Every registered platform with its declared limits, and whether this deployment enables it"""
+    return jsonify({'platforms': registry.describe()})
+
+@app.route('/platforms/health')
+def platform_health():
+    """Circuit breaker state of every enabled platform"""
+    breakers = circuit_breakers.stats()
+    return jsonify({
+        'enabled': circuit_breakers.enabled,
+        # Platforms not scraped yet have no breaker, and are healthy
+        'platforms': {platform: breakers.get(platform, {'state': 'closed', 'calls': 0})
+                      for platform in SEARCH_PLATFORMS}
+    })
+
+def can_read_debug_captures():
+    """Captures are raw storefront pages and request details, so only admins may read them"""
+    return app.debug or getattr(current_user, 'username', None) in app.config['DEBUG_CAPTURE_USERS']
+
+@app.route('/debug/captures')
+@login_required
+def debug_captures():
+    """List the stored scraper debug captures, newest first"""
+    if not can_read_debug_captures():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    return jsonify({
+        'enabled': debug_capture.enabled,
+        'captures': debug_capture.list()
+    })
+
+@app.route('/debug/captures/<capture_id>')
+@login_required
+def debug_capture_download(capture_id):
+    """Download the raw response body of one capture"""
+    if not can_read_debug_captures():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    path = debug_capture.body_path(capture_id)
+    if path is None:
+        return jsonify({'error': 'Capture not found'}), 404
+    
+    metadata = debug_capture.metadata(capture_id) or {}
+    return send_file(path, mimetype=(metadata.get('content_type') or 'text/html').split(';')[0],
+                     as_attachment=True, download_name=f"{capture_id}.html")
+
+@app.route('/reviews/invalidate', methods=['POST'])
+@login_required
+def reviews_invalidate():
+    """Drop the cached reviews for one product URL"""
+    platform = request.form.get('platform')
+    url = request.form.get('url')
+    if not platform or not url:
+        return jsonify({'error': 'platform and url are required'}), 400
+    
+    invalidate_reviews(platform, url)
+    return jsonify({
+        'status': 'success',
+        'platform': platform,
+        'url': canonical_product_url(url)
+    })
+
 @app.route('/quick-search', methods=['POST'])
 def quick_search():
     query = request.form.get('query')
     if not query:
         return jsonify({'error': 'No query provided'})
     
+    if DEFAULT_PLATFORM is None:
+        return jsonify({'error': 'No platforms are enabled', 'status': 'error'}), 503
+    
     # Process the query to extract product type and attributes
     query_info = process_search_query(query)
     
-    # Only search Amazon for quick results with improved error handling
+    # Only search the default platform for quick results with improved error handling
     try:
-        # Try to get cached results first
-        products = get_cached_products(query, 'amazon')
+        # Try to get cached results first; failed scrapes come back empty
+        products, _ = fetch_cached_products(query, DEFAULT_PLATFORM)
         
         # If no cached results, use dummy data
         if not products or len(products) == 0:
-            products = get_dummy_products(query, 'amazon')
+            products = get_dummy_products(query, DEFAULT_PLATFORM)
         
         # Limit to 10 results for filtering
         products = products[:10]
@@ -1079,7 +1616,7 @@ def quick_search():
         logger.error(f"Error in quick search: {str(e)}")
         logger.error(traceback.format_exc())
         # Return dummy products on error
-        dummy_products = get_dummy_products(query, 'amazon')[:5]
+        dummy_products = get_dummy_products(query, DEFAULT_PLATFORM)[:5]
         return jsonify({
             'products': dummy_products,
             'status': 'error',
@@ -1293,12 +1830,8 @@ def process_price_history_for_chart(price_history_data):
             grouped_data[key]['timestamps'].append(item.timestamp.strftime('%Y-%m-%d'))
         
         # Create datasets for chart
-        colors = {
-            'amazon': 'rgba(255, 153, 0, 0.7)',
-            'flipkart': 'rgba(40, 116, 240, 0.7)',
-            'alibaba': 'rgba(255, 106, 0, 0.7)',
-            'croma': 'rgba(17, 151, 68, 0.7)'
-        }
+        # Every registered platform, so history from a since-disabled one keeps its color
+        colors = {platform['name']: platform['color'] for platform in registry.describe()}
         
         # Limit to top 5 products to avoid cluttering the chart
         top_products = sorted(grouped_data.items(), key=lambda x: len(x[1]['prices']), reverse=True)[:5]
@@ -1343,7 +1876,7 @@ def process_price_history_for_chart(price_history_data):
 
 def get_platform_reliability_scores():
     # Get platform reliability scores based on product reviews
-    platforms = ['amazon', 'flipkart', 'alibaba', 'croma']
+    platforms = registry.names()
     reliability_data = {}
     
     try:
@@ -1372,7 +1905,7 @@ def get_platform_reliability_scores():
             most_reliable_platform = most_reliable[0]
             reliability_score = most_reliable[1]['reliability_score']
         else:
-            most_reliable_platform = 'amazon'
+            most_reliable_platform = DEFAULT_PLATFORM
             reliability_score = 0
     except Exception as e:
         logger.error(f"Error in get_platform_reliability_scores: {str(e)}")
@@ -1520,7 +2053,7 @@ def init_db():
             
         # Add some sample data
         if db.session.query(PriceHistory).count() == 0:
-            platforms = ['amazon', 'flipkart', 'alibaba', 'croma']
+            platforms = registry.names()
             sample_products = [
                 "iPhone 13 Pro Max",
                 "Samsung Galaxy S21",
@@ -1,63 +1,580 @@
-import os
+import copy
 import json
 import time
 import hashlib
 import logging
+import threading
+import concurrent.futures
+from collections import OrderedDict
 from functools import wraps
 
+from singleflight import SingleFlight
+from cache_serializers import available_serializers, get_serializer
+from cache_backends import FileBackend, SQLiteBackend
+
 logger = logging.getLogger(__name__)
 
-def cached(expiry=3600):
+# Storage behind the memory tier; see use_backend()
+_backend = FileBackend()
+
+def use_backend(backend):
+    """Store entries in another CacheBackend, e.g. SQLiteBackend for a node-wide cache"""
+    global _backend
+    _backend = backend
+
+def get_backend():
+    return _backend
+
+def use_serializer(name):
+    """Write new entries in the named format ('json', 'zlib', 'msgpack', 'msgpack-zlib')"""
+    _backend.serializer = get_serializer(name)
+
+def use_write_locks(enabled=True):
+    """Lock file cache read-compare-writes and sweeps across processes with flock (file backend only)"""
+    if isinstance(_backend, FileBackend):
+        _backend.use_write_locks(enabled)
+
+class MemoryCache:
+    """
+    Bounded in-process LRU tier in front of the file cache.
+
+    Entries are stored JSON-encoded so every hit hands back a fresh copy;
+    callers mutate product dicts (e.g. adding relevance scores) and must
+    not change what other requests see. Entries past their `expires_at`
+    are dropped when they are looked up, and the least recently used entry
+    is evicted once `max_entries` is reached.
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the entry, or None if missing or past its expires_at"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if time.time() >= expires_at:
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+        return json.loads(payload)
+
+    def put(self, key, cache_data):
+        """Store an entry; it keeps the expiry it was written with, so promoted file entries keep their age"""
+        if self.max_entries <= 0:
+            return
+        payload = json.dumps(cache_data)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (cache_data['expires_at'], payload)
+            self._bytes += len(payload)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def resize(self, max_entries):
+        with self._lock:
+            self.max_entries = max_entries
+            while len(self._entries) > max(max_entries, 0):
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _drop(self, key):
+        _, payload = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self._bytes,
+                'evictions': self.evictions
+            }
+
+# Coalesces concurrent misses for the same key; see use_file_locks() to
+# extend this across worker processes
+single_flight = SingleFlight()
+
+# Hot entries are served from memory without touching the file system
+memory_cache = MemoryCache()
+
+# Background refreshes for stale-while-revalidate entries
+_refresh_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix='cache-refresh')
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+# Outcome of the most recent cached() lookup on each thread
+_last_status = threading.local()
+
+_stats_lock = threading.Lock()
+_tier_stats = {
+    'memory': {'hits': 0, 'misses': 0},
+    'backend': {'hits': 0, 'misses': 0}
+}
+_refresh_stats = {'stale_served': 0, 'refreshes': 0, 'refresh_errors': 0}
+_negative_stats = {'failure_hits': 0, 'failures_cached': 0, 'empties_cached': 0}
+
+class CachedFailure(Exception):
+    """Raised instead of calling the function while a recorded failure is still fresh"""
+
+    def __init__(self, message, retry_in):
+        super().__init__(f"{message} (cached failure, retrying in {int(retry_in)}s)")
+        self.retry_in = retry_in
+
+def _record(tier, outcome):
+    with _stats_lock:
+        _tier_stats[tier][outcome] += 1
+
+def _record_negative(outcome):
+    with _stats_lock:
+        _negative_stats[outcome] += 1
+
+# Raw argument strings seen for each canonical key, per cached function
+MAX_FOLD_KEYS = 5000
+MAX_FOLD_VARIANTS = 50
+_key_folds = {}
+_key_folds_lock = threading.Lock()
+
+def _record_fold(name, canonical_key, raw_key):
+    with _key_folds_lock:
+        folds = _key_folds.setdefault(name, OrderedDict())
+        variants = folds.get(canonical_key)
+        if variants is None:
+            if len(folds) >= MAX_FOLD_KEYS:
+                folds.popitem(last=False)
+            variants = folds[canonical_key] = set()
+        if len(variants) < MAX_FOLD_VARIANTS:
+            variants.add(raw_key)
+
+def key_folding_report(limit=20, variants=True):
+    """
+    How many distinct raw argument strings folded into each canonical key,
+    per cached function that uses a key_func, with the keys that absorbed
+    the most variants listed first. The keys and raw strings are what users
+    searched for, so with variants=False only the counts are reported.
+    """
+    with _key_folds_lock:
+        snapshot = {name: {key: sorted(variants) for key, variants in folds.items()}
+                    for name, folds in _key_folds.items()}
+
+    report = {}
+    for name, folds in snapshot.items():
+        raw_variants = sum(len(variants) for variants in folds.values())
+        top = sorted(folds.items(), key=lambda item: len(item[1]), reverse=True)[:limit]
+        report[name] = {
+            'canonical_keys': len(folds),
+            'raw_variants': raw_variants,
+            'folded': raw_variants - len(folds)
+        }
+        if variants:
+            report[name]['top'] = [{'key': key, 'variants': raw} for key, raw in top if len(raw) > 1]
+    return report
+
+def last_cache_status():
+    """'fresh', 'stale', 'miss' or 'failed' for the last cached() call made on this thread"""
+    return getattr(_last_status, 'value', None)
+
+def _schedule_refresh(cache_key, refresh):
+    """Run refresh() in the background unless this key is already being refreshed"""
+    with _refreshing_lock:
+        if cache_key in _refreshing:
+            return
+        _refreshing.add(cache_key)
+    with _stats_lock:
+        _refresh_stats['stale_served'] += 1
+
+    def run():
+        try:
+            refresh()
+            with _stats_lock:
+                _refresh_stats['refreshes'] += 1
+        except Exception as e:
+            logger.error(f"Error refreshing stale cache entry: {str(e)}")
+            with _stats_lock:
+                _refresh_stats['refresh_errors'] += 1
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(cache_key)
+
+    _refresh_executor.submit(run)
+
+def cache_stats():
+    """Hit/miss counts for the memory and backend tiers, plus their sizes"""
+    with _stats_lock:
+        stats = {tier: dict(counts) for tier, counts in _tier_stats.items()}
+        refresh_stats = dict(_refresh_stats)
+        negative_stats = dict(_negative_stats)
+    for counts in stats.values():
+        lookups = counts['hits'] + counts['misses']
+        counts['hit_rate'] = round(counts['hits'] / lookups, 3) if lookups else 0
+    stats['memory'].update(memory_cache.stats())
+    stats['stale_while_revalidate'] = refresh_stats
+    stats['negative'] = negative_stats
+    stats['backend'].update(_backend.stats())
+    stats['single_flight'] = single_flight.stats()
+    return stats
+
+def _normalize(cache_data, expiry, max_age):
+    """Fill in the kind and freshness of entries written before results were classified"""
+    if 'kind' in cache_data:
+        return cache_data
+    timestamp = cache_data['timestamp']
+    return {
+        'kind': 'real' if cache_data['result'] else 'empty',
+        'timestamp': timestamp,
+        'fresh_until': timestamp + expiry,
+        'expires_at': timestamp + max_age,
+        'result': cache_data['result']
+    }
+
+def _read_cache(cache_key, name, expiry, max_age, backend):
+    """Return the entry if it exists and has not reached its expires_at, else None"""
+    try:
+        cache_data = backend.get(cache_key)
+        if cache_data is None:
+            return None
+
+        # Check if cache is still valid
+        cache_data = _normalize(cache_data, expiry, max_age)
+        if time.time() < cache_data['expires_at']:
+            logger.info(f"Cache hit for {name}")
+            return cache_data
+        logger.info(f"Cache expired for {name}")
+    except Exception as e:
+        logger.error(f"Error reading cache: {str(e)}")
+    return None
+
+def _write_cache(cache_key, cache_data, name, backend, memory=True):
+    if memory:
+        memory_cache.put(cache_key, cache_data)
+    try:
+        backend.set(cache_key, cache_data)
+        logger.info(f"Cached {cache_data['kind']} result for {name}")
+    except Exception as e:
+        logger.error(f"Error writing cache: {str(e)}")
+
+def _read_current(cache_key, name, expiry, max_age, backend, within=0, memory=True):
+    """
+    The entry to judge freshness by: the memory copy while it stays fresh
+    for `within` more seconds, else what the backend holds now, since
+    another worker may have refreshed the entry there since.
+    """
+    entry = memory_cache.get(cache_key) if memory else None
+    if entry is not None and time.time() + within < entry['fresh_until']:
+        return entry
+    stored = _read_cache(cache_key, name, expiry, max_age, backend)
+    if stored is None:
+        return entry
+    if memory:
+        memory_cache.put(cache_key, stored)
+    return stored
+
+def _lookup(cache_key, name, expiry, max_age, backend, memory=True):
+    """
+    Check the memory tier, then the file tier, promoting file hits into
+    memory. Returns the entry or None.
     """
-    Decorator to cache function results to a file.
-    
+    if memory:
+        entry = memory_cache.get(cache_key)
+        if entry is not None:
+            _record('memory', 'hits')
+            return entry
+        _record('memory', 'misses')
+
+    entry = _read_cache(cache_key, name, expiry, max_age, backend)
+    if entry is None:
+        _record('backend', 'misses')
+        return None
+    _record('backend', 'hits')
+    if memory:
+        memory_cache.put(cache_key, entry)
+    return entry
+
+def cached(expiry=3600, ignore_kwargs=(), stale_while_revalidate=0, key_func=None,
+           empty_ttl=None, failure_ttl=None, max_failure_ttl=None, failure_exceptions=(),
+           backend=None, memory=True):
+    """
+    Decorator to cache function results in memory and in a CacheBackend
+    (one file per entry by default).
+
+    On a miss, concurrent callers with the same arguments share a single
+    call to the wrapped function instead of each computing it.
+
+    Every entry is tagged as 'real', 'empty' (a falsy result) or 'failed'
+    (the function raised one of failure_exceptions), and each kind has its
+    own lifetime. While a failure is fresh, callers get a CachedFailure at
+    once instead of calling the function again; repeated failures back off
+    exponentially.
+
     Args:
         expiry: Cache expiry time in seconds (default: 1 hour)
+        ignore_kwargs: Keyword arguments left out of the cache key, such as
+            per-request deadlines that do not affect the result. They are
+            not passed to background refreshes.
+        stale_while_revalidate: For this many seconds after expiry, return
+            a stale real result at once and refresh the entry in the
+            background. last_cache_status() reports 'stale' for such calls.
+        key_func: Optional callable taking the same arguments as the
+            function and returning a string that identifies the result, so
+            calls that differ only cosmetically share one entry. The
+            function itself still receives the original arguments. How
+            many raw argument strings fold into each key is tracked by
+            key_folding_report().
+        empty_ttl: Lifetime of empty results (default: expiry)
+        failure_ttl: Lifetime of the first recorded failure, doubled on
+            each consecutive failure. Failures are not cached if omitted.
+        max_failure_ttl: Upper bound on the backed-off failure lifetime
+        failure_exceptions: Exception types that count as failures
+        backend: CacheBackend for this function's entries (default: the
+            one set with use_backend())
+        memory: Keep entries in the per-process memory tier too. Turn it
+            off for entries that must be invalidated across workers, since
+            invalidate() can only clear the calling process's memory.
+
+    The wrapped function gets an invalidate(*args, **kwargs) method that
+    drops the entry for those arguments, and a prefetch(*args, **kwargs)
+    method that refreshes it ahead of expiry.
     """
+    max_age = expiry + stale_while_revalidate
+    failure_exceptions = tuple(failure_exceptions)
+
+    def classify(result, now):
+        """Entry for a result the function returned"""
+        if result:
+            return {'kind': 'real', 'timestamp': now, 'fresh_until': now + expiry,
+                    'expires_at': now + max_age, 'result': result}
+        ttl = expiry if empty_ttl is None else empty_ttl
+        return {'kind': 'empty', 'timestamp': now, 'fresh_until': now + ttl,
+                'expires_at': now + ttl, 'result': result}
+
+    def failure_entry(error, failures, now):
+        """Entry recording the latest of `failures` consecutive failures"""
+        ttl = failure_ttl * 2 ** (failures - 1)
+        if max_failure_ttl is not None:
+            ttl = min(ttl, max_failure_ttl)
+        return {'kind': 'failed', 'timestamp': now, 'fresh_until': now + ttl,
+                # Remembered past its lifetime so the next failure backs off further
+                'expires_at': now + ttl + (max_failure_ttl or ttl),
+                'error': str(error), 'failures': failures, 'result': None}
+
+    def serve(entry, now):
+        """Result of a fresh entry, or CachedFailure for a fresh failure"""
+        if entry['kind'] == 'failed':
+            raise CachedFailure(entry['error'], entry['fresh_until'] - now)
+        return entry['result']
+
     def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            # Create cache directory if it doesn't exist
-            cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cache')
-            os.makedirs(cache_dir, exist_ok=True)
-            
+        def make_key(args, kwargs, record=True):
             # Create a cache key based on function name and arguments
-            key_parts = [func.__name__]
-            key_parts.extend([str(arg) for arg in args])
-            key_parts.extend([f"{k}:{v}" for k, v in sorted(kwargs.items())])
-            
+            key_parts = [str(arg) for arg in args]
+            key_parts.extend([f"{k}:{v}" for k, v in sorted(kwargs.items()) if k not in ignore_kwargs])
+            raw_key = ''.join(key_parts)
+            if key_func is not None:
+                canonical_key = key_func(*args, **kwargs)
+                if record:
+                    _record_fold(func.__name__, canonical_key, raw_key)
+                raw_key = canonical_key
+
             # Create a hash of the key parts
-            cache_key = hashlib.md5(''.join(key_parts).encode()).hexdigest()
-            cache_file = os.path.join(cache_dir, f"{cache_key}.json")
-            
-            # Check if cache file exists and is not expired
-            if os.path.exists(cache_file):
-                try:
-                    with open(cache_file, 'r') as f:
-                        cache_data = json.load(f)
-                    
-                    # Check if cache is still valid
-                    if time.time() - cache_data['timestamp'] < expiry:
-                        logger.info(f"Cache hit for {func.__name__}")
-                        return cache_data['result']
-                    else:
-                        logger.info(f"Cache expired for {func.__name__}")
-                except Exception as e:
-                    logger.error(f"Error reading cache: {str(e)}")
-            
+            return hashlib.md5((func.__name__ + raw_key).encode()).hexdigest()
+
+        def compute(args, call_kwargs, cache_key, store, keep=None, previous_failures=0):
             # Call the function and cache the result
-            result = func(*args, **kwargs)
-            
             try:
-                with open(cache_file, 'w') as f:
-                    json.dump({
-                        'timestamp': time.time(),
-                        'result': result
-                    }, f)
-                logger.info(f"Cached result for {func.__name__}")
-            except Exception as e:
-                logger.error(f"Error writing cache: {str(e)}")
-            
+                result = func(*args, **call_kwargs)
+            except failure_exceptions as e:
+                # A refresh failure keeps serving the stale real data instead
+                if keep is not None or failure_ttl is None:
+                    raise
+                _write_cache(cache_key, failure_entry(e, previous_failures + 1, time.time()), func.__name__, store,
+                             memory)
+                _record_negative('failures_cached')
+                raise
+            if keep and not result:
+                # A failed refresh must not replace real data with nothing
+                logger.info(f"Refresh of {func.__name__} came back empty, keeping stale entry")
+                return keep
+            entry = classify(result, time.time())
+            if entry['kind'] == 'empty':
+                _record_negative('empties_cached')
+            _write_cache(cache_key, entry, func.__name__, store, memory)
             return result
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            store = backend or _backend
+            cache_key = make_key(args, kwargs)
+
+            # Another caller may have filled the entry while this one waited
+            def recheck():
+                entry = _read_current(cache_key, func.__name__, expiry, max_age, store, memory=memory)
+                now = time.time()
+                if entry is None or now >= entry['fresh_until']:
+                    return None
+                return serve(entry, now)
+
+            entry = _lookup(cache_key, func.__name__, expiry, max_age, store, memory)
+            now = time.time()
+            if entry is not None and now < entry['fresh_until']:
+                if entry['kind'] == 'failed':
+                    _last_status.value = 'failed'
+                    _record_negative('failure_hits')
+                else:
+                    _last_status.value = 'fresh'
+                return serve(entry, now)
+
+            if entry is not None and entry['kind'] == 'real':
+                # Within the stale window: serve what we have and refresh behind it
+                _last_status.value = 'stale'
+                result = entry['result']
+                refresh_kwargs = {k: v for k, v in kwargs.items() if k not in ignore_kwargs}
+                _schedule_refresh(cache_key, lambda: single_flight.do(
+                    cache_key, lambda: compute(args, refresh_kwargs, cache_key, store, keep=result),
+                    recheck=recheck
+                ))
+                return result
+
+            _last_status.value = 'miss'
+            previous_failures = entry['failures'] if entry is not None and entry['kind'] == 'failed' else 0
+            try:
+                result = single_flight.do(
+                    cache_key, lambda: compute(args, kwargs, cache_key, store, previous_failures=previous_failures),
+                    recheck=recheck,
+                    # Waiting on another worker's call counts against the caller's deadline
+                    deadline=kwargs.get('deadline')
+                )
+            except (CachedFailure,) + failure_exceptions:
+                _last_status.value = 'failed'
+                raise
+            # Coalesced callers share one result object, so each gets its own copy
+            return copy.deepcopy(result)
+
+        def invalidate(*args, **kwargs):
+            """Drop the entry these arguments map to from the backend and this process's memory, so the next call recomputes it"""
+            cache_key = make_key(args, kwargs, record=False)
+            memory_cache.delete(cache_key)
+            (backend or _backend).delete(cache_key)
+            logger.info(f"Invalidated {func.__name__} cache entry {cache_key}")
+
+        def prefetch(*args, refresh_within=0, **kwargs):
+            """
+            Recompute the entry for these arguments ahead of time if it is
+            missing, expired, or goes stale within refresh_within seconds.
+
+            Returns True if the function was called and False if the entry
+            was fresh enough (or a cached failure is still backing off).
+            Exceptions from the function propagate; a failed refresh keeps
+            the existing real data.
+            """
+            store = backend or _backend
+            cache_key = make_key(args, kwargs, record=False)
+
+            def current():
+                """The entry if it is fresh enough to leave alone, else None"""
+                entry = _read_current(cache_key, func.__name__, expiry, max_age, store, within=refresh_within,
+                                      memory=memory)
+                now = time.time()
+                if entry is None:
+                    return None
+                if entry['kind'] == 'failed' and now < entry['fresh_until']:
+                    return entry
+                if entry['kind'] != 'failed' and now + refresh_within < entry['fresh_until']:
+                    return entry
+                return None
+
+            if current() is not None:
+                return False
+
+            # Another worker may refresh the entry between the check above and
+            # taking the lock, so the leader checks the backend again first
+            called = []
+            def recheck():
+                entry = current()
+                if entry is None:
+                    return None
+                return serve(entry, time.time())
+
+            def refresh():
+                called.append(True)
+                entry = _read_current(cache_key, func.__name__, expiry, max_age, store, memory=memory)
+                keep = entry['result'] if entry is not None and entry['kind'] == 'real' else None
+                previous_failures = entry['failures'] if entry is not None and entry['kind'] == 'failed' else 0
+                return compute(args, kwargs, cache_key, store, keep=keep, previous_failures=previous_failures)
+
+            try:
+                single_flight.do(cache_key, refresh, recheck=recheck)
+            except CachedFailure:
+                # Another worker's failure is still backing off
+                return False
+            return bool(called)
+
+        wrapper.invalidate = invalidate
+        wrapper.prefetch = prefetch
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
+
+def sweep(max_entries=None, max_bytes=None, backend=None):
+    """
+    Remove expired entries, then evict the oldest entries until the cache
+    fits within max_entries and max_bytes.
+
+    Returns a summary of what was removed and what is left.
+    """
+    summary = (backend or _backend).sweep(max_entries=max_entries, max_bytes=max_bytes)
+    logger.info(f"Cache sweep finished: {summary}")
+    return summary
+
+def start_sweeper(interval, max_entries=None, max_bytes=None):
+    """Run sweep() every interval seconds on a daemon thread"""
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                sweep(max_entries=max_entries, max_bytes=max_bytes)
+            except Exception as e:
+                logger.error(f"Error in cache sweeper: {str(e)}")
+
+    thread = threading.Thread(target=run, name='cache-sweeper', daemon=True)
+    thread.start()
+    return thread
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cache maintenance")
+    parser.add_argument('--cache-dir', default=None, help="File cache directory (default: data/cache)")
+    parser.add_argument('--sqlite', default=None, help="Use the SQLite cache at this path instead")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    sweep_parser = subcommands.add_parser('sweep', help="Remove expired entries and enforce size limits")
+    sweep_parser.add_argument('--max-entries', type=int, default=None)
+    sweep_parser.add_argument('--max-bytes', type=int, default=None)
+    migrate_parser = subcommands.add_parser('migrate', help="Rewrite existing file entries in another format")
+    migrate_parser.add_argument('--to', default='zlib', choices=sorted(available_serializers()))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    backend = SQLiteBackend(args.sqlite) if args.sqlite else FileBackend(args.cache_dir)
+    if args.command == 'sweep':
+        print(json.dumps(sweep(args.max_entries, args.max_bytes, backend)))
+    elif args.command == 'migrate':
+        if not isinstance(backend, FileBackend):
+            parser.error("migrate only applies to the file cache")
+        print(json.dumps(backend.migrate(args.to)))
@@ -0,0 +1,494 @@
+import os
+import mmap
+import time
+import logging
+import sqlite3
+import tempfile
+import threading
+
+from singleflight import fcntl
+from cache_serializers import JsonSerializer, available_serializers, get_serializer
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cache')
+
+# Age after which entries written before expiry was recorded in them are swept
+DEFAULT_EXPIRY = 3600
+
+class CacheBackend:
+    """
+    Storage behind the `cached` decorator's memory tier.
+
+    Entries are dicts with at least 'timestamp' and 'result'; entries
+    written by current code also carry 'kind', 'fresh_until' and
+    'expires_at'. Backends store and return them as-is and leave freshness
+    decisions to the decorator, except that they may skip entries whose
+    'expires_at' has passed.
+    """
+    name = None
+
+    def get(self, key):
+        """Return the entry stored under key, or None"""
+        raise NotImplementedError
+
+    def set(self, key, entry):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def sweep(self, max_entries=None, max_bytes=None):
+        """
+        Remove expired entries, then evict the oldest entries until the
+        store fits within max_entries and max_bytes. Returns a summary.
+        """
+        raise NotImplementedError
+
+    def stats(self):
+        return {'backend': self.name}
+
+class FileBackend(CacheBackend):
+    """
+    One file per entry under data/cache, sharded by the first two hex
+    digits of the key (data/cache/ab/ab12....json).
+
+    Each serializer has its own extension. Lookups try the current format,
+    then the other formats, then the flat pre-sharding path, so old entries
+    stay readable while the format changes.
+    """
+    name = 'file'
+
+    # Entries at least this large are read through mmap instead of a buffered read
+    MMAP_THRESHOLD = 64 * 1024
+
+    def __init__(self, cache_dir=None, serializer=None, write_locks=False):
+        self.cache_dir = cache_dir or CACHE_DIR
+        self.serializer = serializer or JsonSerializer()
+        self.serializers = available_serializers()
+        self.write_locks = False
+        self.use_write_locks(write_locks)
+
+    def use_write_locks(self, enabled=True):
+        """
+        Hold a per-shard flock (POSIX only) across each read-compare-write,
+        so an entry is never replaced by an older one that finished writing
+        later, and across the sweeper's re-check and removal of each file,
+        so it never deletes an entry another process has just rewritten.
+        """
+        if enabled and fcntl is None:
+            logger.warning("Advisory cache write locks need fcntl; writes stay lock-free")
+            enabled = False
+        self.write_locks = enabled
+
+    def path(self, key, serializer=None):
+        extension = (serializer or self.serializer).extension
+        return os.path.join(self.cache_dir, key[:2], f"{key}{extension}")
+
+    def legacy_path(self, key):
+        """Location used before the cache was sharded"""
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def candidate_paths(self, key):
+        """Where an entry may live: the current format first, then other formats, then the legacy path"""
+        yield self.path(key)
+        for serializer in self.serializers.values():
+            if serializer.name != self.serializer.name:
+                yield self.path(key, serializer)
+        yield self.legacy_path(key)
+
+    def serializer_for(self, path):
+        """The format an entry file was written in, judged by its extension"""
+        matches = [s for s in self.serializers.values() if path.endswith(s.extension)]
+        return max(matches, key=lambda s: len(s.extension)) if matches else None
+
+    def get(self, key):
+        path = next((path for path in self.candidate_paths(key) if os.path.exists(path)), None)
+        if path is None:
+            return None
+        return self.load(path)
+
+    def load(self, path, attempts=3, retry_delay=0.02):
+        """
+        Read and decode an entry file, or return None if it does not exist.
+
+        Large entries are decoded straight from an mmap of the file. Entries
+        are replaced atomically, but a file written by an older worker during
+        a rolling restart can still be caught half-written, so a decode error
+        is retried briefly before it is reported.
+        """
+        serializer = self.serializer_for(path) or self.serializer
+        for attempt in range(attempts):
+            try:
+                with open(path, 'rb') as f:
+                    if os.fstat(f.fileno()).st_size >= self.MMAP_THRESHOLD:
+                        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                            return serializer.loads(mapped)
+                    return serializer.loads(f.read())
+            except FileNotFoundError:
+                # Removed by the sweeper between lookups
+                return None
+            except serializer.errors:
+                if attempt == attempts - 1:
+                    raise
+                time.sleep(retry_delay)
+
+    def set(self, key, entry):
+        self.write(self.path(key), entry)
+
+    def _lock_shard(self, shard_dir):
+        """Take the shard's flock if write locks are on; returns the handle or None"""
+        if not self.write_locks:
+            return None
+        lock = open(os.path.join(shard_dir, '.lock'), 'a')
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock
+
+    @staticmethod
+    def _unlock(lock):
+        if lock is not None:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+            lock.close()
+
+    def write(self, path, entry, serializer=None):
+        """
+        Write an entry atomically: the data goes to a temp file in the same
+        directory, which is then renamed over the entry, so readers see
+        either the old entry or the new one and never a partial file.
+
+        With write locks, an entry already on disk with a newer timestamp
+        is kept instead of being overwritten.
+        """
+        temp_path = None
+        lock = None
+        try:
+            shard_dir = os.path.dirname(path)
+            os.makedirs(shard_dir, exist_ok=True)
+            payload = (serializer or self.serializer).dumps(entry)
+
+            fd, temp_path = tempfile.mkstemp(dir=shard_dir, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+
+            lock = self._lock_shard(shard_dir)
+            if lock is not None and self._is_newer(path, entry):
+                logger.info(f"Kept newer cache entry at {path} over an older write")
+                return
+            os.replace(temp_path, path)
+            temp_path = None
+        finally:
+            self._unlock(lock)
+            if temp_path is not None:
+                _remove(temp_path)
+
+    def _is_newer(self, path, entry):
+        """Whether the entry stored at path was written after `entry` was computed"""
+        try:
+            current = self.load(path)
+        except Exception:
+            # Unreadable entries are replaced
+            return False
+        return current is not None and current.get('timestamp', 0) > entry.get('timestamp', 0)
+
+    def _remove_if(self, path, still_garbage):
+        """
+        Remove a file the sweeper picked. With write locks, the choice is
+        re-checked under the shard lock first, since another process may
+        have rewritten the entry since it was looked at.
+        """
+        lock = self._lock_shard(os.path.dirname(path))
+        try:
+            if lock is not None and not still_garbage():
+                return False
+            return _remove(path)
+        finally:
+            self._unlock(lock)
+
+    @staticmethod
+    def _unchanged(path, mtime):
+        try:
+            return os.stat(path).st_mtime == mtime
+        except FileNotFoundError:
+            return False
+
+    def delete(self, key):
+        for path in self.candidate_paths(key):
+            _remove(path)
+
+    def iter_files(self, suffix=None):
+        """Yield (path, size, mtime) for every entry in any known format, sharded or legacy"""
+        suffix = suffix or tuple(s.extension for s in self.serializers.values())
+        for root, dirs, files in os.walk(self.cache_dir):
+            # Only the top level and one shard level hold entries
+            if root != self.cache_dir:
+                dirs[:] = []
+            for filename in files:
+                if not filename.endswith(suffix):
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def expires_at(self, path, mtime):
+        """Expiry time recorded in an entry, falling back to its age for older entries"""
+        try:
+            entry = self.load(path)
+            if entry is None:
+                return mtime
+            if 'expires_at' in entry:
+                return entry['expires_at']
+            return entry['timestamp'] + DEFAULT_EXPIRY
+        except Exception:
+            # Unreadable entries are garbage too, once they are old enough not to be mid-write
+            return mtime + DEFAULT_EXPIRY
+
+    def key_for(self, path):
+        """Cache key of an entry file, whatever its format"""
+        filename = os.path.basename(path)
+        serializer = self.serializer_for(path)
+        return filename[:-len(serializer.extension)] if serializer else os.path.splitext(filename)[0]
+
+    def sweep(self, max_entries=None, max_bytes=None):
+        now = time.time()
+        removed_expired = 0
+        kept = []
+
+        for path, size, mtime in self.iter_files():
+            if self.expires_at(path, mtime) <= now:
+                if self._remove_if(path, lambda: self.expires_at(path, mtime) <= now):
+                    removed_expired += 1
+            else:
+                kept.append((mtime, path, size))
+
+        # Temp files left behind by writers that died before renaming
+        for path, _, mtime in self.iter_files(suffix='.tmp'):
+            if mtime + DEFAULT_EXPIRY <= now:
+                _remove(path)
+
+        # Oldest-first: entries are rewritten on refresh, so mtime tracks last write
+        kept.sort()
+        total_bytes = sum(size for _, _, size in kept)
+        entries = len(kept)
+        removed_evicted = 0
+        while kept and ((max_entries is not None and entries > max_entries) or
+                        (max_bytes is not None and total_bytes > max_bytes)):
+            mtime, path, size = kept.pop(0)
+            # Only files this sweep removed come off the totals; one kept because it
+            # was just rewritten still takes up its space, so the next oldest goes instead
+            if self._remove_if(path, lambda: self._unchanged(path, mtime)):
+                removed_evicted += 1
+                entries -= 1
+                total_bytes -= size
+
+        # Drop shard directories emptied by the sweep
+        if os.path.isdir(self.cache_dir):
+            for shard in os.listdir(self.cache_dir):
+                shard_path = os.path.join(self.cache_dir, shard)
+                if os.path.isdir(shard_path) and not os.listdir(shard_path):
+                    try:
+                        os.rmdir(shard_path)
+                    except OSError:
+                        pass
+
+        return {
+            'expired': removed_expired,
+            'evicted': removed_evicted,
+            'entries': entries,
+            'bytes': total_bytes
+        }
+
+    def migrate(self, to=None):
+        """
+        Rewrite every live entry in another format (the current one by
+        default) at its sharded path, removing the old file. Expired entries
+        are dropped.
+        """
+        target = get_serializer(to) if to else self.serializer
+        now = time.time()
+        summary = {'migrated': 0, 'dropped': 0, 'skipped': 0, 'bytes_before': 0, 'bytes_after': 0}
+
+        for path, size, mtime in list(self.iter_files()):
+            destination = self.path(self.key_for(path), target)
+            if path == destination:
+                summary['skipped'] += 1
+                continue
+            try:
+                entry = self.load(path)
+            except Exception as e:
+                logger.error(f"Error reading cache entry {path} for migration: {str(e)}")
+                entry = None
+            if entry is None or self.expires_at(path, mtime) <= now:
+                _remove(path)
+                summary['dropped'] += 1
+                continue
+
+            self.write(destination, entry, target)
+            _remove(path)
+            summary['migrated'] += 1
+            summary['bytes_before'] += size
+            summary['bytes_after'] += os.path.getsize(destination)
+
+        logger.info(f"Cache migration to {target.name} finished: {summary}")
+        return summary
+
+    def stats(self):
+        return {'backend': self.name, 'format': self.serializer.name, 'path': self.cache_dir}
+
+class SQLiteBackend(CacheBackend):
+    """
+    All entries in one SQLite database in WAL mode.
+
+    WAL lets any number of readers in every worker process on the node run
+    alongside a writer, so all workers share one warm cache. Expiry and
+    write time are indexed columns, so sweeping and size-capped eviction
+    are single DELETE statements instead of a directory walk. Each row
+    records the format it was written in, so changing the format leaves
+    existing rows readable.
+    """
+    name = 'sqlite'
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS cache_entries (
+            key TEXT PRIMARY KEY,
+            kind TEXT,
+            written_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            size INTEGER NOT NULL,
+            format TEXT,
+            payload BLOB NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_cache_entries_expires_at ON cache_entries (expires_at);
+        CREATE INDEX IF NOT EXISTS idx_cache_entries_written_at ON cache_entries (written_at);
+    """
+
+    def __init__(self, path, serializer=None, busy_timeout=5.0):
+        """
+        Args:
+            path: Database file, shared by every worker on the node
+            serializer: Payload format (zlib-compressed JSON by default)
+            busy_timeout: Seconds a writer waits for another writer's lock
+        """
+        self.path = path
+        self.serializer = serializer or get_serializer('zlib')
+        self.serializers = available_serializers()
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as connection:
+            connection.executescript(self.SCHEMA)
+            # Databases created before rows recorded their format
+            columns = {row[1] for row in connection.execute('PRAGMA table_info(cache_entries)')}
+            if 'format' not in columns:
+                connection.execute('ALTER TABLE cache_entries ADD COLUMN format TEXT')
+
+    def _connection(self):
+        # sqlite3 connections must not be shared between threads
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT format, payload FROM cache_entries WHERE key = ? AND expires_at > ?',
+            (key, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        format_name, payload = row
+        if format_name is None:
+            return self._load_untagged(payload)
+        serializer = self.serializers.get(format_name)
+        if serializer is None:
+            raise ValueError(f"Cache entry {key} is in {format_name}, which this install cannot read")
+        return serializer.loads(payload)
+
+    def _load_untagged(self, payload):
+        """Decode a row from before rows recorded their format, trying the configured format first"""
+        error = None
+        for serializer in [self.serializer] + [s for s in self.serializers.values() if s.name != self.serializer.name]:
+            try:
+                return serializer.loads(payload)
+            except Exception as e:
+                error = e
+        raise error
+
+    def set(self, key, entry):
+        serializer = self.serializer
+        payload = serializer.dumps(entry)
+        written_at = entry.get('timestamp', time.time())
+        expires_at = entry.get('expires_at', written_at + DEFAULT_EXPIRY)
+        with self._connection() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO cache_entries (key, kind, written_at, expires_at, size, format, payload) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, entry.get('kind'), written_at, expires_at, len(payload), serializer.name,
+                 sqlite3.Binary(payload))
+            )
+
+    def delete(self, key):
+        with self._connection() as connection:
+            connection.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+
+    def sweep(self, max_entries=None, max_bytes=None):
+        with self._connection() as connection:
+            removed_expired = connection.execute(
+                'DELETE FROM cache_entries WHERE expires_at <= ?', (time.time(),)
+            ).rowcount
+
+            removed_evicted = 0
+            if max_entries is not None:
+                removed_evicted += connection.execute(
+                    'DELETE FROM cache_entries WHERE key IN ('
+                    '  SELECT key FROM cache_entries ORDER BY written_at DESC LIMIT -1 OFFSET ?'
+                    ')', (max_entries,)
+                ).rowcount
+            if max_bytes is not None:
+                # Keep the newest entries whose running total fits in max_bytes
+                removed_evicted += connection.execute(
+                    'DELETE FROM cache_entries WHERE key IN ('
+                    '  SELECT key FROM ('
+                    '    SELECT key, SUM(size) OVER (ORDER BY written_at DESC, key) AS running'
+                    '    FROM cache_entries'
+                    '  ) WHERE running > ?'
+                    ')', (max_bytes,)
+                ).rowcount
+
+            entries, total_bytes = connection.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries'
+            ).fetchone()
+
+        return {
+            'expired': removed_expired,
+            'evicted': removed_evicted,
+            'entries': entries,
+            'bytes': total_bytes
+        }
+
+    def stats(self):
+        entries, total_bytes = self._connection().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries'
+        ).fetchone()
+        return {
+            'backend': self.name,
+            'format': self.serializer.name,
+            'path': self.path,
+            'entries': entries,
+            'bytes': total_bytes
+        }
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+    except Exception as e:
+        logger.error(f"Error removing cache entry {path}: {str(e)}")
+        return False
@@ -0,0 +1,86 @@
+import json
+import zlib
+
+try:
+    import msgpack
+except ImportError:  # Optional; the msgpack formats are only offered when it is installed
+    msgpack = None
+
+class Serializer:
+    """
+    Encodes cache entries to bytes and back.
+
+    Each format has its own file extension, so entries written in different
+    formats can sit side by side while a cache is being migrated.
+    """
+    name = None
+    extension = None
+    # Exceptions raised by loads() on a truncated or corrupt entry
+    errors = (ValueError,)
+
+    def dumps(self, entry):
+        raise NotImplementedError
+
+    def loads(self, data):
+        """Decode bytes or any buffer (such as an mmap) back into an entry"""
+        raise NotImplementedError
+
+class JsonSerializer(Serializer):
+    """Plain JSON text, the original cache format"""
+    name = 'json'
+    extension = '.json'
+
+    def dumps(self, entry):
+        return json.dumps(entry).encode('utf-8')
+
+    def loads(self, data):
+        return json.loads(bytes(data))
+
+class CompressedJsonSerializer(Serializer):
+    """zlib-compressed JSON; product listings shrink to a fraction of their size"""
+    name = 'zlib'
+    extension = '.json.z'
+    errors = (ValueError, zlib.error)
+
+    def __init__(self, level=6):
+        self.level = level
+
+    def dumps(self, entry):
+        return zlib.compress(json.dumps(entry, separators=(',', ':')).encode('utf-8'), self.level)
+
+    def loads(self, data):
+        return json.loads(zlib.decompress(data))
+
+class MsgpackSerializer(Serializer):
+    """Binary msgpack, optionally zlib-compressed"""
+    errors = (ValueError, zlib.error) + ((msgpack.UnpackException,) if msgpack else ())
+
+    def __init__(self, compress=False, level=6):
+        if msgpack is None:
+            raise RuntimeError("The msgpack cache format needs the msgpack package")
+        self.compress = compress
+        self.level = level
+        self.name = 'msgpack-zlib' if compress else 'msgpack'
+        self.extension = '.msgpack.z' if compress else '.msgpack'
+
+    def dumps(self, entry):
+        data = msgpack.packb(entry, use_bin_type=True)
+        return zlib.compress(data, self.level) if self.compress else data
+
+    def loads(self, data):
+        if self.compress:
+            data = zlib.decompress(data)
+        return msgpack.unpackb(data, raw=False)
+
+def available_serializers():
+    """Every format this install can read and write, keyed by name"""
+    serializers = [JsonSerializer(), CompressedJsonSerializer()]
+    if msgpack is not None:
+        serializers.extend([MsgpackSerializer(), MsgpackSerializer(compress=True)])
+    return {serializer.name: serializer for serializer in serializers}
+
+def get_serializer(name):
+    serializers = available_serializers()
+    if name not in serializers:
+        raise ValueError(f"Unknown cache format {name!r}; available: {', '.join(serializers)}")
+    return serializers[name]
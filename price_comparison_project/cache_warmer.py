@@ -0,0 +1,110 @@
+import os
+import time
+import logging
+import threading
+import concurrent.futures
+
+from singleflight import fcntl
+
+logger = logging.getLogger(__name__)
+
+class CacheWarmer:
+    """
+    Refresh the cache entries for popular queries before they expire.
+
+    Each run asks `top_queries()` for the queries to keep warm and calls
+    `warm(query, platform)` for every platform. The calls are submitted to
+    `pool`, a WorkerPool sized to the concurrency budget for warming, and
+    tagged with their platform so its per-platform caps still apply.
+    `warm` returns True if it refreshed anything and False if the entries
+    were still fresh enough.
+
+    With a `lock_path`, only one process per node warms: each run first
+    tries a non-blocking flock on that file, and the process that gets it
+    keeps it until it exits, so another worker takes over only then.
+    """
+
+    def __init__(self, top_queries, warm, platforms, pool, lock_path=None):
+        self.top_queries = top_queries
+        self.warm = warm
+        self.platforms = list(platforms)
+        self.pool = pool
+        self.lock_path = lock_path if fcntl is not None else None
+        self._lock_handle = None
+        self._lock = threading.Lock()
+        self._stats = {'runs': 0, 'refreshed': 0, 'skipped': 0, 'errors': 0, 'runs_left_to_others': 0}
+        self._last_run = None
+
+    def elected(self):
+        """Whether this process is the node's warmer, taking the lock if it is free"""
+        if self.lock_path is None or self._lock_handle is not None:
+            return True
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+        handle = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._lock_handle = handle
+        logger.info(f"This process (pid {os.getpid()}) is now the cache warmer")
+        return True
+
+    def run_once(self):
+        """Warm every (query, platform) pair once and return a summary of the run"""
+        started = time.time()
+        queries = self.top_queries()
+        futures = {}
+        for query in queries:
+            for platform in self.platforms:
+                future = self.pool.submit_for(platform, self.warm, query, platform)
+                futures[future] = (query, platform)
+
+        summary = {'queries': len(queries), 'refreshed': 0, 'skipped': 0, 'errors': 0}
+        for future in concurrent.futures.as_completed(futures):
+            query, platform = futures[future]
+            try:
+                summary['refreshed' if future.result() else 'skipped'] += 1
+            except Exception as e:
+                summary['errors'] += 1
+                logger.warning(f"Cache warm-up failed for {query!r} on {platform}: {str(e)}")
+        summary['duration'] = round(time.time() - started, 2)
+
+        with self._lock:
+            self._stats['runs'] += 1
+            for outcome in ('refreshed', 'skipped', 'errors'):
+                self._stats[outcome] += summary[outcome]
+            self._last_run = dict(summary, finished_at=time.time())
+        logger.info(f"Cache warm-up finished: {summary}")
+        return summary
+
+    def start(self, interval):
+        """Call run_once() every interval seconds on a daemon thread"""
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    if not self.elected():
+                        with self._lock:
+                            self._stats['runs_left_to_others'] += 1
+                        continue
+                    self.run_once()
+                except Exception as e:
+                    logger.error(f"Error in cache warmer: {str(e)}")
+
+        thread = threading.Thread(target=run, name='cache-warmer', daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, elected=self._lock_handle is not None or self.lock_path is None,
+                        last_run=self._last_run, pool=self.pool.stats())
+
+if __name__ == "__main__":
+    import json
+
+    logging.basicConfig(level=logging.INFO)
+    # Importing the app configures the cache and builds its warmer
+    from app import cache_warmer
+    print(json.dumps(cache_warmer.run_once()))
@@ -0,0 +1,90 @@
+import threading
+import time
+
+class DeadlineExceeded(Exception):
+    """Raised when work runs past its deadline or is cancelled"""
+    pass
+
+class Deadline:
+    """
+    Thread-safe time budget for a single request.
+
+    A Deadline is created once per search and passed down to every scraper
+    call. Scrapers cap their HTTP timeouts with `timeout()`, replace plain
+    sleeps with `sleep()` and call `check()` between steps, so work stops
+    cooperatively on whatever thread it runs on once the budget is spent or
+    the request is cancelled. Child deadlines get a tighter budget and are
+    cancelled along with their parent.
+    """
+
+    def __init__(self, budget=None, parent=None):
+        """
+        Args:
+            budget: Seconds available, or None for no limit
+            parent: Optional deadline this one may never outlive
+        """
+        expires_at = None if budget is None else time.monotonic() + budget
+        if parent is not None and parent.expires_at is not None:
+            expires_at = parent.expires_at if expires_at is None else min(expires_at, parent.expires_at)
+        self.expires_at = expires_at
+        self._cancelled = threading.Event()
+        self._children = []
+        self._lock = threading.Lock()
+        if parent is not None:
+            parent._add_child(self)
+
+    @classmethod
+    def unbounded(cls):
+        """A deadline that never expires, for callers that do not pass one"""
+        return cls()
+
+    def _add_child(self, child):
+        with self._lock:
+            self._children.append(child)
+            cancelled = self._cancelled.is_set()
+        if cancelled:
+            child.cancel()
+
+    def child(self, budget):
+        """Create a deadline with a smaller budget that is cancelled with this one"""
+        return Deadline(budget, parent=self)
+
+    def remaining(self):
+        """Seconds left, or infinity for an unbounded deadline"""
+        if self.expires_at is None:
+            return float('inf')
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def expired(self):
+        return self.cancelled or self.remaining() <= 0
+
+    def cancel(self):
+        """Cancel this deadline and all of its children, waking any sleepers"""
+        self._cancelled.set()
+        with self._lock:
+            children = list(self._children)
+        for child in children:
+            child.cancel()
+
+    def check(self):
+        """Raise DeadlineExceeded if the deadline has expired or been cancelled"""
+        if self.cancelled:
+            raise DeadlineExceeded("Request was cancelled")
+        if self.remaining() <= 0:
+            raise DeadlineExceeded("Request deadline exceeded")
+
+    def timeout(self, cap):
+        """Return an HTTP timeout no longer than cap or the time remaining"""
+        self.check()
+        return min(cap, self.remaining())
+
+    def sleep(self, seconds):
+        """Sleep for up to `seconds`, waking early and raising if the deadline ends"""
+        self.check()
+        self._cancelled.wait(min(seconds, self.remaining()))
+        self.check()
@@ -0,0 +1,263 @@
+"""
+Benchmark the scrapers' HTML extraction over a corpus of stored pages.
+
+Every page is run through its platform's parse function (search results,
+product page or reviews) with each available BeautifulSoup backend. The
+report gives pages per second, p50/p99 parse time and peak Python heap
+per backend, broken down by platform and page kind, and is written as
+JSON so runs before and after a parser change can be compared:
+
+    python parser_benchmark.py --output before.json
+    python parser_benchmark.py --compare before.json
+
+Pages come from data/parser_corpus/<platform>/<kind>/*.html, plus
+optionally a record/replay fixture store (--fixtures) and the debug
+capture directory (--captures). Each page is also parsed without its
+strainer, and any page whose strained extraction differs from the full
+one is listed under 'parity_failures'.
+"""
+import os
+import json
+import time
+import contextlib
+import hashlib
+import logging
+import platform
+import tracemalloc
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from scrapers import parsing
+from scrapers.registry import registry
+from scrapers.transport import FixtureStore
+from scrapers.debug_capture import DebugCapture
+# Importing the scraper modules registers their platforms and parse functions
+import scrapers.amazon_scraper
+import scrapers.flipkart_scraper
+import scrapers.alibaba_scraper
+import scrapers.chroma_scraper
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(BASE_DIR, 'data', 'parser_corpus')
+RESULTS_DIR = os.path.join(BASE_DIR, 'data', 'benchmarks')
+BACKENDS = ('lxml', 'html.parser', 'html5lib')
+
+def available_backends(requested=BACKENDS):
+    """The requested BeautifulSoup backends that are installed"""
+    available = []
+    for backend in requested:
+        module = {'lxml': 'lxml', 'html5lib': 'html5lib'}.get(backend)
+        if module:
+            try:
+                __import__(module)
+            except ImportError:
+                continue
+        available.append(backend)
+    return available
+
+def _platform_for_url(url):
+    host = urlsplit(url).netloc.lower()
+    for name in registry.registered():
+        scraper_class = registry.scraper_class(name)
+        if scraper_class.host and scraper_class.host == host:
+            return name
+    return None
+
+def load_corpus(corpus_dir=CORPUS_DIR, fixtures_dir=None, captures_dir=None):
+    """
+    Pages to benchmark, as dicts with platform, kind, source and content.
+    Identical bodies are only benchmarked once.
+    """
+    pages = []
+    seen = set()
+
+    def add(platform_name, kind, source, content):
+        scraper_class = registry.scraper_class(platform_name)
+        if scraper_class is None or kind not in scraper_class.parsers:
+            logger.warning(f"No {kind} parser for {platform_name}, skipping {source}")
+            return
+        digest = hashlib.sha256(content).hexdigest()
+        if digest in seen:
+            return
+        seen.add(digest)
+        pages.append({'platform': platform_name, 'kind': kind, 'source': source, 'content': content})
+
+    if os.path.isdir(corpus_dir):
+        for platform_name in sorted(os.listdir(corpus_dir)):
+            for kind in sorted(os.listdir(os.path.join(corpus_dir, platform_name))):
+                directory = os.path.join(corpus_dir, platform_name, kind)
+                for name in sorted(os.listdir(directory)):
+                    with open(os.path.join(directory, name), 'rb') as f:
+                        add(platform_name, kind, os.path.relpath(os.path.join(directory, name), BASE_DIR), f.read())
+
+    if fixtures_dir:
+        store = FixtureStore(fixtures_dir)
+        for entry in store.entries():
+            platform_name = _platform_for_url(entry['url'])
+            if platform_name is None or entry['status_code'] != 200:
+                continue
+            kind = registry.scraper_class(platform_name).page_kind(entry['url'])
+            add(platform_name, kind, entry['url'], store.body(entry['body']))
+
+    if captures_dir:
+        captures = DebugCapture(captures_dir)
+        for capture in captures.list():
+            scraper_class = registry.scraper_class(capture['platform'])
+            path = captures.body_path(capture['id'])
+            if scraper_class is None or path is None or capture['status_code'] != 200:
+                continue
+            with open(path, 'rb') as f:
+                add(capture['platform'], scraper_class.page_kind(capture['url']), capture['url'], f.read())
+
+    return pages
+
+def _percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+def _summarize(durations, peaks):
+    durations = sorted(durations)
+    total = sum(durations)
+    return {
+        'parses': len(durations),
+        'pages_per_second': round(len(durations) / total, 2) if total else None,
+        'p50_ms': round(_percentile(durations, 50) * 1000, 3),
+        'p99_ms': round(_percentile(durations, 99) * 1000, 3),
+        'peak_memory_bytes': max(peaks) if peaks else None
+    }
+
+def _parse(page):
+    # The parse functions print progress as they go; keep it out of the report
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        return registry.scraper_class(page['platform']).parsers[page['kind']](page['content'])
+
+def benchmark_backend(pages, backend, repeat=5):
+    """Time and measure every page's extraction with one parser backend"""
+    previous = parsing.PARSER
+    parsing.PARSER = backend
+    try:
+        durations = {}
+        peaks = {}
+        items = {}
+        for page in pages:
+            group = f"{page['platform']}/{page['kind']}"
+            # Warm up, and count what the parser extracts
+            result = _parse(page)
+            items[page['source']] = len(result) if isinstance(result, (list, dict)) else int(result is not None)
+            for _ in range(repeat):
+                started = time.perf_counter()
+                _parse(page)
+                durations.setdefault(group, []).append(time.perf_counter() - started)
+
+            # Memory in a separate pass, since tracing slows the parse down
+            tracemalloc.start()
+            try:
+                _parse(page)
+                peaks.setdefault(group, []).append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+    finally:
+        parsing.PARSER = previous
+
+    every_duration = [d for group in durations.values() for d in group]
+    every_peak = [p for group in peaks.values() for p in group]
+    return dict(
+        _summarize(every_duration, every_peak),
+        groups={group: _summarize(durations[group], peaks[group]) for group in sorted(durations)},
+        items_extracted=items
+    )
+
+def check_parity(pages, backend):
+    """Pages whose strained extraction differs from a parse of the full page"""
+    previous = parsing.PARSER, parsing.STRAIN
+    parsing.PARSER = backend
+    failures = []
+    try:
+        for page in pages:
+            parsing.STRAIN = True
+            strained = _parse(page)
+            parsing.STRAIN = False
+            full = _parse(page)
+            if strained != full:
+                failures.append({'backend': backend, 'source': page['source'],
+                                 'platform': page['platform'], 'kind': page['kind']})
+    finally:
+        parsing.PARSER, parsing.STRAIN = previous
+    return failures
+
+def run(pages, backends, repeat=5):
+    results = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'repeat': repeat,
+        'corpus': [{'source': page['source'], 'platform': page['platform'], 'kind': page['kind'],
+                    'bytes': len(page['content'])} for page in pages],
+        'backends': {},
+        'parity_failures': []
+    }
+    for backend in backends:
+        logger.info(f"Benchmarking {len(pages)} pages with {backend}")
+        results['backends'][backend] = benchmark_backend(pages, backend, repeat)
+        results['parity_failures'].extend(check_parity(pages, backend))
+    return results
+
+def compare(previous, current):
+    """p50 and throughput changes per backend, relative to an earlier results file"""
+    changes = {}
+    for backend, stats in current['backends'].items():
+        before = previous.get('backends', {}).get(backend)
+        if not before or not before.get('p50_ms') or not before.get('pages_per_second'):
+            continue
+        changes[backend] = {
+            'p50_change': round(stats['p50_ms'] / before['p50_ms'] - 1, 3),
+            'p99_change': round(stats['p99_ms'] / before['p99_ms'] - 1, 3),
+            'throughput_change': round(stats['pages_per_second'] / before['pages_per_second'] - 1, 3)
+        }
+    return changes
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark scraper HTML parsing")
+    parser.add_argument('--corpus', default=CORPUS_DIR, help="Corpus directory (default: data/parser_corpus)")
+    parser.add_argument('--fixtures', default=None, help="Also benchmark the pages in this fixture store")
+    parser.add_argument('--captures', default=None, help="Also benchmark the pages in this debug capture directory")
+    parser.add_argument('--backends', default=','.join(BACKENDS),
+                        help="Comma-separated parser backends; ones not installed are skipped")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed parses per page and backend")
+    parser.add_argument('--output', default=None, help="Results file (default: data/benchmarks/parser-<time>.json)")
+    parser.add_argument('--compare', default=None, help="Earlier results file to report changes against")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    pages = load_corpus(args.corpus, args.fixtures, args.captures)
+    if not pages:
+        parser.error("No pages to benchmark")
+    backends = available_backends([backend.strip() for backend in args.backends.split(',') if backend.strip()])
+    if not backends:
+        parser.error("None of the requested parser backends is installed")
+
+    results = run(pages, backends, args.repeat)
+    if args.compare:
+        with open(args.compare) as f:
+            results['compared_to'] = args.compare
+            results['changes'] = compare(json.load(f), results)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"parser-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    for backend, stats in results['backends'].items():
+        print(f"{backend}: {stats['pages_per_second']} pages/s, p50 {stats['p50_ms']} ms, "
+              f"p99 {stats['p99_ms']} ms, peak {stats['peak_memory_bytes']} bytes")
+    for backend, change in results.get('changes', {}).items():
+        print(f"{backend} vs {args.compare}: {json.dumps(change)}")
+    if results['parity_failures']:
+        print(f"{len(results['parity_failures'])} page(s) parse differently with their strainer")
+    print(f"Results written to {output}")
@@ -0,0 +1,204 @@
+import asyncio
+import functools
+import logging
+import time
+import traceback
+
+from deadline import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+class PipelineError(Exception):
+    """Raised when a pipeline is wired up incorrectly"""
+    pass
+
+def submit_to(executor, platform, func):
+    """Schedule func on an executor, tagged with a platform when the executor supports it"""
+    if platform is not None and hasattr(executor, 'submit_for'):
+        return asyncio.wrap_future(executor.submit_for(platform, func))
+    return asyncio.get_running_loop().run_in_executor(executor, func)
+
+class Stage:
+    """A named unit of work that declares which stages it needs"""
+
+    def __init__(self, name, func, requires=(), fallback=None, bounded=False,
+                 executor=None, platform=None):
+        """
+        Args:
+            name: Unique stage name, e.g. 'fetch:amazon'
+            func: Stage body. Plain functions run on the executor and receive
+                a dict of their dependencies' results. Coroutine functions run
+                on the event loop and receive a StageContext instead, which lets
+                them wait on stages they only need conditionally.
+            requires: Names of stages that must finish before this one starts
+            fallback: Optional callable(dependency_results) whose return value
+                is used if the stage raises
+            bounded: Stop waiting for the stage once the pipeline's deadline
+                expires and use its fallback instead. Set this on stages that
+                do network or database I/O.
+            executor: Executor for this stage's blocking work, overriding the
+                pipeline's default
+            platform: Platform the stage works for, used by worker pools to
+                apply per-platform concurrency caps
+        """
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.fallback = fallback
+        self.bounded = bounded
+        self.executor = executor
+        self.platform = platform
+
+class StageContext:
+    """Handle given to coroutine stages for offloading work and waiting on other stages"""
+
+    def __init__(self, pipeline, executor, results, platform=None):
+        self._pipeline = pipeline
+        self._executor = executor
+        self._platform = platform
+        self.results = results
+
+    @property
+    def deadline(self):
+        return self._pipeline.deadline
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking callable on the stage's executor"""
+        return await submit_to(self._executor, self._platform, functools.partial(func, *args, **kwargs))
+
+    async def wait_for(self, name):
+        """Wait for a stage that was not declared up front and return its result"""
+        if name not in self._pipeline.stages:
+            raise PipelineError(f"Unknown stage: {name}")
+        return await asyncio.shield(self._pipeline._done[name])
+
+class SearchPipeline:
+    """
+    Small dependency graph scheduler for the search pipeline.
+
+    Each stage starts as soon as everything it requires has finished, so
+    stages with no dependencies between them run concurrently. The start
+    offset, duration and outcome of every stage are recorded in `timings`;
+    stages can record anything else worth reporting in `annotations`.
+
+    When the pipeline has a deadline, bounded stages are abandoned once it
+    expires and the deadline is cancelled so their worker threads stop at
+    their next cooperative check.
+    """
+
+    def __init__(self, deadline=None):
+        self.deadline = deadline
+        self.stages = {}
+        self.timings = {}
+        self.annotations = {}
+        self._done = {}
+
+    def add_stage(self, name, func, requires=(), fallback=None, bounded=False,
+                  executor=None, platform=None):
+        if name in self.stages:
+            raise PipelineError(f"Duplicate stage: {name}")
+        self.stages[name] = Stage(name, func, requires, fallback, bounded, executor, platform)
+        return self.stages[name]
+
+    def validate(self):
+        """Check that every dependency exists and that the graph has no cycles"""
+        for stage in self.stages.values():
+            for dependency in stage.requires:
+                if dependency not in self.stages:
+                    raise PipelineError(f"Stage {stage.name} requires unknown stage {dependency}")
+
+        visiting = set()
+        visited = set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise PipelineError(f"Dependency cycle through stage {name}")
+            visiting.add(name)
+            for dependency in self.stages[name].requires:
+                visit(dependency)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    async def _run_stage(self, stage, executor, results, started_at, on_stage_complete):
+        # Wait for everything this stage declared it needs
+        if stage.requires:
+            await asyncio.gather(*(asyncio.shield(self._done[name]) for name in stage.requires))
+        dependencies = {name: results[name] for name in stage.requires}
+
+        executor = stage.executor or executor
+        start = time.time()
+        status = 'ok'
+        try:
+            if asyncio.iscoroutinefunction(stage.func):
+                context = StageContext(self, executor, dependencies, stage.platform)
+                work = stage.func(context)
+            else:
+                work = submit_to(executor, stage.platform, functools.partial(stage.func, dependencies))
+
+            if stage.bounded and self.deadline is not None:
+                result = await asyncio.wait_for(work, timeout=self.deadline.remaining())
+            else:
+                result = await work
+        except (asyncio.TimeoutError, DeadlineExceeded):
+            logger.warning(f"Pipeline stage {stage.name} ran past the request deadline")
+            status = 'timeout'
+            result = None
+            if self.deadline is not None:
+                # Wake any worker threads still sleeping on this request
+                self.deadline.cancel()
+            if stage.fallback:
+                try:
+                    result = stage.fallback(dependencies)
+                except Exception as fallback_error:
+                    logger.error(f"Fallback for stage {stage.name} failed: {str(fallback_error)}")
+        except Exception as e:
+            logger.error(f"Error in pipeline stage {stage.name}: {str(e)}")
+            logger.error(traceback.format_exc())
+            status = 'error'
+            result = None
+            if stage.fallback:
+                try:
+                    result = stage.fallback(dependencies)
+                    status = 'fallback'
+                except Exception as fallback_error:
+                    logger.error(f"Fallback for stage {stage.name} failed: {str(fallback_error)}")
+
+        self.timings[stage.name] = {
+            'start': round(start - started_at, 3),
+            'duration': round(time.time() - start, 3),
+            'status': status
+        }
+        results[stage.name] = result
+        self._done[stage.name].set_result(result)
+        if on_stage_complete:
+            try:
+                on_stage_complete(stage.name, result)
+            except Exception as e:
+                logger.error(f"Error in stage completion callback for {stage.name}: {str(e)}")
+
+    async def run(self, executor, on_stage_complete=None):
+        """
+        Run every stage and return a dict of results keyed by stage name.
+
+        Args:
+            executor: Default executor for blocking stage bodies
+            on_stage_complete: Optional callable(name, result) invoked on the
+                event loop as each stage finishes
+        """
+        self.validate()
+        loop = asyncio.get_running_loop()
+        self._done = {name: loop.create_future() for name in self.stages}
+        self.timings = {}
+        results = {}
+        started_at = time.time()
+
+        await asyncio.gather(*(
+            self._run_stage(stage, executor, results, started_at, on_stage_complete)
+            for stage in self.stages.values()
+        ))
+        return results
@@ -1,14 +1,92 @@
-import requests
-from bs4 import BeautifulSoup
 import json
 import random
 import logging
 from datetime import datetime
 import os
+from deadline import Deadline, DeadlineExceeded
+from scrapers.errors import ScrapeError
+from scrapers.base import BaseScraper
+from scrapers.registry import registry
+from scrapers.parsing import containers, parse_html
+from scrapers.debug_capture import debug_capture
+from scrapers.parse_pool import parse_pool
 
 logger = logging.getLogger(__name__)
 
-class AlibabaProductScraper:
+# Parts of the search page the scraper reads; nothing else is built into the tree
+SEARCH_RESULTS = containers({'class': 'list-no-v2-main'})
+
+def parse_search_results(content):
+    """Extract up to 5 products from a search results page"""
+    soup = parse_html(content, SEARCH_RESULTS)
+
+    # Extract products from search results
+    products = []
+    product_cards = soup.select('.list-no-v2-main')
+
+    for card in product_cards[:5]:  # Get top 5 results
+        try:
+            # Extract product details
+            name_elem = card.select_one('.elements-title-normal__content')
+            price_elem = card.select_one('.elements-offer-price-normal__price')
+            url_elem = card.select_one('a.elements-title-normal')
+            image_elem = card.select_one('img.J-img-switcher-target')
+
+            if not name_elem or not url_elem:
+                continue
+
+            name = name_elem.text.strip()
+            url = url_elem.get('href', '')
+            if url and not url.startswith('http'):
+                url = 'https:' + url if url.startswith('//') else 'https://www.alibaba.com' + url
+
+            # Price might be in a range or require minimum order
+            price = "N/A"
+            if price_elem:
+                price_text = price_elem.text.strip()
+                # Extract numeric part of the price
+                import re
+                price_match = re.search(r'[\d,.]+', price_text)
+                if price_match:
+                    # Convert to INR (approximate conversion)
+                    try:
+                        price_value = float(price_match.group().replace(',', ''))
+                        # Assuming price is in USD, convert to INR (approximate rate)
+                        price = str(int(price_value * 83))  # 1 USD ≈ 83 INR
+                    except:
+                        pass
+
+            image_url = image_elem.get('src', '') if image_elem else ''
+            if image_url and not image_url.startswith('http'):
+                image_url = 'https:' + image_url if image_url.startswith('//') else image_url
+
+            # Rating is often not available on Alibaba, use placeholder
+            rating = "N/A"
+
+            products.append({
+                'name': name,
+                'price': price,
+                'url': url,
+                'rating': rating,
+                'image_url': image_url
+            })
+
+        except Exception as e:
+            logger.error(f"Error extracting Alibaba product: {str(e)}")
+            continue
+
+    return products
+
+@registry.register
+class AlibabaProductScraper(BaseScraper):
+    name = 'alibaba'
+    display_name = 'Alibaba'
+    host = 'www.alibaba.com'
+    color = 'rgba(255, 106, 0, 0.7)'
+    # Reviews are placeholder data only
+    supports_reviews = False
+    parsers = {'search': parse_search_results}
+
     def __init__(self):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -16,8 +94,9 @@ class AlibabaProductScraper:
         }
         self.base_url = "https://www.alibaba.com/trade/search"
     
-    def search_product(self, query):
+    def search_product(self, query, deadline=None):
         """Search for products on Alibaba"""
+        deadline = deadline or Deadline.unbounded()
         try:
             # Format query for URL
             search_query = query.replace(' ', '+')
@@ -25,76 +104,31 @@ class AlibabaProductScraper:
             
             logger.info(f"Searching Alibaba for: {query} at URL: {search_url}")
             
-            response = requests.get(search_url, headers=self.headers, timeout=10)
+            response = self.fetch(search_url, deadline, headers=self.headers)
             if response.status_code != 200:
                 logger.error(f"Failed to get Alibaba search results. Status code: {response.status_code}")
-                return []
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
+                debug_capture.record('alibaba', search_url, response, failed=True, reason=f"HTTP {response.status_code}")
+                raise ScrapeError('alibaba', f"HTTP {response.status_code}", response.status_code)
             
-            # Extract products from search results
-            products = []
-            product_cards = soup.select('.list-no-v2-main')
-            
-            for card in product_cards[:5]:  # Get top 5 results
-                try:
-                    # Extract product details
-                    name_elem = card.select_one('.elements-title-normal__content')
-                    price_elem = card.select_one('.elements-offer-price-normal__price')
-                    url_elem = card.select_one('a.elements-title-normal')
-                    image_elem = card.select_one('img.J-img-switcher-target')
-                    
-                    if not name_elem or not url_elem:
-                        continue
-                    
-                    name = name_elem.text.strip()
-                    url = url_elem.get('href', '')
-                    if url and not url.startswith('http'):
-                        url = 'https:' + url if url.startswith('//') else 'https://www.alibaba.com' + url
-                    
-                    # Price might be in a range or require minimum order
-                    price = "N/A"
-                    if price_elem:
-                        price_text = price_elem.text.strip()
-                        # Extract numeric part of the price
-                        import re
-                        price_match = re.search(r'[\d,.]+', price_text)
-                        if price_match:
-                            # Convert to INR (approximate conversion)
-                            try:
-                                price_value = float(price_match.group().replace(',', ''))
-                                # Assuming price is in USD, convert to INR (approximate rate)
-                                price = str(int(price_value * 83))  # 1 USD ≈ 83 INR
-                            except:
-                                pass
-                    
-                    image_url = image_elem.get('src', '') if image_elem else ''
-                    if image_url and not image_url.startswith('http'):
-                        image_url = 'https:' + image_url if image_url.startswith('//') else image_url
-                    
-                    # Rating is often not available on Alibaba, use placeholder
-                    rating = "N/A"
-                    
-                    products.append({
-                        'name': name,
-                        'price': price,
-                        'url': url,
-                        'rating': rating,
-                        'image_url': image_url
-                    })
-                    
-                except Exception as e:
-                    logger.error(f"Error extracting Alibaba product: {str(e)}")
-                    continue
+            products = parse_pool.run(parse_search_results, response.content, deadline)
             
             logger.info(f"Found {len(products)} products on Alibaba")
+            # Keep the page for debugging if nothing could be parsed (or if sampled)
+            debug_capture.record('alibaba', search_url, response, failed=not products, reason=None if products else 'no products parsed')
             return products
             
+        except DeadlineExceeded:
+            logger.warning("Alibaba search stopped: request deadline exceeded")
+            raise
+        except ScrapeError:
+            raise
         except Exception as e:
+            # A request cut short by the deadline is not a scraping failure
+            deadline.check()
             logger.error(f"Error in Alibaba search: {str(e)}")
-            return []
+            raise ScrapeError('alibaba', str(e)) from e
     
-    def get_product_reviews(self, product_url):
+    def get_product_reviews(self, product_url, deadline=None):
         """Get product reviews from Alibaba (limited functionality)"""
         try:
             # Alibaba doesn't have easily accessible reviews like Amazon/Flipkart
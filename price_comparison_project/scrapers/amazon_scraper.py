@@ -1,12 +1,166 @@
-import requests
-from bs4 import BeautifulSoup
 import json
-import time
 import random
 import os
 from datetime import datetime
+from deadline import Deadline, DeadlineExceeded
+from scrapers.errors import ScrapeError
+from scrapers.base import BaseScraper
+from scrapers.registry import registry
+from scrapers.parsing import containers, parse_html
+from scrapers.debug_capture import debug_capture
+from scrapers.parse_pool import parse_pool
+
+# Parts of each page the scraper reads; nothing else is built into the tree
+SEARCH_RESULTS = containers({'data-component-type': 's-search-result'}, {'class': 's-result-item'})
+PRODUCT_RATINGS = containers({'data-hook': 'see-all-reviews-link-foot'}, {'id': 'acrPopover'})
+REVIEWS = containers({'data-hook': 'review'})
+
+def parse_search_results(content):
+    """Extract up to 10 products from a search results page"""
+    soup = parse_html(content, SEARCH_RESULTS)
+
+    products = []
+
+    # Try different product container selectors
+    results = soup.select('div[data-component-type="s-search-result"]')
+    print(f"Found {len(results)} raw results on Amazon")
+
+    if not results:
+        # Try alternative selectors
+        results = soup.select('.s-result-item')
+        print(f"Using alternative selector, found {len(results)} results")
+
+    for item in results[:10]:  # Limit to first 10 results
+        product = {}
+
+        # Try to extract name
+        title_element = item.select_one('.a-size-medium.a-color-base.a-text-normal')
+        if not title_element:
+            title_element = item.select_one('.a-size-base-plus.a-color-base.a-text-normal')
+        if not title_element:
+            title_element = item.select_one('h2 a span')
+
+        if title_element:
+            product['name'] = title_element.text.strip()
+
+        # Try to extract price
+        price_element = item.select_one('.a-price .a-offscreen')
+        if not price_element:
+            price_element = item.select_one('.a-price-whole')
+
+        if price_element:
+            price_text = price_element.text.replace('₹', '').replace(',', '').strip()
+            try:
+                # Extract only digits
+                price_text = ''.join(c for c in price_text if c.isdigit() or c == '.')
+                product['price'] = price_text
+            except:
+                continue
+
+        # Try to extract URL
+        link_element = item.select_one('h2 a')
+        if not link_element:
+            link_element = item.select_one('.a-link-normal')
+
+        if link_element and link_element.get('href'):
+            href = link_element.get('href')
+            if href.startswith('/'):
+                product['url'] = 'https://www.amazon.in' + href
+            else:
+                product['url'] = href
+
+        # Try to extract rating
+        rating_element = item.select_one('.a-icon-alt')
+        if rating_element:
+            rating_text = rating_element.text
+            if 'out of 5 stars' in rating_text:
+                try:
+                    product['rating'] = rating_text.split(' ')[0]
+                except:
+                    pass
+
+        # Try to extract image URL
+        img_element = item.select_one('img.s-image')
+        if img_element and img_element.get('src'):
+            product['image_url'] = img_element.get('src')
+
+        if 'name' in product and 'price' in product and 'url' in product:
+            products.append(product)
+            print(f"Found product: {product['name'][:30]}... - ₹{product['price']}")
+
+    return products
+
+def parse_product_page(content):
+    """Return the link to all reviews and the overall rating text found on a product page"""
+    soup = parse_html(content, PRODUCT_RATINGS)
+    review_link_element = soup.select_one('a[data-hook="see-all-reviews-link-foot"]')
+    rating_element = soup.select_one('#acrPopover')
+    review_href = review_link_element.get('href') if review_link_element else None
+    rating_text = rating_element.get('title', '') if rating_element else ''
+    return review_href, rating_text
+
+def parse_reviews(content):
+    """Count rated reviews on a reviews page, or None if none had a rating"""
+    review_soup = parse_html(content, REVIEWS)
+
+    # Extract reviews
+    review_elements = review_soup.select('div[data-hook="review"]')
+
+    positive = 0
+    neutral = 0
+    negative = 0
+
+    for review in review_elements[:20]:  # Limit to 20 reviews
+        # Extract rating
+        rating_element = review.select_one('i[data-hook="review-star-rating"] span')
+
+        if rating_element:
+            rating_text = rating_element.text
+            if 'out of 5 stars' in rating_text:
+                try:
+                    rating = float(rating_text.split(' ')[0])
+                    if rating >= 4:
+                        positive += 1
+                    elif rating >= 3:
+                        neutral += 1
+                    else:
+                        negative += 1
+                except:
+                    neutral += 1
+
+    total = positive + neutral + negative
+
+    if total > 0:
+        # Calculate reliability score based on reviews
+        reliability_score = (positive * 100 + neutral * 50) / (total * 100) * 100
+        reliability_score = min(100, max(0, reliability_score))
+
+        return {
+            'positive': positive,
+            'neutral': neutral,
+            'negative': negative,
+            'total_reviews': total,
+            'reliability_score': round(reliability_score)
+        }
+    return None
+
+@registry.register
+class ImprovedAmazonScraper(BaseScraper):
+    name = 'amazon'
+    display_name = 'Amazon'
+    host = 'www.amazon.in'
+    color = 'rgba(255, 153, 0, 0.7)'
+    rate_limit = 0.5
+    timeout = 15
+    parsers = {'search': parse_search_results, 'product': parse_product_page, 'reviews': parse_reviews}
+
+    @classmethod
+    def page_kind(cls, url):
+        path = cls._path(url)
+        if path == '/s':
+            return 'search'
+        return 'reviews' if '/product-reviews/' in path else 'product'
 
-class ImprovedAmazonScraper:
     def __init__(self):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0.4664.110 Safari/537.36',
@@ -25,110 +179,42 @@ class ImprovedAmazonScraper:
             'ubid-main': '123-4567890-1234567'
         }
     
-    def search_product(self, query):
+    def search_product(self, query, deadline=None):
         print(f"Searching Amazon for: {query}")
+        deadline = deadline or Deadline.unbounded()
         # Use a more realistic search URL
         search_query = query.replace(' ', '+')
         url = f'https://www.amazon.in/s?k={search_query}&ref=nb_sb_noss'
         
         try:
-            # Add delay to avoid rate limiting
-            time.sleep(2 + random.random() * 3)
-            
-            # Use session to maintain cookies
-            session = requests.Session()
-            
-            # Make the request with headers and cookies
-            response = session.get(url, headers=self.headers, cookies=self.cookies, timeout=15)
+            # Make the request with headers and cookies, within Amazon's rate limit
+            response = self.fetch(url, deadline, headers=self.headers, cookies=self.cookies)
             
             print(f"Amazon response status: {response.status_code}")
             
             if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # For debugging - save the HTML to a file
-                with open('amazon_debug.html', 'w', encoding='utf-8') as f:
-                    f.write(soup.prettify())
-                
-                products = []
-                
-                # Try different product container selectors
-                results = soup.select('div[data-component-type="s-search-result"]')
-                print(f"Found {len(results)} raw results on Amazon")
-                
-                if not results:
-                    # Try alternative selectors
-                    results = soup.select('.s-result-item')
-                    print(f"Using alternative selector, found {len(results)} results")
-                
-                for item in results[:10]:  # Limit to first 10 results
-                    product = {}
-                    
-                    # Try to extract name
-                    title_element = item.select_one('.a-size-medium.a-color-base.a-text-normal')
-                    if not title_element:
-                        title_element = item.select_one('.a-size-base-plus.a-color-base.a-text-normal')
-                    if not title_element:
-                        title_element = item.select_one('h2 a span')
-                    
-                    if title_element:
-                        product['name'] = title_element.text.strip()
-                    
-                    # Try to extract price
-                    price_element = item.select_one('.a-price .a-offscreen')
-                    if not price_element:
-                        price_element = item.select_one('.a-price-whole')
-                    
-                    if price_element:
-                        price_text = price_element.text.replace('₹', '').replace(',', '').strip()
-                        try:
-                            # Extract only digits
-                            price_text = ''.join(c for c in price_text if c.isdigit() or c == '.')
-                            product['price'] = price_text
-                        except:
-                            continue
-                    
-                    # Try to extract URL
-                    link_element = item.select_one('h2 a')
-                    if not link_element:
-                        link_element = item.select_one('.a-link-normal')
-                    
-                    if link_element and link_element.get('href'):
-                        href = link_element.get('href')
-                        if href.startswith('/'):
-                            product['url'] = 'https://www.amazon.in' + href
-                        else:
-                            product['url'] = href
-                    
-                    # Try to extract rating
-                    rating_element = item.select_one('.a-icon-alt')
-                    if rating_element:
-                        rating_text = rating_element.text
-                        if 'out of 5 stars' in rating_text:
-                            try:
-                                product['rating'] = rating_text.split(' ')[0]
-                            except:
-                                pass
-                    
-                    # Try to extract image URL
-                    img_element = item.select_one('img.s-image')
-                    if img_element and img_element.get('src'):
-                        product['image_url'] = img_element.get('src')
-                    
-                    if 'name' in product and 'price' in product and 'url' in product:
-                        products.append(product)
-                        print(f"Found product: {product['name'][:30]}... - ₹{product['price']}")
+                products = parse_pool.run(parse_search_results, response.content, deadline)
                 
+                # Keep the page for debugging if nothing could be parsed (or if sampled)
+                debug_capture.record('amazon', url, response, failed=not products, reason=None if products else 'no products parsed')
                 return products
             else:
                 print(f"Failed to fetch data from Amazon: {response.status_code}")
                 print(f"Response content: {response.text[:200]}...")  # Print first 200 chars
-                return []
+                debug_capture.record('amazon', url, response, failed=True, reason=f"HTTP {response.status_code}")
+                raise ScrapeError('amazon', f"HTTP {response.status_code}", response.status_code)
+        except DeadlineExceeded:
+            print("Amazon search stopped: request deadline exceeded")
+            raise
+        except ScrapeError:
+            raise
         except Exception as e:
+            # A request cut short by the deadline is not a scraping failure
+            deadline.check()
             print(f"Error during Amazon scraping: {str(e)}")
             import traceback
             traceback.print_exc()
-            return []
+            raise ScrapeError('amazon', str(e)) from e
     
     def save_price_history(self, product_name, price, file_path):
         """Save product price history to JSON file"""
@@ -159,124 +245,82 @@ class ImprovedAmazonScraper:
         except Exception as e:
             print(f"Error saving price history: {str(e)}")
 
-    def get_product_reviews(self, product_url):
+    def get_product_reviews(self, product_url, deadline=None):
         """Get product reviews from Amazon"""
         print(f"Getting reviews for Amazon product: {product_url}")
+        deadline = deadline or Deadline.unbounded()
         
         try:
-            # Add delay to avoid rate limiting
-            time.sleep(2 + random.random() * 3)
-            
-            # Use session to maintain cookies
-            session = requests.Session()
-            
-            # Make the request with headers and cookies
-            response = session.get(product_url, headers=self.headers, cookies=self.cookies, timeout=15)
+            # Make the request with headers and cookies, within Amazon's rate limit
+            response = self.fetch(product_url, deadline, headers=self.headers, cookies=self.cookies)
             
             if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
+                review_href, rating_text = parse_pool.run(parse_product_page, response.content, deadline)
                 
                 # Find review section or link to reviews
-                review_link_element = soup.select_one('a[data-hook="see-all-reviews-link-foot"]')
-                
-                if review_link_element and review_link_element.get('href'):
-                    review_url = 'https://www.amazon.in' + review_link_element.get('href')
+                if review_href:
+                    review_url = 'https://www.amazon.in' + review_href
                     
-                    # Fetch the reviews page
-                    time.sleep(1 + random.random() * 2)
-                    review_response = session.get(review_url, headers=self.headers, cookies=self.cookies, timeout=15)
+                    # Fetch the reviews page, carrying over the cookies the product page set
+                    cookies = {**self.cookies, **response.cookies.get_dict()}
+                    review_response = self.fetch(review_url, deadline, headers=self.headers, cookies=cookies)
                     
                     if review_response.status_code == 200:
-                        review_soup = BeautifulSoup(review_response.content, 'html.parser')
-                        
-                        # Extract reviews
-                        review_elements = review_soup.select('div[data-hook="review"]')
-                        
-                        positive = 0
-                        neutral = 0
-                        negative = 0
-                        
-                        for review in review_elements[:20]:  # Limit to 20 reviews
-                            # Extract rating
-                            rating_element = review.select_one('i[data-hook="review-star-rating"] span')
-                            
-                            if rating_element:
-                                rating_text = rating_element.text
-                                if 'out of 5 stars' in rating_text:
-                                    try:
-                                        rating = float(rating_text.split(' ')[0])
-                                        if rating >= 4:
-                                            positive += 1
-                                        elif rating >= 3:
-                                            neutral += 1
-                                        else:
-                                            negative += 1
-                                    except:
-                                        neutral += 1
-                        
-                        total = positive + neutral + negative
-                        
-                        if total > 0:
-                            # Calculate reliability score based on reviews
-                            reliability_score = (positive * 100 + neutral * 50) / (total * 100) * 100
-                            reliability_score = min(100, max(0, reliability_score))
-                            
-                            return {
-                                'positive': positive,
-                                'neutral': neutral,
-                                'negative': negative,
-                                'total_reviews': total,
-                                'reliability_score': round(reliability_score)
-                            }
+                        reviews = parse_pool.run(parse_reviews, review_response.content, deadline)
+                        if reviews:
+                            return reviews
                 
                 # If we couldn't extract reviews, try to get the overall rating
-                rating_element = soup.select_one('#acrPopover')
-                if rating_element:
-                    rating_text = rating_element.get('title', '')
-                    if 'out of 5 stars' in rating_text:
-                        try:
-                            rating = float(rating_text.split(' ')[0])
-                            # Generate synthetic review distribution based on overall rating
-                            total_reviews = random.randint(20, 100)
-                            if rating >= 4.5:
-                                positive = int(total_reviews * 0.8)
-                                neutral = int(total_reviews * 0.15)
-                                negative = total_reviews - positive - neutral
-                            elif rating >= 4.0:
-                                positive = int(total_reviews * 0.7)
-                                neutral = int(total_reviews * 0.2)
-                                negative = total_reviews - positive - neutral
-                            elif rating >= 3.5:
-                                positive = int(total_reviews * 0.6)
-                                neutral = int(total_reviews * 0.25)
-                                negative = total_reviews - positive - neutral
-                            elif rating >= 3.0:
-                                positive = int(total_reviews * 0.5)
-                                neutral = int(total_reviews * 0.3)
-                                negative = total_reviews - positive - neutral
-                            else:
-                                positive = int(total_reviews * 0.3)
-                                neutral = int(total_reviews * 0.3)
-                                negative = total_reviews - positive - neutral
-                            
-                            reliability_score = (positive * 100 + neutral * 50) / (total_reviews * 100) * 100
-                            
-                            return {
-                                'positive': positive,
-                                'neutral': neutral,
-                                'negative': negative,
-                                'total_reviews': total_reviews,
-                                'reliability_score': round(reliability_score),
-                                'note': 'Based on overall rating'
-                            }
-                        except:
-                            pass
+                if 'out of 5 stars' in rating_text:
+                    try:
+                        rating = float(rating_text.split(' ')[0])
+                        # Generate synthetic review distribution based on overall rating
+                        total_reviews = random.randint(20, 100)
+                        if rating >= 4.5:
+                            positive = int(total_reviews * 0.8)
+                            neutral = int(total_reviews * 0.15)
+                            negative = total_reviews - positive - neutral
+                        elif rating >= 4.0:
+                            positive = int(total_reviews * 0.7)
+                            neutral = int(total_reviews * 0.2)
+                            negative = total_reviews - positive - neutral
+                        elif rating >= 3.5:
+                            positive = int(total_reviews * 0.6)
+                            neutral = int(total_reviews * 0.25)
+                            negative = total_reviews - positive - neutral
+                        elif rating >= 3.0:
+                            positive = int(total_reviews * 0.5)
+                            neutral = int(total_reviews * 0.3)
+                            negative = total_reviews - positive - neutral
+                        else:
+                            positive = int(total_reviews * 0.3)
+                            neutral = int(total_reviews * 0.3)
+                            negative = total_reviews - positive - neutral
+                        
+                        reliability_score = (positive * 100 + neutral * 50) / (total_reviews * 100) * 100
+                        
+                        return {
+                            'positive': positive,
+                            'neutral': neutral,
+                            'negative': negative,
+                            'total_reviews': total_reviews,
+                            'reliability_score': round(reliability_score),
+                            'note': 'Based on overall rating'
+                        }
+                    except:
+                        pass
             
             # If all else fails, return dummy data
             print("Falling back to dummy review data for Amazon")
+            debug_capture.record('amazon', product_url, response, failed=True,
+                                 reason='no reviews parsed' if response.status_code == 200 else f"HTTP {response.status_code}")
             return self._generate_dummy_reviews()
             
+        except DeadlineExceeded:
+            print("Amazon reviews stopped: request deadline exceeded")
+            raise
         except Exception as e:
+            deadline.check()
             print(f"Error getting Amazon reviews: {str(e)}")
             return self._generate_dummy_reviews()
         
@@ -0,0 +1,107 @@
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from deadline import Deadline, DeadlineExceeded
+from scrapers.http_client import http_client
+from scrapers.transport import FixtureNotFound
+from scrapers.rate_limit import rate_limiter
+from scrapers.circuit_breaker import circuit_breakers
+
+# Responses meaning the site is blocking or failing us, as opposed to a missing page
+FAILURE_STATUSES = {403, 429}
+
+class BaseScraper:
+    """
+    Interface every platform scraper implements, plus what it declares
+    about itself so the app can schedule it without knowing the platform.
+
+    Subclasses set the class attributes below and implement
+    search_product(); registering the class with the scraper registry is
+    all it takes for searches, reviews and the dashboard to use it.
+    """
+
+    # Registry key, also the platform name stored with products and reviews
+    name = None
+    display_name = None
+    # Storefront host the per-host rate limit applies to
+    host = None
+    # Series color in the price history chart
+    color = 'rgba(128, 128, 128, 0.7)'
+    # Whether get_product_reviews() scrapes real reviews
+    supports_reviews = True
+    # Requests per second allowed to the host (None for no limit)
+    rate_limit = None
+    # Seconds allowed for each HTTP request, further capped by the request deadline
+    timeout = 10
+    # Concurrent scrapes (or review fetches) allowed; None uses the app-wide default
+    concurrency = None
+    # Platform whose products this one's fallback results are built from, if any
+    fallback_from = None
+    # Module-level parse functions by page kind ('search', 'product', 'reviews'), so
+    # tools like the parser benchmark can run the extraction on stored pages
+    parsers = {}
+
+    @classmethod
+    def page_kind(cls, url):
+        """Which of `parsers` reads a page fetched from url"""
+        return 'search'
+
+    @staticmethod
+    def _path(url):
+        return urlsplit(url).path
+
+    def search_product(self, query, deadline=None):
+        """Products found for query; raises ScrapeError if the site could not be scraped"""
+        raise NotImplementedError
+
+    def search_live(self, query, deadline=None):
+        """
+        Search without any built-in fallback data, so an empty list always
+        means the platform had no results. Scrapers that fall back to
+        placeholder products inside search_product() override this.
+        """
+        return self.search_product(query, deadline=deadline)
+
+    def get_product_reviews(self, product_url, deadline=None):
+        """Review summary for a product page, or None if the platform has none"""
+        return None
+
+    def fallback_products(self, query, reference_products=None):
+        """
+        Placeholder products for when a search found nothing, or None to
+        use the app's generic dummy data. reference_products are the
+        products of the `fallback_from` platform, when it has one.
+        """
+        return None
+
+    def fetch(self, url, deadline=None, **kwargs):
+        """
+        GET url over the shared connection pool, within the host's rate
+        limit and the deadline. The outcome and latency feed the platform's
+        circuit breaker, except for requests the deadline ended or cut short
+        and replayed requests that were never recorded.
+        """
+        deadline = deadline or Deadline.unbounded()
+        # Wait only if the host's request rate would otherwise be exceeded
+        rate_limiter.acquire(url, deadline)
+        timeout = deadline.timeout(self.timeout)
+        started = time.monotonic()
+        try:
+            response = http_client.get(url, timeout=timeout, deadline=deadline, **kwargs)
+        except (DeadlineExceeded, FixtureNotFound):
+            # A page missing from a partly recorded replay store says nothing about the platform
+            raise
+        except requests.Timeout:
+            # Cut short by the caller's deadline rather than the platform's own
+            # timeout, which says nothing about the platform's health
+            if timeout >= self.timeout:
+                circuit_breakers.record(self.name, True, time.monotonic() - started)
+            raise
+        except Exception:
+            circuit_breakers.record(self.name, True, time.monotonic() - started)
+            raise
+        failed = response.status_code >= 500 or response.status_code in FAILURE_STATUSES
+        circuit_breakers.record(self.name, failed, time.monotonic() - started)
+        return response
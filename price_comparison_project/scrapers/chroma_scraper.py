@@ -1,24 +1,154 @@
-import requests
-from bs4 import BeautifulSoup
 import json
 import random
 import logging
 from datetime import datetime
 import os
+from deadline import Deadline, DeadlineExceeded
+from scrapers.errors import ScrapeError
+from scrapers.base import BaseScraper
+from scrapers.registry import registry
+from scrapers.parsing import containers, parse_html
+from scrapers.debug_capture import debug_capture
+from scrapers.parse_pool import parse_pool
 
 logger = logging.getLogger(__name__)
 
-class ChromaProductScraper:
+BASE_URL = "https://www.croma.com"
+
+# Parts of each page the scraper reads; nothing else is built into the tree
+SEARCH_RESULTS = containers({'class': 'product-item'})
+REVIEWS = containers({'class': 'review-section'})
+
+def parse_search_results(content):
+    """Extract up to 5 products from a search results page"""
+    soup = parse_html(content, SEARCH_RESULTS)
+
+    # Extract products from search results
+    products = []
+    product_cards = soup.select('.product-item')
+
+    for card in product_cards[:5]:  # Get top 5 results
+        try:
+            # Extract product details
+            name_elem = card.select_one('.product-title')
+            price_elem = card.select_one('.pdpPrice')
+            url_elem = card.select_one('a.product-title')
+            image_elem = card.select_one('img.product-img')
+            rating_elem = card.select_one('.rating-count')
+
+            if not name_elem or not url_elem:
+                continue
+
+            name = name_elem.text.strip()
+
+            url = url_elem.get('href', '')
+            if url and not url.startswith('http'):
+                url = BASE_URL + url
+
+            price = "N/A"
+            if price_elem:
+                price_text = price_elem.text.strip()
+                # Extract numeric part of the price
+                import re
+                price_match = re.search(r'[\d,.]+', price_text)
+                if price_match:
+                    price = price_match.group().replace(',', '')
+
+            image_url = image_elem.get('src', '') if image_elem else ''
+
+            rating = "N/A"
+            if rating_elem:
+                rating_text = rating_elem.text.strip()
+                rating_match = re.search(r'[\d.]+', rating_text)
+                if rating_match:
+                    rating = rating_match.group()
+
+            products.append({
+                'name': name,
+                'price': price,
+                'url': url,
+                'rating': rating,
+                'image_url': image_url
+            })
+
+        except Exception as e:
+            logger.error(f"Error extracting Croma product: {str(e)}")
+            continue
+
+    return products
+
+def parse_reviews(content):
+    """Count reviews by rating on a product page, or None if it has none"""
+    soup = parse_html(content, REVIEWS)
+
+    # Try to extract review data
+    # This is a simplified approach - actual implementation would need to adapt to Croma's structure
+    review_section = soup.select_one('.review-section')
+    if not review_section:
+        return None
+
+    # Try to find positive, neutral, and negative reviews
+    # This is approximate since Croma might not categorize reviews this way
+    all_reviews = review_section.select('.review-item')
+    total_reviews = len(all_reviews)
+
+    if total_reviews == 0:
+        return None
+
+    # Count reviews by rating
+    positive = 0
+    neutral = 0
+    negative = 0
+
+    for review in all_reviews:
+        rating_elem = review.select_one('.rating-value')
+        if rating_elem:
+            try:
+                rating = float(rating_elem.text.strip())
+                if rating >= 4:
+                    positive += 1
+                elif rating >= 3:
+                    neutral += 1
+                else:
+                    negative += 1
+            except:
+                # If can't parse rating, consider it neutral
+                neutral += 1
+        else:
+            # If no rating element, consider it neutral
+            neutral += 1
+
+    return {
+        'positive': positive,
+        'neutral': neutral,
+        'negative': negative,
+        'total_reviews': total_reviews
+    }
+
+@registry.register
+class ChromaProductScraper(BaseScraper):
+    name = 'croma'
+    display_name = 'Croma'
+    host = 'www.croma.com'
+    color = 'rgba(17, 151, 68, 0.7)'
+    # Reviews are read straight off the product page
+    parsers = {'search': parse_search_results, 'reviews': parse_reviews}
+
+    @classmethod
+    def page_kind(cls, url):
+        return 'search' if cls._path(url).startswith('/search') else 'reviews'
+
     def __init__(self):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept-Language': 'en-US,en;q=0.9',
         }
-        self.base_url = "https://www.croma.com"
+        self.base_url = BASE_URL
         self.search_url = "https://www.croma.com/search/?text="
     
-    def search_product(self, query):
+    def search_product(self, query, deadline=None):
         """Search for products on Croma"""
+        deadline = deadline or Deadline.unbounded()
         try:
             # Format query for URL
             search_query = query.replace(' ', '%20')
@@ -26,128 +156,53 @@ class ChromaProductScraper:
             
             logger.info(f"Searching Croma for: {query} at URL: {search_url}")
             
-            response = requests.get(search_url, headers=self.headers, timeout=10)
+            response = self.fetch(search_url, deadline, headers=self.headers)
             if response.status_code != 200:
                 logger.error(f"Failed to get Croma search results. Status code: {response.status_code}")
-                return []
+                debug_capture.record('croma', search_url, response, failed=True, reason=f"HTTP {response.status_code}")
+                raise ScrapeError('croma', f"HTTP {response.status_code}", response.status_code)
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Extract products from search results
-            products = []
-            product_cards = soup.select('.product-item')
-            
-            for card in product_cards[:5]:  # Get top 5 results
-                try:
-                    # Extract product details
-                    name_elem = card.select_one('.product-title')
-                    price_elem = card.select_one('.pdpPrice')
-                    url_elem = card.select_one('a.product-title')
-                    image_elem = card.select_one('img.product-img')
-                    rating_elem = card.select_one('.rating-count')
-                    
-                    if not name_elem or not url_elem:
-                        continue
-                    
-                    name = name_elem.text.strip()
-                    
-                    url = url_elem.get('href', '')
-                    if url and not url.startswith('http'):
-                        url = self.base_url + url
-                    
-                    price = "N/A"
-                    if price_elem:
-                        price_text = price_elem.text.strip()
-                        # Extract numeric part of the price
-                        import re
-                        price_match = re.search(r'[\d,.]+', price_text)
-                        if price_match:
-                            price = price_match.group().replace(',', '')
-                    
-                    image_url = image_elem.get('src', '') if image_elem else ''
-                    
-                    rating = "N/A"
-                    if rating_elem:
-                        rating_text = rating_elem.text.strip()
-                        rating_match = re.search(r'[\d.]+', rating_text)
-                        if rating_match:
-                            rating = rating_match.group()
-                    
-                    products.append({
-                        'name': name,
-                        'price': price,
-                        'url': url,
-                        'rating': rating,
-                        'image_url': image_url
-                    })
-                    
-                except Exception as e:
-                    logger.error(f"Error extracting Croma product: {str(e)}")
-                    continue
+            products = parse_pool.run(parse_search_results, response.content, deadline)
             
             logger.info(f"Found {len(products)} products on Croma")
+            # Keep the page for debugging if nothing could be parsed (or if sampled)
+            debug_capture.record('croma', search_url, response, failed=not products, reason=None if products else 'no products parsed')
             return products
             
+        except DeadlineExceeded:
+            logger.warning("Croma search stopped: request deadline exceeded")
+            raise
+        except ScrapeError:
+            raise
         except Exception as e:
+            # A request cut short by the deadline is not a scraping failure
+            deadline.check()
             logger.error(f"Error in Croma search: {str(e)}")
-            return []
+            raise ScrapeError('croma', str(e)) from e
     
-    def get_product_reviews(self, product_url):
+    def get_product_reviews(self, product_url, deadline=None):
         """Get product reviews from Croma"""
+        deadline = deadline or Deadline.unbounded()
         try:
-            response = requests.get(product_url, headers=self.headers, timeout=10)
+            response = self.fetch(product_url, deadline, headers=self.headers)
             if response.status_code != 200:
                 logger.error(f"Failed to get Croma product page. Status code: {response.status_code}")
                 return self._get_dummy_reviews()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Try to extract review data
-            # This is a simplified approach - actual implementation would need to adapt to Croma's structure
-            review_section = soup.select_one('.review-section')
-            if not review_section:
-                return self._get_dummy_reviews()
-            
-            # Try to find positive, neutral, and negative reviews
-            # This is approximate since Croma might not categorize reviews this way
-            all_reviews = review_section.select('.review-item')
-            total_reviews = len(all_reviews)
-            
-            if total_reviews == 0:
+            counts = parse_pool.run(parse_reviews, response.content, deadline)
+            if not counts:
                 return self._get_dummy_reviews()
             
-            # Count reviews by rating
-            positive = 0
-            neutral = 0
-            negative = 0
-            
-            for review in all_reviews:
-                rating_elem = review.select_one('.rating-value')
-                if rating_elem:
-                    try:
-                        rating = float(rating_elem.text.strip())
-                        if rating >= 4:
-                            positive += 1
-                        elif rating >= 3:
-                            neutral += 1
-                        else:
-                            negative += 1
-                    except:
-                        # If can't parse rating, consider it neutral
-                        neutral += 1
-                else:
-                    # If no rating element, consider it neutral
-                    neutral += 1
-            
             return {
-                'positive': positive,
-                'neutral': neutral,
-                'negative': negative,
-                'total_reviews': total_reviews,
-                'reliability_score': self._calculate_reliability_score(positive, neutral, negative),
+                **counts,
+                'reliability_score': self._calculate_reliability_score(counts['positive'], counts['neutral'], counts['negative']),
                 'is_real_data': True
             }
+        except DeadlineExceeded:
+            logger.warning("Croma reviews stopped: request deadline exceeded")
+            raise
         except Exception as e:
+            deadline.check()
             logger.error(f"Error getting Croma reviews: {str(e)}")
             return self._get_dummy_reviews()
     
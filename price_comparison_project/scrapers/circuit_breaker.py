@@ -0,0 +1,166 @@
+import time
+import logging
+import threading
+import collections
+
+from scrapers.errors import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitBreaker:
+    """
+    Health of one platform, from the outcome and latency of its requests.
+
+    Closed: requests go through, and each outcome is kept for `window`
+    seconds. Once there are at least `min_calls` of them and either the
+    share that failed reaches `failure_rate` or the share slower than
+    `slow_call_seconds` reaches `slow_call_rate`, the breaker opens.
+
+    Open: allow() refuses, so callers serve fallbacks at once instead of
+    waiting on a site that is blocking us. After `open_seconds` it goes
+    half-open.
+
+    Half-open: a single probe is let through. If it succeeds quickly the
+    breaker closes with a clean window; otherwise it opens again. A probe
+    whose outcome is never recorded is replaced after `open_seconds`.
+    """
+
+    def __init__(self, name, window=60, min_calls=5, failure_rate=0.5,
+                 slow_call_seconds=8, slow_call_rate=0.8, open_seconds=30):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._calls = collections.deque()
+        self._opened_at = None
+        self._probe_started = None
+        self._lock = threading.Lock()
+        self._stats = {'opened': 0, 'rejected': 0, 'probes': 0}
+
+    def allow(self):
+        """Whether a request may go to the platform now"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN and now - self._opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+                self._probe_started = None
+                logger.info(f"Circuit for {self.name} is half-open, probing")
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and (self._probe_started is None
+                                            or now - self._probe_started >= self.open_seconds):
+                self._probe_started = now
+                self._stats['probes'] += 1
+                return True
+            self._stats['rejected'] += 1
+            return False
+
+    def check(self):
+        """Raise CircuitOpenError unless a request may go to the platform now"""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_in())
+
+    def retry_in(self):
+        """Seconds until the next probe is allowed, or None while closed"""
+        with self._lock:
+            if self.state == CLOSED:
+                return None
+            started = self._opened_at if self.state == OPEN else self._probe_started
+            return max(0.0, started + self.open_seconds - time.monotonic()) if started else 0.0
+
+    def record(self, failed, duration):
+        """Record the outcome and latency of a request"""
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            now = time.monotonic()
+            if self.state == HALF_OPEN:
+                if failed or slow:
+                    self._open(now, 'probe failed' if failed else f"probe took {duration:.1f}s")
+                else:
+                    self.state = CLOSED
+                    self._calls.clear()
+                    logger.info(f"Circuit for {self.name} closed")
+                return
+
+            self._calls.append((now, failed, slow))
+            self._prune(now)
+            if self.state == CLOSED and len(self._calls) >= self.min_calls:
+                calls = len(self._calls)
+                failures = sum(1 for _, call_failed, _ in self._calls if call_failed)
+                slows = sum(1 for _, _, call_slow in self._calls if call_slow)
+                if failures / calls >= self.failure_rate:
+                    self._open(now, f"{failures}/{calls} requests failed")
+                elif slows / calls >= self.slow_call_rate:
+                    self._open(now, f"{slows}/{calls} requests took over {self.slow_call_seconds}s")
+
+    def _open(self, now, reason):
+        self.state = OPEN
+        self._opened_at = now
+        self._probe_started = None
+        self._stats['opened'] += 1
+        logger.warning(f"Circuit for {self.name} opened: {reason}")
+
+    def _prune(self, now):
+        while self._calls and now - self._calls[0][0] > self.window:
+            self._calls.popleft()
+
+    def stats(self):
+        with self._lock:
+            self._prune(time.monotonic())
+            calls = len(self._calls)
+            failures = sum(1 for _, failed, _ in self._calls if failed)
+            slows = sum(1 for _, _, slow in self._calls if slow)
+            stats = dict(self._stats, state=self.state, calls=calls,
+                         failure_rate=round(failures / calls, 3) if calls else None,
+                         slow_call_rate=round(slows / calls, 3) if calls else None)
+        retry_in = self.retry_in()
+        stats['retry_in'] = None if retry_in is None else round(retry_in, 1)
+        return stats
+
+class CircuitBreakers:
+    """One CircuitBreaker per platform, created on first use with the shared settings"""
+
+    def __init__(self, enabled=True, **settings):
+        self.enabled = enabled
+        self.settings = settings
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def configure(self, enabled=True, **settings):
+        """Replace the settings; existing breakers start over, closed"""
+        with self._lock:
+            self.enabled = enabled
+            self.settings = settings
+            self._breakers = {}
+
+    def get(self, platform):
+        with self._lock:
+            breaker = self._breakers.get(platform)
+            if breaker is None:
+                breaker = self._breakers[platform] = CircuitBreaker(platform, **self.settings)
+            return breaker
+
+    def check(self, platform):
+        """Raise CircuitOpenError if the platform's circuit is open"""
+        if self.enabled:
+            self.get(platform).check()
+
+    def record(self, platform, failed, duration):
+        if self.enabled:
+            self.get(platform).record(failed, duration)
+
+    def stats(self):
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {platform: breaker.stats() for platform, breaker in breakers.items()}
+
+# Shared by every scraper; tuned from the app config with circuit_breakers.configure()
+circuit_breakers = CircuitBreakers()
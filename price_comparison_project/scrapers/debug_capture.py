@@ -0,0 +1,149 @@
+import os
+import re
+import json
+import time
+import random
+import logging
+import tempfile
+import threading
+import itertools
+
+logger = logging.getLogger(__name__)
+
+_ID_PATTERN = re.compile(r'^[0-9]+-[0-9]+-[a-z]+$')
+
+def _write_atomic(path, data):
+    """Write through a temp file so readers never see a partial capture"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+class DebugCapture:
+    """
+    Opt-in, bounded store of raw scraper responses for debugging selectors.
+
+    A response is kept when its parse failed (with `on_failure`) or, for
+    any response, with probability `sample_rate`. Each capture is the raw
+    body as received plus a JSON metadata file; once `max_captures` are
+    stored the oldest are deleted, so the directory works as a ring buffer.
+    Nothing is written while both options are off.
+    """
+
+    def __init__(self, directory=None, max_captures=50, sample_rate=0.0, on_failure=False):
+        self.directory = directory or os.path.join('data', 'debug_captures')
+        self.max_captures = max_captures
+        self.sample_rate = sample_rate
+        self.on_failure = on_failure
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def configure(self, directory=None, max_captures=None, sample_rate=None, on_failure=None):
+        if directory is not None:
+            self.directory = directory
+        if max_captures is not None:
+            self.max_captures = max_captures
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        if on_failure is not None:
+            self.on_failure = on_failure
+
+    @property
+    def enabled(self):
+        return self.max_captures > 0 and (self.on_failure or self.sample_rate > 0)
+
+    def record(self, platform, url, response, failed=False, reason=None):
+        """
+        Keep the response if it is selected for capture. Never raises, so a
+        full disk or bad directory cannot break a scrape.
+
+        Returns the capture id, or None if nothing was kept.
+        """
+        if not self.enabled:
+            return None
+        if not (failed and self.on_failure) and random.random() >= self.sample_rate:
+            return None
+        try:
+            return self._store(platform, url, response, failed, reason)
+        except Exception as e:
+            logger.error(f"Error saving debug capture for {platform}: {str(e)}")
+            return None
+
+    def _store(self, platform, url, response, failed, reason):
+        capture_id = f"{int(time.time() * 1000)}-{next(self._sequence)}-{platform}"
+        metadata = {
+            'id': capture_id,
+            'platform': platform,
+            'url': url,
+            'status_code': response.status_code,
+            'content_type': response.headers.get('Content-Type'),
+            'size': len(response.content),
+            'failed': failed,
+            'reason': reason,
+            'captured_at': time.time()
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        _write_atomic(os.path.join(self.directory, f"{capture_id}.body"), response.content)
+        # The metadata goes last: a capture is listed only once its body is complete
+        _write_atomic(os.path.join(self.directory, f"{capture_id}.json"), json.dumps(metadata).encode('utf-8'))
+        self._prune()
+        logger.info(f"Saved debug capture {capture_id} ({reason or 'sampled'})")
+        return capture_id
+
+    def _prune(self):
+        """Delete the oldest captures beyond max_captures"""
+        with self._lock:
+            ids = self._ids()
+            for capture_id in ids[:-self.max_captures]:
+                for suffix in ('.json', '.body'):
+                    try:
+                        os.remove(os.path.join(self.directory, capture_id + suffix))
+                    except FileNotFoundError:
+                        pass
+
+    def _ids(self):
+        """Stored capture ids, oldest first"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        ids = [name[:-len('.json')] for name in names if name.endswith('.json')]
+        return sorted(ids, key=lambda capture_id: tuple(int(part) for part in capture_id.split('-')[:2]))
+
+    def list(self):
+        """Metadata of every stored capture, newest first"""
+        captures = []
+        for capture_id in reversed(self._ids()):
+            try:
+                with open(os.path.join(self.directory, f"{capture_id}.json")) as f:
+                    captures.append(json.load(f))
+            except (OSError, ValueError):
+                # Pruned or still being written by another process
+                continue
+        return captures
+
+    def body_path(self, capture_id):
+        """Path of a capture's raw body, or None for an unknown or malformed id"""
+        if not _ID_PATTERN.match(capture_id):
+            return None
+        path = os.path.join(self.directory, f"{capture_id}.body")
+        return path if os.path.exists(path) else None
+
+    def metadata(self, capture_id):
+        if not _ID_PATTERN.match(capture_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{capture_id}.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+# Shared by every scraper; enabled from the app config with debug_capture.configure()
+debug_capture = DebugCapture()
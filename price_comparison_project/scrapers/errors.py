@@ -0,0 +1,23 @@
+class ScrapeError(Exception):
+    """Raised when a platform could not be scraped, as opposed to returning no results"""
+
+    def __init__(self, platform, message, status_code=None):
+        super().__init__(f"{platform}: {message}")
+        self.platform = platform
+        self.status_code = status_code
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of scraping a platform whose circuit breaker is open.
+
+    Deliberately not a ScrapeError: nothing was attempted, so it must not
+    be cached as a failed scrape.
+    """
+
+    def __init__(self, platform, retry_in=None):
+        message = f"{platform}: circuit open"
+        if retry_in is not None:
+            message += f", next probe in {retry_in:.0f}s"
+        super().__init__(message)
+        self.platform = platform
+        self.retry_in = retry_in
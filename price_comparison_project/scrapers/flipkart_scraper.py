@@ -1,13 +1,246 @@
-import requests
-from bs4 import BeautifulSoup
 import json
-import time
 import random
 import os
 import re
 from datetime import datetime
+from deadline import Deadline, DeadlineExceeded
+from scrapers.errors import ScrapeError
+from scrapers.base import BaseScraper
+from scrapers.registry import registry
+from scrapers.parsing import containers, parse_html
+from scrapers.debug_capture import debug_capture
+from scrapers.parse_pool import parse_pool
+
+# Parts of each page the scraper reads; nothing else is built into the tree
+SEARCH_RESULTS = containers({'class': '_1AtVbE'}, {'class': '_1YokD2'})
+REVIEWS = containers({'class': '_16PBlm'}, {'class': '_2d4LTz'}, {'class': '_2_R_DZ'})
+
+def parse_search_results(content):
+    """Extract up to 10 distinct products from a search results page"""
+    soup = parse_html(content, SEARCH_RESULTS)
+
+    products = []
+
+    # Try to find product containers - Flipkart has multiple possible layouts
+    product_containers = soup.select('._1AtVbE._3yNVYA, ._1AtVbE._2GoDe3, ._1YokD2._3Mn1Gg')
+
+    if not product_containers:
+        # Try alternative selector for product grid
+        product_containers = soup.select('._1YokD2._2GoDe3 ._1AtVbE')
+        print(f"Using alternative selector, found {len(product_containers)} containers")
+
+    product_count = 0
+    processed_products = set()  # To avoid duplicates
+
+    for container in product_containers:
+        if product_count >= 10:  # Limit to first 10 results
+            break
+
+        # Try to find product cards within containers
+        product_cards = container.select('._1xHGtK._373qXS, ._4ddWXP, ._2kHMtA')
+
+        if not product_cards:
+            product_cards = [container]  # The container itself might be a product card
+
+        for card in product_cards:
+            product = {}
+
+            # Try multiple selectors for product name
+            title_element = card.select_one('._4rR01T, .s1Q9rs, ._2WkVRV')
+            if not title_element:
+                title_element = card.select_one('a[title]')  # Try getting from title attribute
+                if title_element:
+                    product['name'] = title_element.get('title', '').strip()
+            else:
+                product['name'] = title_element.text.strip()
+
+            # Try multiple selectors for price
+            price_element = card.select_one('._30jeq3, ._30jeq3._1_WHN1')
+            if price_element:
+                price_text = price_element.text.replace('₹', '').replace(',', '').strip()
+                try:
+                    # Extract only digits and decimal point
+                    price_text = ''.join(c for c in price_text if c.isdigit() or c == '.')
+                    product['price'] = price_text
+                except:
+                    continue
+
+            # Try to extract URL
+            link_element = card.select_one('a._1fQZEK, a.s1Q9rs, a._2rpwqI, a._3bPFwb')
+            if not link_element:
+                link_element = card.select_one('a')  # Try any anchor tag
+
+            if link_element and link_element.get('href'):
+                href = link_element.get('href')
+
+                # Extract product ID if possible
+                product_id_match = re.search(r'/([a-z0-9]{16})/p/', href)
+                if product_id_match:
+                    product_id = product_id_match.group(1)
+                    # Store both the product ID and the full URL
+                    product['product_id'] = product_id
+
+                if href.startswith('/'):
+                    product['url'] = 'https://www.flipkart.com' + href
+                else:
+                    product['url'] = href
+
+                # Extract search parameters for better fallback URLs
+                if 'name' in product:
+                    product_name = product['name']
+                    # Create a search-friendly version of the product name
+                    search_name = product_name.replace(' ', '+')
+                    product['search_url'] = f'https://www.flipkart.com/search?q={search_name}'
+
+            # Try to extract rating
+            rating_element = card.select_one('._3LWZlK, ._1lRcqv')
+            if rating_element:
+                product['rating'] = rating_element.text.strip()
+
+            # Try to extract image URL
+            img_element = card.select_one('img._396cs4, img._2r_T1I')
+            if img_element and img_element.get('src'):
+                product['image_url'] = img_element.get('src')
+
+            # Check if we have enough information and it's not a duplicate
+            if ('name' in product and 'price' in product and 'url' in product and 
+                product['name'] not in processed_products):
+                products.append(product)
+                processed_products.add(product['name'])
+                product_count += 1
+                print(f"Found product: {product['name'][:30]}... - ₹{product['price']}")
+
+    return products
+
+def parse_reviews(content):
+    """
+    Review summary from a product page: counted from the individual reviews
+    if there are any, otherwise derived from the overall rating. None if
+    the page has neither.
+    """
+    soup = parse_html(content, REVIEWS)
+
+    # Find review section
+    review_elements = soup.select('div._16PBlm')
+
+    positive = 0
+    neutral = 0
+    negative = 0
+
+    if review_elements:
+        print(f"Found {len(review_elements)} review elements")
+        for review in review_elements[:20]:  # Limit to 20 reviews
+            # Extract rating
+            rating_element = review.select_one('div._3LWZlK')
+
+            if rating_element:
+                try:
+                    rating = float(rating_element.text)
+                    print(f"Found rating: {rating}")
+                    if rating >= 4:
+                        positive += 1
+                    elif rating >= 3:
+                        neutral += 1
+                    else:
+                        negative += 1
+                except Exception as e:
+                    print(f"Error parsing rating: {str(e)}")
+                    neutral += 1
+
+        total = positive + neutral + negative
+
+        if total > 0:
+            # Calculate reliability score based on reviews
+            reliability_score = (positive * 100 + neutral * 50) / (total * 100) * 100
+            reliability_score = min(100, max(0, reliability_score))
+
+            print(f"Calculated reliability score: {reliability_score} from {positive} positive, {neutral} neutral, {negative} negative reviews")
+
+            return {
+                'positive': positive,
+                'neutral': neutral,
+                'negative': negative,
+                'total_reviews': total,
+                'reliability_score': round(reliability_score),
+                'is_real_data': True
+            }
+
+    # If we couldn't extract individual reviews, try to get the overall rating
+    rating_element = soup.select_one('div._2d4LTz')
+    if rating_element:
+        try:
+            rating = float(rating_element.text)
+            print(f"Found overall rating: {rating}")
+
+            # Try to find the total number of ratings
+            ratings_count_element = soup.select_one('span._2_R_DZ')
+            total_reviews = 30  # Default fallback
+
+            if ratings_count_element:
+                count_text = ratings_count_element.text
+                count_match = re.search(r'(\d+(?:,\d+)*)', count_text)
+                if count_match:
+                    total_reviews = int(count_match.group(1).replace(',', ''))
+                    total_reviews = min(100, total_reviews)  # Cap at 100 for calculation
+
+            # Generate review distribution based on overall rating
+            if rating >= 4.5:
+                positive = int(total_reviews * 0.8)
+                neutral = int(total_reviews * 0.15)
+                negative = total_reviews - positive - neutral
+            elif rating >= 4.0:
+                positive = int(total_reviews * 0.7)
+                neutral = int(total_reviews * 0.2)
+                negative = total_reviews - positive - neutral
+            elif rating >= 3.5:
+                positive = int(total_reviews * 0.6)
+                neutral = int(total_reviews * 0.25)
+                negative = total_reviews - positive - neutral
+            elif rating >= 3.0:
+                positive = int(total_reviews * 0.5)
+                neutral = int(total_reviews * 0.3)
+                negative = total_reviews - positive - neutral
+            else:
+                positive = int(total_reviews * 0.3)
+                neutral = int(total_reviews * 0.3)
+                negative = total_reviews - positive - neutral
+
+            reliability_score = (positive * 100 + neutral * 50) / (total_reviews * 100) * 100
+
+            print(f"Generated review distribution based on overall rating {rating}: {positive} positive, {neutral} neutral, {negative} negative")
+            print(f"Calculated reliability score: {reliability_score}")
+
+            return {
+                'positive': positive,
+                'neutral': neutral,
+                'negative': negative,
+                'total_reviews': total_reviews,
+                'reliability_score': round(reliability_score),
+                'note': 'Based on overall rating',
+                'is_real_data': True
+            }
+        except Exception as e:
+            print(f"Error processing overall rating: {str(e)}")
+
+    return None
+
+@registry.register
+class ImprovedFlipkartScraper(BaseScraper):
+    name = 'flipkart'
+    display_name = 'Flipkart'
+    host = 'www.flipkart.com'
+    color = 'rgba(40, 116, 240, 0.7)'
+    rate_limit = 0.5
+    timeout = 15
+    # Placeholder results are modelled on Amazon's products for the same query
+    fallback_from = 'amazon'
+    # Reviews are read straight off the product page
+    parsers = {'search': parse_search_results, 'reviews': parse_reviews}
+
+    @classmethod
+    def page_kind(cls, url):
+        return 'search' if cls._path(url).startswith('/search') else 'reviews'
 
-class ImprovedFlipkartScraper:
     def __init__(self):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0.4664.110 Safari/537.36',
@@ -20,135 +253,71 @@ class ImprovedFlipkartScraper:
             'Referer': 'https://www.google.com/'
         }
     
-    def search_product(self, query, amazon_products=None):
+    def search_product(self, query, amazon_products=None, fallback=True, deadline=None):
+        """
+        Search Flipkart for a query.
+        
+        When nothing can be scraped, realistic dummy products are returned
+        unless fallback is False. In that case the caller builds its own
+        fallback: an empty list means Flipkart had no results, and a
+        ScrapeError means the page could not be fetched.
+        """
         print(f"Searching Flipkart for: {query}")
+        deadline = deadline or Deadline.unbounded()
         search_query = query.replace(' ', '+')
         url = f'https://www.flipkart.com/search?q={search_query}&otracker=search&otracker1=search&marketplace=FLIPKART'
         
         try:
-            # Add delay to avoid rate limiting
-            time.sleep(2 + random.random() * 3)
-            
-            # Use session to maintain cookies
-            session = requests.Session()
-            
-            # Make the request with headers
-            response = session.get(url, headers=self.headers, timeout=15)
+            # Make the request with headers, within Flipkart's rate limit
+            response = self.fetch(url, deadline, headers=self.headers)
             
             print(f"Flipkart response status: {response.status_code}")
             
             if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # For debugging - save the HTML to a file
-                with open('flipkart_debug.html', 'w', encoding='utf-8') as f:
-                    f.write(soup.prettify())
-                
-                products = []
-                
-                # Try to find product containers - Flipkart has multiple possible layouts
-                product_containers = soup.select('._1AtVbE._3yNVYA, ._1AtVbE._2GoDe3, ._1YokD2._3Mn1Gg')
-                
-                if not product_containers:
-                    # Try alternative selector for product grid
-                    product_containers = soup.select('._1YokD2._2GoDe3 ._1AtVbE')
-                    print(f"Using alternative selector, found {len(product_containers)} containers")
-                
-                product_count = 0
-                processed_products = set()  # To avoid duplicates
-                
-                for container in product_containers:
-                    if product_count >= 10:  # Limit to first 10 results
-                        break
-                    
-                    # Try to find product cards within containers
-                    product_cards = container.select('._1xHGtK._373qXS, ._4ddWXP, ._2kHMtA')
-                    
-                    if not product_cards:
-                        product_cards = [container]  # The container itself might be a product card
-                    
-                    for card in product_cards:
-                        product = {}
-                        
-                        # Try multiple selectors for product name
-                        title_element = card.select_one('._4rR01T, .s1Q9rs, ._2WkVRV')
-                        if not title_element:
-                            title_element = card.select_one('a[title]')  # Try getting from title attribute
-                            if title_element:
-                                product['name'] = title_element.get('title', '').strip()
-                        else:
-                            product['name'] = title_element.text.strip()
-                        
-                        # Try multiple selectors for price
-                        price_element = card.select_one('._30jeq3, ._30jeq3._1_WHN1')
-                        if price_element:
-                            price_text = price_element.text.replace('₹', '').replace(',', '').strip()
-                            try:
-                                # Extract only digits and decimal point
-                                price_text = ''.join(c for c in price_text if c.isdigit() or c == '.')
-                                product['price'] = price_text
-                            except:
-                                continue
-                        
-                        # Try to extract URL
-                        link_element = card.select_one('a._1fQZEK, a.s1Q9rs, a._2rpwqI, a._3bPFwb')
-                        if not link_element:
-                            link_element = card.select_one('a')  # Try any anchor tag
-                        
-                        if link_element and link_element.get('href'):
-                            href = link_element.get('href')
-                            
-                            # Extract product ID if possible
-                            product_id_match = re.search(r'/([a-z0-9]{16})/p/', href)
-                            if product_id_match:
-                                product_id = product_id_match.group(1)
-                                # Store both the product ID and the full URL
-                                product['product_id'] = product_id
-                                
-                            if href.startswith('/'):
-                                product['url'] = 'https://www.flipkart.com' + href
-                            else:
-                                product['url'] = href
-                                
-                            # Extract search parameters for better fallback URLs
-                            if 'name' in product:
-                                product_name = product['name']
-                                # Create a search-friendly version of the product name
-                                search_name = product_name.replace(' ', '+')
-                                product['search_url'] = f'https://www.flipkart.com/search?q={search_name}'
-                        
-                        # Try to extract rating
-                        rating_element = card.select_one('._3LWZlK, ._1lRcqv')
-                        if rating_element:
-                            product['rating'] = rating_element.text.strip()
-                        
-                        # Try to extract image URL
-                        img_element = card.select_one('img._396cs4, img._2r_T1I')
-                        if img_element and img_element.get('src'):
-                            product['image_url'] = img_element.get('src')
-                        
-                        # Check if we have enough information and it's not a duplicate
-                        if ('name' in product and 'price' in product and 'url' in product and 
-                            product['name'] not in processed_products):
-                            products.append(product)
-                            processed_products.add(product['name'])
-                            product_count += 1
-                            print(f"Found product: {product['name'][:30]}... - ₹{product['price']}")
+                products = parse_pool.run(parse_search_results, response.content, deadline)
                 
+                # Keep the page for debugging if nothing could be parsed (or if sampled)
+                debug_capture.record('flipkart', url, response, failed=not products, reason=None if products else 'no products parsed')
                 if products:
                     return products
                 else:
                     print("No products found on Flipkart using HTML parsing")
-                    return self.create_realistic_dummy_products(query, amazon_products)
+                    return self._fallback_products(query, amazon_products, fallback)
             else:
                 print(f"Failed to fetch data from Flipkart: {response.status_code}")
                 print(f"Response content: {response.text[:200]}...")  # Print first 200 chars
-                return self.create_realistic_dummy_products(query, amazon_products)
+                debug_capture.record('flipkart', url, response, failed=True, reason=f"HTTP {response.status_code}")
+                if not fallback:
+                    raise ScrapeError('flipkart', f"HTTP {response.status_code}", response.status_code)
+                return self._fallback_products(query, amazon_products, fallback)
+        except DeadlineExceeded:
+            print("Flipkart search stopped: request deadline exceeded")
+            raise
+        except ScrapeError:
+            raise
         except Exception as e:
+            # A request cut short by the deadline is not a scraping failure
+            deadline.check()
             print(f"Error during Flipkart scraping: {str(e)}")
             import traceback
             traceback.print_exc()
-            return self.create_realistic_dummy_products(query, amazon_products)
+            if not fallback:
+                raise ScrapeError('flipkart', str(e)) from e
+            return self._fallback_products(query, amazon_products, fallback)
+    
+    def _fallback_products(self, query, amazon_products, fallback):
+        """Return dummy products, or nothing if the caller handles fallbacks itself"""
+        if not fallback:
+            return []
+        return self.create_realistic_dummy_products(query, amazon_products)
+    
+    def search_live(self, query, deadline=None):
+        # The Amazon-based fallback is built by the search pipeline, so a
+        # live Flipkart scrape never has to wait for Amazon
+        return self.search_product(query, fallback=False, deadline=deadline)
+    
+    def fallback_products(self, query, reference_products=None):
+        return self.create_realistic_dummy_products(query, reference_products)
     
     def create_realistic_dummy_products(self, query, amazon_products=None):
         """Create more realistic dummy products based on Amazon products if available"""
@@ -245,134 +414,31 @@ class ImprovedFlipkartScraper:
         except Exception as e:
             print(f"Error saving price history: {str(e)}")
 
-    def get_product_reviews(self, product_url):
+    def get_product_reviews(self, product_url, deadline=None):
         """Get product reviews from Flipkart"""
         print(f"Getting reviews for Flipkart product: {product_url}")
+        deadline = deadline or Deadline.unbounded()
         
         try:
-            # Add delay to avoid rate limiting
-            time.sleep(2 + random.random() * 3)
-            
-            # Use session to maintain cookies
-            session = requests.Session()
-            
-            # Make the request with headers
-            response = session.get(product_url, headers=self.headers, timeout=15)
+            # Make the request with headers, within Flipkart's rate limit
+            response = self.fetch(product_url, deadline, headers=self.headers)
             
             if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # For debugging - save the HTML to a file
-                with open('flipkart_review_debug.html', 'w', encoding='utf-8') as f:
-                    f.write(soup.prettify())
-                
-                # Find review section
-                review_elements = soup.select('div._16PBlm')
-                
-                positive = 0
-                neutral = 0
-                negative = 0
-                
-                if review_elements:
-                    print(f"Found {len(review_elements)} review elements")
-                    for review in review_elements[:20]:  # Limit to 20 reviews
-                        # Extract rating
-                        rating_element = review.select_one('div._3LWZlK')
-                        
-                        if rating_element:
-                            try:
-                                rating = float(rating_element.text)
-                                print(f"Found rating: {rating}")
-                                if rating >= 4:
-                                    positive += 1
-                                elif rating >= 3:
-                                    neutral += 1
-                                else:
-                                    negative += 1
-                            except Exception as e:
-                                print(f"Error parsing rating: {str(e)}")
-                                neutral += 1
-                    
-                    total = positive + neutral + negative
-                    
-                    if total > 0:
-                        # Calculate reliability score based on reviews
-                        reliability_score = (positive * 100 + neutral * 50) / (total * 100) * 100
-                        reliability_score = min(100, max(0, reliability_score))
-                        
-                        print(f"Calculated reliability score: {reliability_score} from {positive} positive, {neutral} neutral, {negative} negative reviews")
-                        
-                        return {
-                            'positive': positive,
-                            'neutral': neutral,
-                            'negative': negative,
-                            'total_reviews': total,
-                            'reliability_score': round(reliability_score),
-                            'is_real_data': True
-                        }
-                
-                # If we couldn't extract individual reviews, try to get the overall rating
-                rating_element = soup.select_one('div._2d4LTz')
-                if rating_element:
-                    try:
-                        rating = float(rating_element.text)
-                        print(f"Found overall rating: {rating}")
-                        
-                        # Try to find the total number of ratings
-                        ratings_count_element = soup.select_one('span._2_R_DZ')
-                        total_reviews = 30  # Default fallback
-                        
-                        if ratings_count_element:
-                            count_text = ratings_count_element.text
-                            count_match = re.search(r'(\d+(?:,\d+)*)', count_text)
-                            if count_match:
-                                total_reviews = int(count_match.group(1).replace(',', ''))
-                                total_reviews = min(100, total_reviews)  # Cap at 100 for calculation
-                        
-                        # Generate review distribution based on overall rating
-                        if rating >= 4.5:
-                            positive = int(total_reviews * 0.8)
-                            neutral = int(total_reviews * 0.15)
-                            negative = total_reviews - positive - neutral
-                        elif rating >= 4.0:
-                            positive = int(total_reviews * 0.7)
-                            neutral = int(total_reviews * 0.2)
-                            negative = total_reviews - positive - neutral
-                        elif rating >= 3.5:
-                            positive = int(total_reviews * 0.6)
-                            neutral = int(total_reviews * 0.25)
-                            negative = total_reviews - positive - neutral
-                        elif rating >= 3.0:
-                            positive = int(total_reviews * 0.5)
-                            neutral = int(total_reviews * 0.3)
-                            negative = total_reviews - positive - neutral
-                        else:
-                            positive = int(total_reviews * 0.3)
-                            neutral = int(total_reviews * 0.3)
-                            negative = total_reviews - positive - neutral
-                        
-                        reliability_score = (positive * 100 + neutral * 50) / (total_reviews * 100) * 100
-                        
-                        print(f"Generated review distribution based on overall rating {rating}: {positive} positive, {neutral} neutral, {negative} negative")
-                        print(f"Calculated reliability score: {reliability_score}")
-                        
-                        return {
-                            'positive': positive,
-                            'neutral': neutral,
-                            'negative': negative,
-                            'total_reviews': total_reviews,
-                            'reliability_score': round(reliability_score),
-                            'note': 'Based on overall rating',
-                            'is_real_data': True
-                        }
-                    except Exception as e:
-                        print(f"Error processing overall rating: {str(e)}")
+                reviews = parse_pool.run(parse_reviews, response.content, deadline)
+                if reviews:
+                    return reviews
             
             # If we couldn't extract reviews or overall rating
             print("No reviews found, using minimal real data")
+            debug_capture.record('flipkart', product_url, response, failed=True,
+                                 reason='no reviews parsed' if response.status_code == 200 else f"HTTP {response.status_code}")
             return self._generate_minimal_real_data()
             
+        except DeadlineExceeded:
+            print("Flipkart reviews stopped: request deadline exceeded")
+            raise
         except Exception as e:
+            deadline.check()
             print(f"Error getting Flipkart reviews: {str(e)}")
             return self._generate_minimal_real_data()
         
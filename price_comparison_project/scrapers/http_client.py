@@ -0,0 +1,105 @@
+import threading
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from scrapers.transport import Transport
+
+class _NoStoredCookies(DefaultCookiePolicy):
+    """
+    Keep the shared session's cookie jar empty.
+
+    The session is shared by every request on every thread, so cookies set
+    for one scrape must not leak into another. Cookies a caller passes
+    explicitly, and the ones on each response, still work as usual.
+    """
+
+    def set_ok(self, cookie, request):
+        return False
+
+class HttpClient:
+    """
+    Long-lived HTTP client shared by all scrapers.
+
+    One requests.Session with keep-alive connection pools per host, so
+    repeat searches and review fetches reuse open TCP/TLS connections
+    instead of handshaking on every call. urllib3's pools are thread-safe;
+    up to `pool_maxsize` connections per host are kept open, and the pools
+    of the `pool_connections` most recently used hosts are kept around.
+    With `pool_block`, callers wait for a free connection instead of
+    opening (and then discarding) extra ones.
+
+    Every request goes through the client's Transport, which can record
+    responses to a fixture store or replay them instead of going live.
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=16, pool_block=False):
+        self._lock = threading.Lock()
+        self._session = None
+        self.transport = Transport()
+        self.configure(pool_connections, pool_maxsize, pool_block)
+
+    def configure(self, pool_connections=10, pool_maxsize=16, pool_block=False):
+        """Replace the connection pools with ones of the given sizes"""
+        session = requests.Session()
+        session.cookies.set_policy(_NoStoredCookies())
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                              pool_block=pool_block)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+        with self._lock:
+            previous = self._session
+            self._session = session
+            self.pool_connections = pool_connections
+            self.pool_maxsize = pool_maxsize
+            self.pool_block = pool_block
+        if previous is not None:
+            previous.close()
+
+    def use_transport(self, transport):
+        """Send every request through transport, e.g. Transport('replay', FixtureStore(path))"""
+        self.transport = transport
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault('allow_redirects', True)
+        return self.request('GET', url, **kwargs)
+
+    def request(self, method, url, deadline=None, **kwargs):
+        """Send a request; the deadline only bounds simulated waits, pass a timeout for live ones"""
+        return self.transport.send(self._session, method, url, deadline=deadline, **kwargs)
+
+    def close(self):
+        self._session.close()
+
+    def stats(self):
+        """Connections opened versus requests sent, per host"""
+        adapter = self._session.get_adapter('https://')
+        pools = adapter.poolmanager.pools
+        hosts = {}
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened = pool.num_connections
+            sent = pool.num_requests
+            hosts[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                'connections_opened': opened,
+                'requests': sent,
+                # The queue holds None for slots that have no open connection yet
+                'idle_connections': sum(1 for conn in list(pool.pool.queue) if conn is not None)
+                                    if pool.pool is not None else 0,
+                # Share of requests that went out on an already-open connection
+                'reuse_ratio': round(1 - opened / sent, 3) if sent else None
+            }
+        return {
+            'pool_connections': self.pool_connections,
+            'pool_maxsize': self.pool_maxsize,
+            'pool_block': self.pool_block,
+            'transport': self.transport.stats(),
+            'hosts': hosts
+        }
+
+# Shared by every scraper; resized from the app config with http_client.configure()
+http_client = HttpClient()
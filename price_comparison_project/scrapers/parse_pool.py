@@ -0,0 +1,130 @@
+import os
+import time
+import logging
+import threading
+import multiprocessing
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+
+from deadline import Deadline, DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+def _ready(_):
+    return os.getpid()
+
+class ParsePool:
+    """
+    Process pool for the scrapers' CPU-bound HTML extraction.
+
+    Parse functions are module-level functions taking the raw response
+    bytes and returning plain dicts and lists, so they can run in a worker
+    process and parse in parallel instead of queueing on the GIL of the
+    process serving requests.
+
+    With `max_workers` of 0 (the default) everything is parsed on the
+    calling thread. If the pool breaks, e.g. because a worker was killed,
+    parsing falls back to the calling thread for the rest of the process'
+    life rather than failing searches.
+    """
+
+    # Seconds between checks of the deadline while waiting for a worker
+    poll_interval = 0.05
+
+    def __init__(self, max_workers=0):
+        self.max_workers = 0
+        self._executor = None
+        self._broken = False
+        self._lock = threading.Lock()
+        self._stats = {'pooled': 0, 'in_thread': 0, 'fallbacks': 0, 'pool_seconds': 0.0}
+        if max_workers:
+            self.configure(max_workers)
+
+    def configure(self, max_workers):
+        """
+        Start max_workers parse processes (0 parses on the calling thread).
+
+        The workers are forked before this returns, so configure the pool
+        at startup, before the app starts any threads of its own.
+        """
+        with self._lock:
+            previous = self._executor
+            self._executor = None
+            self._broken = False
+            self.max_workers = max_workers
+            if max_workers > 0 and 'fork' not in multiprocessing.get_all_start_methods():
+                logger.warning("Parse pool needs fork, which is not available here; parsing in-thread")
+                self.max_workers = 0
+            elif max_workers > 0:
+                executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=multiprocessing.get_context('fork')
+                )
+                # Fork every worker now, while the process is still single-threaded
+                list(executor.map(_ready, range(max_workers)))
+                self._executor = executor
+        if previous is not None:
+            previous.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, func, content, deadline=None):
+        """Return func(content), computed in a worker process when the pool is up"""
+        deadline = deadline or Deadline.unbounded()
+        executor = self._executor
+        if executor is None:
+            self._count('in_thread')
+            return func(content)
+
+        started = time.monotonic()
+        try:
+            future = executor.submit(func, content)
+        except (BrokenProcessPool, RuntimeError) as e:
+            return self._fall_back(func, content, e)
+
+        try:
+            result = self._wait(future, deadline)
+        except DeadlineExceeded:
+            future.cancel()
+            raise
+        except BrokenProcessPool as e:
+            return self._fall_back(func, content, e)
+
+        with self._lock:
+            self._stats['pooled'] += 1
+            self._stats['pool_seconds'] += time.monotonic() - started
+        return result
+
+    def _wait(self, future, deadline):
+        """
+        Wait for the parse in short slices, so a cancelled deadline (a
+        client that went away, an abandoned stage) stops the wait at once
+        rather than when its budget runs out
+        """
+        while True:
+            deadline.check()
+            try:
+                return future.result(timeout=min(self.poll_interval, deadline.remaining()))
+            except concurrent.futures.TimeoutError:
+                continue
+
+    def _fall_back(self, func, content, error):
+        with self._lock:
+            if not self._broken:
+                logger.error(f"Parse pool is broken, parsing in-thread from now on: {str(error)}")
+            self._broken = True
+            self._executor = None
+            self._stats['fallbacks'] += 1
+        self._count('in_thread')
+        return func(content)
+
+    def _count(self, outcome):
+        with self._lock:
+            self._stats[outcome] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, max_workers=self.max_workers, broken=self._broken)
+        stats['pool_seconds'] = round(stats['pool_seconds'], 3)
+        return stats
+
+# Shared by every scraper; started from the app config with parse_pool.configure()
+parse_pool = ParsePool()
@@ -0,0 +1,128 @@
+import time
+import asyncio
+import threading
+from urllib.parse import urlsplit
+
+from deadline import Deadline, DeadlineExceeded
+
+class TokenBucket:
+    """
+    Token bucket allowing `rate` requests per second with bursts of `burst`.
+
+    Callers reserve a token and are told how long to wait before using it.
+    The balance may go negative, so concurrent callers queue up in order
+    and are spaced 1/rate apart, while a caller arriving after an idle
+    period finds a full bucket and does not wait at all.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return the seconds to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def refund(self):
+        """Give back a reserved token that was not used"""
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+class RateLimiter:
+    """
+    Per-host request rate limits shared by every scraper and thread.
+
+    Each host gets its own TokenBucket, created on first use from the
+    host's configured limit or the default one. Hosts without any limit
+    are never delayed.
+    """
+
+    def __init__(self, rate=None, burst=1):
+        self.default = (rate, burst)
+        self.limits = {}
+        self._buckets = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def configure(self, rate=None, burst=1, host=None):
+        """Set the limit for one host, or the default for every host without its own"""
+        with self._lock:
+            if host is None:
+                self.default = (rate, burst)
+                self._buckets = {h: b for h, b in self._buckets.items() if h in self.limits}
+            else:
+                self.limits[host] = (rate, burst)
+                self._buckets.pop(host, None)
+
+    def _bucket(self, host):
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                rate, burst = self.limits.get(host, self.default)
+                if not rate:
+                    return None
+                bucket = self._buckets[host] = TokenBucket(rate, burst)
+            return bucket
+
+    def _reserve(self, url, deadline):
+        """
+        Reserve a token for url's host and return its bucket (None for an
+        unlimited host) and the wait, refusing waits past the deadline
+        """
+        host = urlsplit(url).netloc.lower()
+        bucket = self._bucket(host)
+        if bucket is None:
+            return None, 0.0
+        wait = bucket.reserve()
+        if wait > deadline.remaining():
+            bucket.refund()
+            raise DeadlineExceeded(f"Rate limit for {host} would delay the request past its deadline")
+        with self._lock:
+            stats = self._stats.setdefault(host, {'requests': 0, 'delayed': 0, 'total_wait': 0.0})
+            stats['requests'] += 1
+            if wait > 0:
+                stats['delayed'] += 1
+                stats['total_wait'] += wait
+        return bucket, wait
+
+    def acquire(self, url, deadline=None):
+        """Block the calling thread until a request to url's host is allowed"""
+        deadline = deadline or Deadline.unbounded()
+        deadline.check()
+        bucket, wait = self._reserve(url, deadline)
+        if wait > 0:
+            try:
+                deadline.sleep(wait)
+            except DeadlineExceeded:
+                # The request will not be sent, so its slot goes to the next caller
+                bucket.refund()
+                raise
+
+    async def acquire_async(self, url, deadline=None):
+        """Like acquire(), but waits without blocking the event loop"""
+        deadline = deadline or Deadline.unbounded()
+        deadline.check()
+        bucket, wait = self._reserve(url, deadline)
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+                deadline.check()
+            except (DeadlineExceeded, asyncio.CancelledError):
+                bucket.refund()
+                raise
+
+    def stats(self):
+        with self._lock:
+            return {host: dict(stats, total_wait=round(stats['total_wait'], 2))
+                    for host, stats in self._stats.items()}
+
+# Shared by every scraper; limits are set from the app config with rate_limiter.configure()
+rate_limiter = RateLimiter()
@@ -0,0 +1,104 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+def parse_platform_map(value, cast=float):
+    """Parse 'amazon:0.5,flipkart:1' into {'amazon': 0.5, 'flipkart': 1.0}"""
+    settings = {}
+    for item in (value or '').split(','):
+        if not item.strip():
+            continue
+        name, _, setting = item.partition(':')
+        try:
+            settings[name.strip().lower()] = cast(setting.strip())
+        except ValueError:
+            logger.warning(f"Ignoring malformed platform setting: {item.strip()}")
+    return settings
+
+class ScraperRegistry:
+    """
+    The platforms the app knows about, in registration order.
+
+    Scraper classes register themselves with the @registry.register
+    decorator when their module is imported. configure() then picks the
+    platforms this deployment uses and creates one scraper instance for
+    each; every other part of the app iterates those instead of naming
+    platforms itself.
+    """
+
+    def __init__(self):
+        self._classes = {}
+        self._scrapers = {}
+        self._lock = threading.Lock()
+
+    def register(self, scraper_class):
+        """Class decorator adding a BaseScraper subclass under its `name`"""
+        if not scraper_class.name:
+            raise ValueError(f"{scraper_class.__name__} has no platform name")
+        self._classes[scraper_class.name] = scraper_class
+        return scraper_class
+
+    def configure(self, enabled=None, rate_limits=None, concurrency=None, timeouts=None):
+        """
+        Instantiate the enabled platforms (every registered one if enabled
+        is empty), overriding their declared rate limits, concurrency and
+        timeouts with any per-platform values given.
+        """
+        wanted = {name.strip().lower() for name in (enabled or []) if name.strip()} or set(self._classes)
+        for name in wanted - set(self._classes):
+            logger.warning(f"Unknown platform {name} in enabled platforms, skipping it")
+        scrapers = {}
+        for name, scraper_class in self._classes.items():
+            if name not in wanted:
+                continue
+            scraper = scraper_class()
+            for attribute, overrides in (('rate_limit', rate_limits), ('concurrency', concurrency),
+                                         ('timeout', timeouts)):
+                if overrides and name in overrides:
+                    setattr(scraper, attribute, overrides[name])
+            scrapers[name] = scraper
+        with self._lock:
+            self._scrapers = scrapers
+        logger.info(f"Enabled platforms: {', '.join(scrapers) or 'none'}")
+
+    def get(self, name):
+        """The enabled scraper for a platform, or None if it is unknown or disabled"""
+        return self._scrapers.get(name)
+
+    def names(self):
+        """Enabled platform names, in registration order"""
+        return list(self._scrapers)
+
+    def scrapers(self):
+        return list(self._scrapers.values())
+
+    def scraper_class(self, name):
+        """The registered class for a platform, enabled or not"""
+        return self._classes.get(name)
+
+    def registered(self):
+        """Every registered platform name, enabled or not"""
+        return list(self._classes)
+
+    def describe(self):
+        """What each registered platform declares, and whether it is enabled"""
+        platforms = []
+        for name, scraper_class in self._classes.items():
+            scraper = self._scrapers.get(name, scraper_class)
+            platforms.append({
+                'name': name,
+                'display_name': scraper.display_name or name.title(),
+                'enabled': name in self._scrapers,
+                'host': scraper.host,
+                'color': scraper.color,
+                'supports_reviews': scraper.supports_reviews,
+                'rate_limit': scraper.rate_limit,
+                'timeout': scraper.timeout,
+                'concurrency': scraper.concurrency,
+                'fallback_from': scraper.fallback_from
+            })
+        return platforms
+
+# Scraper modules register their classes here; the app enables them with registry.configure()
+registry = ScraperRegistry()
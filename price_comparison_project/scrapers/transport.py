@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from datetime import timedelta
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from deadline import Deadline
+from scrapers.debug_capture import _write_atomic
+
+logger = logging.getLogger(__name__)
+
+# The stored body is already decoded, so these no longer describe it
+_DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+class FixtureNotFound(requests.ConnectionError):
+    """Raised in replay mode for a request that was never recorded"""
+    pass
+
+class FixtureStore:
+    """
+    Content-addressed store of recorded HTTP exchanges.
+
+    Each response body is saved once under the SHA-256 of its bytes in
+    `bodies/`, so pages recorded repeatedly (or for several URLs) share a
+    file. Each request is saved under the SHA-256 of its method and full
+    URL in `requests/`, as JSON metadata pointing at its body. Headers and
+    cookies are not part of the key, so replays do not depend on them.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def request_key(method, url, params=None):
+        prepared = requests.Request(method.upper(), url, params=params).prepare()
+        return hashlib.sha256(f"{prepared.method} {prepared.url}".encode('utf-8')).hexdigest()
+
+    def _request_path(self, key):
+        return os.path.join(self.directory, 'requests', f"{key}.json")
+
+    def _body_path(self, digest):
+        return os.path.join(self.directory, 'bodies', f"{digest}.body")
+
+    def save(self, method, url, response, params=None):
+        """Store a response for the request; a later recording of the same request replaces it"""
+        body = response.content
+        digest = hashlib.sha256(body).hexdigest()
+        metadata = {
+            'method': method.upper(),
+            'url': url,
+            'params': params,
+            'final_url': response.url,
+            'status_code': response.status_code,
+            'reason': response.reason,
+            'headers': {name: value for name, value in response.headers.items()
+                        if name.lower() not in _DROPPED_HEADERS},
+            'encoding': response.encoding,
+            'body': digest,
+            'size': len(body),
+            'elapsed': response.elapsed.total_seconds(),
+            'recorded_at': time.time()
+        }
+        key = self.request_key(method, url, params)
+        with self._lock:
+            os.makedirs(os.path.dirname(self._body_path(digest)), exist_ok=True)
+            os.makedirs(os.path.dirname(self._request_path(key)), exist_ok=True)
+            if not os.path.exists(self._body_path(digest)):
+                _write_atomic(self._body_path(digest), body)
+            # The metadata goes last: a request is replayable only once its body is stored
+            _write_atomic(self._request_path(key), json.dumps(metadata, indent=2).encode('utf-8'))
+        return key
+
+    def metadata(self, method, url, params=None):
+        try:
+            with open(self._request_path(self.request_key(method, url, params))) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def load(self, method, url, params=None):
+        """The recorded response for a request as a requests.Response, or None if there is none"""
+        metadata = self.metadata(method, url, params)
+        if metadata is None:
+            return None
+        with open(self._body_path(metadata['body']), 'rb') as f:
+            body = f.read()
+
+        response = requests.Response()
+        response.status_code = metadata['status_code']
+        response.reason = metadata['reason']
+        response.headers = CaseInsensitiveDict(metadata['headers'])
+        response.encoding = metadata['encoding']
+        response.url = metadata['final_url']
+        response.elapsed = timedelta(seconds=metadata['elapsed'])
+        response.request = requests.Request(metadata['method'], url, params=params).prepare()
+        response._content = body
+        return response
+
+    def entries(self):
+        """Metadata of every recorded request"""
+        directory = os.path.join(self.directory, 'requests')
+        try:
+            names = sorted(os.listdir(directory))
+        except FileNotFoundError:
+            return []
+        entries = []
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, name)) as f:
+                    entries.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return entries
+
+    def body(self, digest):
+        with open(self._body_path(digest), 'rb') as f:
+            return f.read()
+
+class Transport:
+    """
+    How the shared HTTP client sends scraper requests.
+
+    - live: straight to the network
+    - record: to the network, saving every response in the fixture store
+    - replay: from the fixture store only; a request that was never
+      recorded fails like a network error, so replays are deterministic
+
+    In replay mode `latency` simulates network time: a number of seconds
+    per request, or 'recorded' to wait as long as the recorded response
+    took. A simulated wait longer than the request's timeout raises a
+    timeout, as it would live, and a `deadline` passed to send() ends the
+    wait early when it expires or is cancelled.
+    """
+
+    MODES = ('live', 'record', 'replay')
+
+    def __init__(self, mode='live', store=None, latency=None):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown transport mode {mode!r}, expected one of {', '.join(self.MODES)}")
+        if mode != 'live' and store is None:
+            raise ValueError(f"The {mode} transport needs a fixture store")
+        self.mode = mode
+        self.store = store
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._stats = {'live': 0, 'recorded': 0, 'replayed': 0, 'misses': 0}
+
+    def send(self, session, method, url, deadline=None, **kwargs):
+        if self.mode == 'replay':
+            return self._replay(method, url, kwargs.get('params'), kwargs.get('timeout'),
+                                deadline or Deadline.unbounded())
+
+        response = session.request(method, url, **kwargs)
+        if self.mode == 'record':
+            try:
+                self.store.save(method, url, response, kwargs.get('params'))
+                self._count('recorded')
+            except Exception as e:
+                # A recording problem must not fail the scrape itself
+                logger.error(f"Error recording fixture for {url}: {str(e)}")
+        else:
+            self._count('live')
+        return response
+
+    def _replay(self, method, url, params, timeout, deadline):
+        response = self.store.load(method, url, params)
+        if response is None:
+            self._count('misses')
+            raise FixtureNotFound(f"No recorded response for {method.upper()} {url}")
+
+        delay = response.elapsed.total_seconds() if self.latency == 'recorded' else (self.latency or 0)
+        if isinstance(timeout, tuple):
+            timeout = sum(part for part in timeout if part is not None)
+        if timeout is not None and delay > timeout:
+            deadline.sleep(timeout)
+            raise requests.ReadTimeout(f"Simulated latency of {delay:.2f}s exceeded the {timeout:.2f}s timeout")
+        if delay > 0:
+            deadline.sleep(delay)
+
+        self._count('replayed')
+        return response
+
+    def _count(self, outcome):
+        with self._lock:
+            self._stats[outcome] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, mode=self.mode, latency=self.latency,
+                        fixtures=self.store.directory if self.store else None)
+
+def parse_latency(value):
+    """Latency setting from the environment: empty for none, 'recorded', or seconds"""
+    if not value:
+        return None
+    if value == 'recorded':
+        return value
+    return float(value)
@@ -0,0 +1,121 @@
+import asyncio
+import concurrent.futures
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a streamed pipeline run
+_FINISHED = object()
+
+class _BackgroundRun:
+    """A pipeline running on its own event loop thread that can be cancelled from outside"""
+
+    def __init__(self):
+        self.loop = None
+        self.task = None
+        self.cancelled = False
+        self._lock = threading.Lock()
+
+    def attach(self, loop, task):
+        with self._lock:
+            self.loop = loop
+            self.task = task
+            return not self.cancelled
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            if self.loop and self.task and not self.task.done():
+                self.loop.call_soon_threadsafe(self.task.cancel)
+
+class SearchEngine:
+    """
+    Run search pipelines on an asyncio event loop.
+
+    Every stage without unmet dependencies is started at the same moment,
+    so platform fetches run side by side and each platform's downstream
+    stages (filtering, scoring, reviews) follow as soon as it completes.
+    """
+
+    def __init__(self, executor=None, max_workers=8):
+        """
+        Args:
+            executor: Default executor for pipeline stages that do not pick
+                their own. A private thread pool is created if omitted.
+            max_workers: Size of that private pool
+        """
+        self.max_workers = max_workers
+        self._executor = executor
+
+    @property
+    def executor(self):
+        # Stage bodies are blocking, so they run on a shared pool that is
+        # created once and reused by every search
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix='search'
+            )
+        return self._executor
+
+    def run(self, pipeline):
+        """Blocking entry point for synchronous Flask views"""
+        return asyncio.run(pipeline.run(self.executor))
+
+    def stream(self, pipeline, max_duration=None):
+        """
+        Run a pipeline in the background and yield (stage name, result)
+        pairs as stages finish.
+
+        The pipeline is cancelled when the consumer stops iterating (for
+        example because the client disconnected) or when max_duration
+        seconds have passed, in which case a final ('timeout', None) pair
+        is yielded.
+        """
+        events = queue.Queue()
+        handle = _BackgroundRun()
+
+        async def run_pipeline():
+            task = asyncio.current_task()
+            if not handle.attach(asyncio.get_running_loop(), task):
+                return
+            await pipeline.run(
+                self.executor,
+                on_stage_complete=lambda name, result: events.put((name, result))
+            )
+
+        def run_in_thread():
+            try:
+                asyncio.run(run_pipeline())
+            except asyncio.CancelledError:
+                logger.info("Streamed search pipeline cancelled")
+            except Exception as e:
+                logger.error(f"Error in streamed search pipeline: {str(e)}")
+            finally:
+                events.put(_FINISHED)
+
+        threading.Thread(target=run_in_thread, name='search-stream', daemon=True).start()
+
+        stop_at = time.time() + max_duration if max_duration else None
+        try:
+            while True:
+                timeout = None if stop_at is None else stop_at - time.time()
+                if timeout is not None and timeout <= 0:
+                    yield 'timeout', None
+                    return
+                try:
+                    item = events.get(timeout=timeout)
+                except queue.Empty:
+                    yield 'timeout', None
+                    return
+                if item is _FINISHED:
+                    return
+                yield item
+        finally:
+            handle.cancel()
+            if pipeline.deadline is not None:
+                # Stop any scrapes still running for a client that has gone away
+                pipeline.deadline.cancel()
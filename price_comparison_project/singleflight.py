@@ -0,0 +1,169 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows has no flock; only in-process coalescing is available
+    fcntl = None
+
+from deadline import Deadline, DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+class _Call:
+    """One in-flight computation that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class FileLockBackend:
+    """
+    Cross-process lock using one flock'd file per key.
+
+    Worker processes sharing the same lock directory take turns computing
+    a key; whoever gets the lock second should re-check the shared cache
+    before doing the work again.
+    """
+
+    def __init__(self, lock_dir, timeout=30, poll_interval=0.05):
+        """
+        Args:
+            lock_dir: Directory for the lock files, shared by every process
+            timeout: Seconds to wait for another process before giving up
+                and computing the key anyway, further capped by the
+                caller's deadline
+            poll_interval: Seconds between lock attempts
+        """
+        if fcntl is None:
+            raise RuntimeError("File locks need fcntl, which is not available on this platform")
+        self.lock_dir = lock_dir
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        os.makedirs(lock_dir, exist_ok=True)
+
+    def acquire(self, key, deadline=None):
+        """
+        Return an open lock handle, or None if the lock could not be taken
+        in time. Raises DeadlineExceeded if the deadline ends first.
+        """
+        deadline = deadline or Deadline.unbounded()
+        name = hashlib.md5(key.encode()).hexdigest()
+        handle = open(os.path.join(self.lock_dir, f"{name}.lock"), 'a')
+        try:
+            give_up_at = time.monotonic() + deadline.timeout(self.timeout)
+            while True:
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return handle
+                except BlockingIOError:
+                    if time.monotonic() >= give_up_at:
+                        # Out of budget rather than out of patience
+                        deadline.check()
+                        logger.warning(f"Timed out waiting for another process on {key}")
+                        handle.close()
+                        return None
+                    deadline.sleep(min(self.poll_interval, max(0.0, give_up_at - time.monotonic())))
+        except DeadlineExceeded:
+            handle.close()
+            raise
+
+    def release(self, handle):
+        if handle is None:
+            return
+        try:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+        finally:
+            handle.close()
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into one execution.
+
+    The first caller for a key runs the function; callers that arrive while
+    it is still running wait and share its result (or exception). With a
+    process lock backend, the leader also holds a cross-process lock while
+    it runs, so leaders in other worker processes queue up behind it.
+
+    If the leader's own request deadline ends its call, waiters do not
+    inherit that failure and retry under their own deadlines instead.
+    """
+
+    def __init__(self, process_locks=None):
+        self.process_locks = process_locks
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {'leaders': 0, 'coalesced': 0}
+
+    def use_file_locks(self, lock_dir, timeout=30):
+        """Coalesce across worker processes that share lock_dir"""
+        self.process_locks = FileLockBackend(lock_dir, timeout=timeout)
+
+    def do(self, key, func, recheck=None, deadline=None):
+        """
+        Run func() once for all concurrent callers with the same key.
+
+        Args:
+            key: String identifying the work
+            func: Callable producing the result
+            recheck: Optional callable run by the leader before func (and
+                after taking the cross-process lock). If it returns anything
+                but None, that value is used instead, e.g. a cache entry
+                written by a call that finished while this one was starting.
+            deadline: Optional Deadline bounding the wait for another
+                caller's (or process') computation; DeadlineExceeded is
+                raised once it runs out
+        """
+        deadline = deadline or Deadline.unbounded()
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is None:
+                    call = self._calls[key] = _Call()
+                    self._stats['leaders'] += 1
+                    leader = True
+                else:
+                    self._stats['coalesced'] += 1
+                    leader = False
+
+            if not leader:
+                remaining = deadline.remaining()
+                if not call.done.wait(None if remaining == float('inf') else remaining):
+                    deadline.check()
+                    continue
+                if isinstance(call.error, DeadlineExceeded):
+                    continue
+                if call.error is not None:
+                    raise call.error
+                return call.result
+
+            try:
+                call.result = self._lead(key, func, recheck, deadline)
+                return call.result
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+    def _lead(self, key, func, recheck, deadline):
+        handle = self.process_locks.acquire(key, deadline) if self.process_locks else None
+        try:
+            if recheck is not None:
+                result = recheck()
+                if result is not None:
+                    return result
+            return func()
+        finally:
+            if self.process_locks:
+                self.process_locks.release(handle)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._calls))
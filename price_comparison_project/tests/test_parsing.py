@@ -0,0 +1,59 @@
+"""
+The scrapers' strainers must not change what they extract: every saved
+page under tests/fixtures/<platform>/<kind>/ is parsed with its strainer
+and without it, with each parser backend, and both parses must agree on a
+non-empty result.
+"""
+import os
+import importlib.util
+
+import pytest
+
+from scrapers import parsing
+from scrapers.registry import registry
+# Importing the scraper modules registers their platforms and parse functions
+import scrapers.amazon_scraper
+import scrapers.flipkart_scraper
+import scrapers.alibaba_scraper
+import scrapers.chroma_scraper
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+def _fixtures():
+    for platform_name in sorted(os.listdir(FIXTURES_DIR)):
+        for kind in sorted(os.listdir(os.path.join(FIXTURES_DIR, platform_name))):
+            directory = os.path.join(FIXTURES_DIR, platform_name, kind)
+            for name in sorted(os.listdir(directory)):
+                yield pytest.param(platform_name, kind, os.path.join(directory, name),
+                                   id=f"{platform_name}-{kind}-{os.path.splitext(name)[0]}")
+
+BACKENDS = [
+    'html.parser',
+    pytest.param('lxml', marks=pytest.mark.skipif(importlib.util.find_spec('lxml') is None,
+                                                  reason="lxml is not installed"))
+]
+
+def _parse(parse, content, backend, strain, monkeypatch):
+    monkeypatch.setattr(parsing, 'PARSER', backend)
+    monkeypatch.setattr(parsing, 'STRAIN', strain)
+    return parse(content)
+
+def test_every_parser_has_fixtures():
+    covered = {(platform_name, kind) for platform_name, kind, _ in (param.values for param in _fixtures())}
+    for platform_name in registry.registered():
+        for kind in registry.scraper_class(platform_name).parsers:
+            assert (platform_name, kind) in covered, f"No fixture for the {platform_name} {kind} parser"
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('platform_name,kind,path', list(_fixtures()))
+def test_strained_parse_matches_full_parse(platform_name, kind, path, backend, monkeypatch):
+    parse = registry.scraper_class(platform_name).parsers[kind]
+    with open(path, 'rb') as f:
+        content = f.read()
+
+    full = _parse(parse, content, backend, False, monkeypatch)
+    strained = _parse(parse, content, backend, True, monkeypatch)
+
+    # An empty extraction would make the comparison meaningless
+    assert full and all(part for part in (full if isinstance(full, tuple) else [full]))
+    assert strained == full
@@ -0,0 +1,149 @@
+import collections
+import concurrent.futures
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class PoolFull(Exception):
+    """Raised when a pool's queue is at its depth limit"""
+    pass
+
+class _Task:
+    __slots__ = ('func', 'args', 'kwargs', 'platform', 'future', 'enqueued_at')
+
+    def __init__(self, func, args, kwargs, platform):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.platform = platform
+        self.future = concurrent.futures.Future()
+        self.enqueued_at = time.monotonic()
+
+class WorkerPool(concurrent.futures.Executor):
+    """
+    Long-lived, app-scoped thread pool with admission control.
+
+    - At most `max_workers` tasks run at once, on threads reused across requests
+    - At most `max_queue` tasks may wait; further submissions raise PoolFull
+      instead of piling up behind a slow platform
+    - Tasks tagged with a platform run at most `platform_limits[platform]` at a
+      time; extra ones wait in a per-platform line without holding a thread
+    - Tasks cancelled while still queued (e.g. by a request deadline) never run
+
+    `stats()` exposes active-worker and queue gauges plus queue wait times.
+    """
+
+    def __init__(self, name, max_workers, max_queue=None, platform_limits=None, wait_samples=1000):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.platform_limits = dict(platform_limits or {})
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=name
+        )
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = 0
+        self._running_by_platform = collections.Counter()
+        self._waiting_by_platform = collections.defaultdict(collections.deque)
+        self._wait_times = collections.deque(maxlen=wait_samples)
+        self._max_wait = 0.0
+
+    def submit(self, fn, *args, **kwargs):
+        """Submit an untagged task; this is the Executor interface used by asyncio"""
+        return self.submit_for(None, fn, *args, **kwargs)
+
+    def submit_for(self, platform, fn, *args, **kwargs):
+        """Submit a task that counts against `platform`'s concurrency cap"""
+        task = _Task(fn, args, kwargs, platform)
+        with self._lock:
+            if self.max_queue is not None and self._queued >= self.max_queue:
+                self._rejected += 1
+                raise PoolFull(f"{self.name} pool queue is full ({self.max_queue} waiting)")
+            self._queued += 1
+            self._submitted += 1
+
+            limit = self.platform_limits.get(platform)
+            if limit is not None and self._running_by_platform[platform] >= limit:
+                # Wait in this platform's own line so other platforms are not blocked
+                self._waiting_by_platform[platform].append(task)
+                return task.future
+            if platform is not None:
+                self._running_by_platform[platform] += 1
+
+        self._executor.submit(self._run, task)
+        return task.future
+
+    def _run(self, task):
+        wait = time.monotonic() - task.enqueued_at
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+            self._wait_times.append(wait)
+            self._max_wait = max(self._max_wait, wait)
+
+        try:
+            if task.future.set_running_or_notify_cancel():
+                try:
+                    task.future.set_result(task.func(*task.args, **task.kwargs))
+                except BaseException as e:
+                    task.future.set_exception(e)
+        finally:
+            next_task = None
+            with self._lock:
+                self._active -= 1
+                self._completed += 1
+                if task.platform is not None:
+                    waiting = self._waiting_by_platform[task.platform]
+                    if waiting:
+                        # Hand this platform's slot straight to its next task
+                        next_task = waiting.popleft()
+                    else:
+                        self._running_by_platform[task.platform] -= 1
+            if next_task is not None:
+                self._executor.submit(self._run, next_task)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def stats(self):
+        """Snapshot of the pool's gauges and counters"""
+        with self._lock:
+            wait_times = sorted(self._wait_times)
+            max_wait = self._max_wait
+            platforms = {
+                platform: {
+                    'running': self._running_by_platform[platform],
+                    'waiting': len(self._waiting_by_platform[platform]),
+                    'limit': limit
+                }
+                for platform, limit in self.platform_limits.items()
+            }
+            stats = {
+                'name': self.name,
+                'max_workers': self.max_workers,
+                'active_workers': self._active,
+                'queued': self._queued,
+                'max_queue': self.max_queue,
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'platforms': platforms
+            }
+
+        if wait_times:
+            stats['queue_wait'] = {
+                'avg': round(sum(wait_times) / len(wait_times), 4),
+                'p50': round(wait_times[len(wait_times) // 2], 4),
+                'p95': round(wait_times[min(len(wait_times) - 1, int(len(wait_times) * 0.95))], 4),
+                'max': round(max_wait, 4)
+            }
+        else:
+            stats['queue_wait'] = {'avg': 0, 'p50': 0, 'p95': 0, 'max': 0}
+        return stats